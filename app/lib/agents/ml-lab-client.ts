@@ -21,6 +21,8 @@ export type MlLabInferenceResponse = {
     cfaMapBase64?: string | null;
     mantraMaskBase64?: string | null;
     prnuResidualBase64?: string | null;
+    mapMediaType?: string;
+    mapUrls?: Partial<Record<"ela" | "cfa" | "mantra" | "prnu", string>>;
   };
   timingMs?: number;
   error?: string;
@@ -31,6 +33,7 @@ export async function callMlLabInference(params: {
   filename: string;
   mimeType: string;
   returnHeatmap?: boolean;
+  heatmapDelivery?: "inline" | "url";
   baseUrl?: string;
   timeoutMs?: number;
 }): Promise<MlLabInferenceResponse> {
@@ -50,6 +53,9 @@ export async function callMlLabInference(params: {
     params.filename
   );
   form.append("returnHeatmap", String(Boolean(params.returnHeatmap)));
+  if (params.heatmapDelivery) {
+    form.append("heatmapDelivery", params.heatmapDelivery);
+  }
 
   try {
     const response = await fetch(`${baseUrl}/infer`, {
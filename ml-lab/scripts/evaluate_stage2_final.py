@@ -23,6 +23,7 @@ from ml_lab.eval.error_analysis import build_error_analysis_table
 from ml_lab.eval.metrics import compute_binary_metrics
 from ml_lab.eval.robustness import run_robustness_suite
 from ml_lab.eval.statistics import run_method_comparison_stats
+from ml_lab.features.table import load_feature_table
 from ml_lab.models.trainer import train_method
 from ml_lab.utils.io import write_json
 from ml_lab.utils.logging_utils import setup_logging
@@ -42,7 +43,7 @@ class EvaluatedMethod:
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Final stage-2 evaluation pack for thesis (Bab 4)")
     parser.add_argument("--config", type=str, default="configs/casia2_primary.yaml")
-    parser.add_argument("--feature-table", type=str, default="artifacts/metrics/feature_table.csv")
+    parser.add_argument("--feature-table", type=str, default="artifacts/metrics/feature_table.arrow")
     parser.add_argument("--split-csv", type=str, default="data/splits/casia2_split.csv")
     parser.add_argument("--stage2-artifact", type=str, default="artifacts/models/final_primary_artifact_stage2.joblib")
     return parser.parse_args()
@@ -202,13 +203,19 @@ def main() -> None:
     run_name = f"final_stage2_eval_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     setup_logging(config["paths"]["logs_dir"], run_name=run_name)
 
-    feature_table = pd.read_csv(feature_table_path)
+    support_methods = ["ela_only", "dwt_svd_only", "ela_dwt"]
+    stage2_bundle = joblib.load(artifact_path)
+    primary_payload = stage2_bundle["methods"][stage2_bundle["primary_method"]]
+    feature_table = load_feature_table(
+        feature_table_path,
+        methods=support_methods,
+        columns=primary_payload["feature_columns"],
+    )
     split_manifest = pd.read_csv(split_csv_path)
     test_manifest = split_manifest[split_manifest["split"] == "test"].reset_index(drop=True)
 
     # Train supporting baselines quickly on existing feature table.
     support_config = copy.deepcopy(config)
-    support_methods = ["ela_only", "dwt_svd_only", "ela_dwt"]
     method_results: dict[str, EvaluatedMethod] = {}
     for method in support_methods:
         trained = train_method(method=method, feature_table=feature_table, config=support_config)
@@ -221,8 +228,6 @@ def main() -> None:
             predictions=trained.predictions,
         )
 
-    stage2_bundle = joblib.load(artifact_path)
-    primary_payload = stage2_bundle["methods"][stage2_bundle["primary_method"]]
     primary_method_name = "ela_dwt_svd_stage2"
     primary_eval = _to_evaluated_from_payload(
         method_name=primary_method_name,
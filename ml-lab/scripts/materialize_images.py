@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from ml_lab.config import load_config, resolve_paths
+from ml_lab.data import load_manifest
+from ml_lab.features.image_store import materialize_image_store
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Decode and resize every manifest image once into a memory-mapped image store"
+    )
+    parser.add_argument("--config", type=str, default="configs/default.yaml", help="Path to YAML config")
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="Manifest CSV to materialize (defaults to paths.manifest_csv)",
+    )
+    parser.add_argument(
+        "--store-dir",
+        type=str,
+        default=None,
+        help="Store directory (defaults to paths.image_store_dir)",
+    )
+    parser.add_argument("--workers", type=int, default=-1, help="Decode threads (-1 = all cores)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    config_path = Path(args.config)
+    if not config_path.is_absolute():
+        config_path = PROJECT_ROOT / config_path
+    config = resolve_paths(load_config(config_path), base_dir=PROJECT_ROOT)
+
+    store_dir = args.store_dir or config["paths"].get("image_store_dir")
+    if not store_dir:
+        raise ValueError("Set paths.image_store_dir in the config or pass --store-dir")
+    manifest_path = Path(args.manifest or config["paths"]["manifest_csv"])
+
+    summary = materialize_image_store(
+        manifest=load_manifest(manifest_path),
+        store_dir=store_dir,
+        image_size=tuple(config["experiment"]["image_size"]),
+        n_workers=int(args.workers),
+        reduced_decode=bool(config["experiment"].get("reduced_decode", False)),
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,28 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--host", type=str, default="127.0.0.1")
     parser.add_argument("--port", type=int, default=8100)
     parser.add_argument("--artifact", type=str, default="artifacts/models/final_primary_artifact.joblib")
+    parser.add_argument("--workers", type=int, default=None, help="Inference worker threads (-1 = all cores)")
+    parser.add_argument("--queue-depth", type=int, default=None, help="Requests allowed to wait for a worker")
+    parser.add_argument("--response-cache-mb", type=float, default=None, help="/infer response cache budget (0 = off)")
+    parser.add_argument("--response-cache-ttl", type=float, default=None, help="/infer response cache TTL in seconds")
+    parser.add_argument(
+        "--near-duplicate-distance",
+        type=int,
+        default=None,
+        help="Reuse the verdict of a prior image within this pHash Hamming distance (off by default)",
+    )
+    parser.add_argument("--near-duplicate-capacity", type=int, default=None, help="Hashes kept in the near-duplicate index")
+    parser.add_argument(
+        "--heatmap-delivery",
+        choices=("inline", "url"),
+        default=None,
+        help="Default for /infer heatmapDelivery: inline base64 or /maps URLs",
+    )
+    parser.add_argument("--map-store-mb", type=float, default=None, help="Budget for raw maps served by /maps")
+    parser.add_argument("--map-store-ttl", type=float, default=None, help="Seconds a request's maps stay available")
+    parser.add_argument("--map-format", choices=("png", "webp", "jpeg"), default=None, help="Encoding of explainability maps")
+    parser.add_argument("--map-png-compression", type=int, default=None, help="PNG compression level 0-9 (default: OpenCV's)")
+    parser.add_argument("--map-quality", type=int, default=None, help="WebP/JPEG quality for explainability maps")
     return parser.parse_args()
 
 
@@ -27,6 +49,30 @@ def main() -> None:
     if not artifact.is_absolute():
         artifact = PROJECT_ROOT / artifact
     os.environ["ML_LAB_ARTIFACT_PATH"] = str(artifact.resolve())
+    if args.workers is not None:
+        os.environ["ML_LAB_INFER_WORKERS"] = str(args.workers)
+    if args.queue_depth is not None:
+        os.environ["ML_LAB_INFER_QUEUE_DEPTH"] = str(args.queue_depth)
+    if args.response_cache_mb is not None:
+        os.environ["ML_LAB_RESPONSE_CACHE_MB"] = str(args.response_cache_mb)
+    if args.response_cache_ttl is not None:
+        os.environ["ML_LAB_RESPONSE_CACHE_TTL"] = str(args.response_cache_ttl)
+    if args.near_duplicate_distance is not None:
+        os.environ["ML_LAB_NEAR_DUPLICATE_DISTANCE"] = str(args.near_duplicate_distance)
+    if args.near_duplicate_capacity is not None:
+        os.environ["ML_LAB_NEAR_DUPLICATE_CAPACITY"] = str(args.near_duplicate_capacity)
+    if args.heatmap_delivery is not None:
+        os.environ["ML_LAB_HEATMAP_DELIVERY"] = args.heatmap_delivery
+    if args.map_store_mb is not None:
+        os.environ["ML_LAB_MAP_STORE_MB"] = str(args.map_store_mb)
+    if args.map_store_ttl is not None:
+        os.environ["ML_LAB_MAP_STORE_TTL"] = str(args.map_store_ttl)
+    if args.map_format is not None:
+        os.environ["ML_LAB_MAP_FORMAT"] = args.map_format
+    if args.map_png_compression is not None:
+        os.environ["ML_LAB_MAP_PNG_COMPRESSION"] = str(args.map_png_compression)
+    if args.map_quality is not None:
+        os.environ["ML_LAB_MAP_QUALITY"] = str(args.map_quality)
 
     uvicorn.run(
         "ml_lab.serve.app:app",
@@ -21,6 +21,11 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Rebuild manifest CSV from dataset_root",
     )
+    parser.add_argument(
+        "--refresh-manifest",
+        action="store_true",
+        help="Update the existing manifest, rehashing only new or modified files",
+    )
     return parser.parse_args()
 
 
@@ -34,6 +39,7 @@ def main() -> None:
         config_path=config_path,
         project_root=PROJECT_ROOT,
         force_rebuild_manifest=bool(args.force_rebuild_manifest),
+        refresh_manifest=bool(args.refresh_manifest),
     )
     print(json.dumps(result, indent=2))
 
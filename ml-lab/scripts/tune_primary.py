@@ -13,10 +13,7 @@ from typing import Any
 import joblib
 import numpy as np
 import pandas as pd
-from sklearn.feature_selection import SelectKBest, f_classif
 from sklearn.linear_model import LogisticRegression
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 SRC_ROOT = PROJECT_ROOT / "src"
@@ -24,9 +21,11 @@ if str(SRC_ROOT) not in sys.path:
     sys.path.insert(0, str(SRC_ROOT))
 
 from ml_lab.config import load_config, resolve_paths
-from ml_lab.eval.metrics import compute_binary_metrics
+from ml_lab.eval.metrics import compute_binary_metrics, select_best_threshold
 from ml_lab.eval.statistics import run_method_comparison_stats
+from ml_lab.features.table import load_feature_table
 from ml_lab.models.methods import get_method_feature_columns
+from ml_lab.models.preprocessing import PreprocessCache
 from ml_lab.models.trainer import train_method
 from ml_lab.utils.io import write_json
 from ml_lab.utils.logging_utils import setup_logging
@@ -38,7 +37,7 @@ LOGGER = logging.getLogger(__name__)
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Tune ELA+DWT-SVD primary method against ELA+DWT baseline")
     parser.add_argument("--config", type=str, default="configs/casia2_primary.yaml")
-    parser.add_argument("--feature-table", type=str, default="artifacts/metrics/feature_table.csv")
+    parser.add_argument("--feature-table", type=str, default="artifacts/metrics/feature_table.arrow")
     return parser.parse_args()
 
 
@@ -46,38 +45,27 @@ def _threshold_grid() -> np.ndarray:
     return np.linspace(0.1, 0.9, 161)
 
 
-def _build_pipeline(
+def _build_classifier(
     seed: int,
     C: float,
     class_weight: str | None,
     solver: str,
     penalty: str,
-    top_k: int | None,
-) -> Pipeline:
-    steps: list[tuple[str, Any]] = [("scaler", StandardScaler())]
-    if top_k is not None:
-        steps.append(("selector", SelectKBest(score_func=f_classif, k=int(top_k))))
-    steps.append(
-        (
-            "clf",
-            LogisticRegression(
-                C=float(C),
-                class_weight=class_weight,
-                solver=solver,
-                penalty=penalty,
-                max_iter=3000,
-                random_state=seed,
-            ),
-        )
+) -> LogisticRegression:
+    return LogisticRegression(
+        C=float(C),
+        class_weight=class_weight,
+        solver=solver,
+        penalty=penalty,
+        max_iter=3000,
+        random_state=seed,
     )
-    return Pipeline(steps=steps)
 
 
 def _fit_eval_candidate(
-    train_df: pd.DataFrame,
+    cache: PreprocessCache,
     val_df: pd.DataFrame,
     test_df: pd.DataFrame,
-    feature_cols: list[str],
     seed: int,
     C: float,
     class_weight: str | None,
@@ -85,35 +73,29 @@ def _fit_eval_candidate(
     penalty: str,
     top_k: int | None,
 ) -> dict[str, Any]:
-    x_train = train_df[feature_cols].to_numpy(dtype=np.float32)
-    y_train = train_df["label"].to_numpy(dtype=np.int32)
-    x_val = val_df[feature_cols].to_numpy(dtype=np.float32)
     y_val = val_df["label"].to_numpy(dtype=np.int32)
-    x_test = test_df[feature_cols].to_numpy(dtype=np.float32)
     y_test = test_df["label"].to_numpy(dtype=np.int32)
 
-    pipeline = _build_pipeline(
+    clf = _build_classifier(
         seed=seed,
         C=C,
         class_weight=class_weight,
         solver=solver,
         penalty=penalty,
-        top_k=top_k,
     )
-    pipeline.fit(x_train, y_train)
-    val_prob = pipeline.predict_proba(x_val)[:, 1]
-
-    best_threshold = 0.5
-    best_val_f1 = -1.0
-    best_val_metrics: dict[str, float] = {}
-    for thr in _threshold_grid():
-        metrics = compute_binary_metrics(y_true=y_val, y_prob=val_prob, threshold=float(thr))
-        if metrics["f1"] > best_val_f1:
-            best_val_f1 = metrics["f1"]
-            best_threshold = float(thr)
-            best_val_metrics = metrics
-
-    test_prob = pipeline.predict_proba(x_test)[:, 1]
+    clf.fit(cache.matrix("train", top_k), cache.y_train)
+    pipeline = cache.pipeline(clf, top_k)
+    val_prob = clf.predict_proba(cache.matrix("val", top_k))[:, 1]
+
+    best_threshold, _ = select_best_threshold(
+        y_true=y_val,
+        y_prob=val_prob,
+        thresholds=_threshold_grid(),
+        metric_name="f1",
+    )
+    best_val_metrics = compute_binary_metrics(y_true=y_val, y_prob=val_prob, threshold=best_threshold)
+
+    test_prob = clf.predict_proba(cache.matrix("test", top_k))[:, 1]
     test_metrics = compute_binary_metrics(y_true=y_test, y_prob=test_prob, threshold=best_threshold)
     pred_test = pd.DataFrame(
         {
@@ -154,10 +136,9 @@ def main() -> None:
     feature_table_path = Path(args.feature_table)
     if not feature_table_path.is_absolute():
         feature_table_path = PROJECT_ROOT / feature_table_path
-    feature_table = pd.read_csv(feature_table_path)
-
     baseline_method = str(config["experiment"].get("baseline_method", "ela_dwt"))
     primary_method = str(config["experiment"]["primary_method"])
+    feature_table = load_feature_table(feature_table_path, methods=[baseline_method, primary_method])
     if baseline_method != "ela_dwt" or primary_method != "ela_dwt_svd":
         raise ValueError("This tuner is designed for baseline=ela_dwt and primary=ela_dwt_svd")
 
@@ -193,13 +174,22 @@ def main() -> None:
         {"solver": "liblinear", "penalty": "l2"},
     ]
 
+    # Scaling and F-statistic ranking depend only on the train matrix, so they are fitted
+    # once here instead of once per candidate.
+    cache = PreprocessCache(
+        train_df[primary_feature_cols].to_numpy(dtype=np.float32),
+        train_df["label"].to_numpy(dtype=np.int32),
+        top_k_values=top_k_values,
+        val=val_df[primary_feature_cols].to_numpy(dtype=np.float32),
+        test=test_df[primary_feature_cols].to_numpy(dtype=np.float32),
+    )
+
     for C, class_weight, top_k, form in itertools.product(c_values, class_weights, top_k_values, model_forms):
         try:
             candidate = _fit_eval_candidate(
-                train_df=train_df,
+                cache=cache,
                 val_df=val_df,
                 test_df=test_df,
-                feature_cols=primary_feature_cols,
                 seed=int(config["experiment"]["seed"]),
                 C=C,
                 class_weight=class_weight,
@@ -12,11 +12,9 @@ from typing import Any
 import joblib
 import numpy as np
 import pandas as pd
+from joblib import Parallel, delayed
 from sklearn.ensemble import ExtraTreesClassifier, HistGradientBoostingClassifier, RandomForestClassifier
-from sklearn.feature_selection import SelectKBest, f_classif
 from sklearn.linear_model import LogisticRegression
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler
 from sklearn.utils.class_weight import compute_sample_weight
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -25,12 +23,15 @@ if str(SRC_ROOT) not in sys.path:
     sys.path.insert(0, str(SRC_ROOT))
 
 from ml_lab.config import load_config, resolve_paths
-from ml_lab.eval.metrics import compute_binary_metrics
+from ml_lab.eval.metrics import compute_binary_metrics, select_best_threshold
 from ml_lab.eval.statistics import run_method_comparison_stats
+from ml_lab.features.table import load_feature_table
 from ml_lab.models.methods import get_method_feature_columns
+from ml_lab.models.preprocessing import PreprocessCache
 from ml_lab.models.trainer import train_method
 from ml_lab.utils.io import write_json
 from ml_lab.utils.logging_utils import setup_logging
+from ml_lab.utils.parallel import resolve_n_jobs
 from ml_lab.utils.repro import set_global_seed
 
 LOGGER = logging.getLogger(__name__)
@@ -39,7 +40,28 @@ LOGGER = logging.getLogger(__name__)
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Stage-2 tuning for ELA+DWT-SVD against ELA+DWT baseline")
     parser.add_argument("--config", type=str, default="configs/casia2_primary.yaml")
-    parser.add_argument("--feature-table", type=str, default="artifacts/metrics/feature_table.csv")
+    parser.add_argument("--feature-table", type=str, default="artifacts/metrics/feature_table.arrow")
+    parser.add_argument(
+        "--n-jobs",
+        type=int,
+        default=-1,
+        help="Total CPU budget for the sweep (-1 = all cores)",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help=(
+            "Successive halving: only the best 1/eta candidates on train subsets reach the full "
+            "training split (faster, but the sweep CSV then lists survivors only)"
+        ),
+    )
+    parser.add_argument("--halving-eta", type=int, default=3, help="Keep 1/eta of the candidates per halving rung")
+    parser.add_argument(
+        "--min-train-fraction",
+        type=float,
+        default=1.0 / 9.0,
+        help="Training-split fraction used by the first halving rung",
+    )
     return parser.parse_args()
 
 
@@ -114,12 +136,7 @@ def _candidate_search_space() -> list[dict[str, Any]]:
     return candidates
 
 
-def _build_pipeline(seed: int, model_family: str, params: dict[str, Any]) -> Pipeline:
-    steps: list[tuple[str, Any]] = [("scaler", StandardScaler())]
-    top_k = params.get("top_k")
-    if top_k is not None:
-        steps.append(("selector", SelectKBest(score_func=f_classif, k=int(top_k))))
-
+def _build_classifier(seed: int, model_family: str, params: dict[str, Any], n_jobs: int = -1) -> Any:
     if model_family == "logistic":
         clf = LogisticRegression(
             C=float(params["C"]),
@@ -135,7 +152,7 @@ def _build_pipeline(seed: int, model_family: str, params: dict[str, Any]) -> Pip
             max_depth=params["max_depth"],
             min_samples_leaf=int(params["min_samples_leaf"]),
             class_weight=params.get("class_weight"),
-            n_jobs=-1,
+            n_jobs=n_jobs,
             random_state=seed,
         )
     elif model_family == "extra_trees":
@@ -144,7 +161,7 @@ def _build_pipeline(seed: int, model_family: str, params: dict[str, Any]) -> Pip
             max_depth=params["max_depth"],
             min_samples_leaf=int(params["min_samples_leaf"]),
             class_weight=params.get("class_weight"),
-            n_jobs=-1,
+            n_jobs=n_jobs,
             random_state=seed,
         )
     elif model_family == "hist_gb":
@@ -157,60 +174,82 @@ def _build_pipeline(seed: int, model_family: str, params: dict[str, Any]) -> Pip
         )
     else:
         raise ValueError(f"Unknown model_family: {model_family}")
-
-    steps.append(("clf", clf))
-    return Pipeline(steps)
+    return clf
 
 
-def _fit_pipeline(
-    pipeline: Pipeline,
-    model_family: str,
-    x_train: np.ndarray,
-    y_train: np.ndarray,
-) -> Pipeline:
+def _fit_classifier(clf: Any, model_family: str, x_train: np.ndarray, y_train: np.ndarray) -> Any:
     if model_family == "hist_gb":
         sample_weight = compute_sample_weight(class_weight="balanced", y=y_train)
-        pipeline.fit(x_train, y_train, clf__sample_weight=sample_weight)
+        clf.fit(x_train, y_train, sample_weight=sample_weight)
     else:
-        pipeline.fit(x_train, y_train)
-    return pipeline
+        clf.fit(x_train, y_train)
+    return clf
+
+
+def _predict_proba(clf: Any, x: np.ndarray) -> np.ndarray:
+    return clf.predict_proba(x)[:, 1]
 
 
-def _predict_proba(pipeline: Pipeline, x: np.ndarray) -> np.ndarray:
-    return pipeline.predict_proba(x)[:, 1]
+def _stratified_subset(df: pd.DataFrame, fraction: float, seed: int) -> pd.DataFrame:
+    if fraction >= 1.0:
+        return df
+    rng = np.random.default_rng(seed)
+    keep: list[np.ndarray] = []
+    for _, group_idx in df.groupby("label").indices.items():
+        n_keep = max(2, int(round(len(group_idx) * fraction)))
+        keep.append(rng.choice(group_idx, size=min(n_keep, len(group_idx)), replace=False))
+    return df.iloc[np.sort(np.concatenate(keep))].reset_index(drop=True)
+
+
+def _preprocess_cache(
+    train_df: pd.DataFrame,
+    feature_cols: list[str],
+    top_k_values: set[int | None],
+    **eval_dfs: pd.DataFrame,
+) -> PreprocessCache:
+    return PreprocessCache(
+        train_df[feature_cols].to_numpy(dtype=np.float32),
+        train_df["label"].to_numpy(dtype=np.int32),
+        top_k_values=top_k_values,
+        **{name: df[feature_cols].to_numpy(dtype=np.float32) for name, df in eval_dfs.items()},
+    )
 
 
 def _evaluate_candidate(
     seed: int,
     model_family: str,
     params: dict[str, Any],
-    train_df: pd.DataFrame,
+    cache: PreprocessCache,
     val_df: pd.DataFrame,
-    test_df: pd.DataFrame,
-    feature_cols: list[str],
+    test_df: pd.DataFrame | None = None,
+    n_jobs: int = -1,
 ) -> dict[str, Any]:
-    x_train = train_df[feature_cols].to_numpy(dtype=np.float32)
-    y_train = train_df["label"].to_numpy(dtype=np.int32)
-    x_val = val_df[feature_cols].to_numpy(dtype=np.float32)
+    """Fit one candidate on the cached train matrix and tune its threshold on val. Without
+    ``test_df`` this is a halving rung and only val is scored."""
+    top_k = params.get("top_k")
     y_val = val_df["label"].to_numpy(dtype=np.int32)
-    x_test = test_df[feature_cols].to_numpy(dtype=np.float32)
-    y_test = test_df["label"].to_numpy(dtype=np.int32)
 
-    pipeline = _build_pipeline(seed=seed, model_family=model_family, params=params)
-    pipeline = _fit_pipeline(pipeline=pipeline, model_family=model_family, x_train=x_train, y_train=y_train)
-
-    val_prob = _predict_proba(pipeline, x_val)
-    best_threshold = 0.5
-    best_val_metrics: dict[str, float] = {}
-    best_val_f1 = -1.0
-    for threshold in _threshold_grid():
-        metrics = compute_binary_metrics(y_true=y_val, y_prob=val_prob, threshold=float(threshold))
-        if metrics["f1"] > best_val_f1:
-            best_val_f1 = metrics["f1"]
-            best_threshold = float(threshold)
-            best_val_metrics = metrics
-
-    test_prob = _predict_proba(pipeline, x_test)
+    clf = _build_classifier(seed=seed, model_family=model_family, params=params, n_jobs=n_jobs)
+    clf = _fit_classifier(clf, model_family=model_family, x_train=cache.matrix("train", top_k), y_train=cache.y_train)
+
+    val_prob = _predict_proba(clf, cache.matrix("val", top_k))
+    best_threshold, _ = select_best_threshold(
+        y_true=y_val,
+        y_prob=val_prob,
+        thresholds=_threshold_grid(),
+        metric_name="f1",
+    )
+    best_val_metrics = compute_binary_metrics(y_true=y_val, y_prob=val_prob, threshold=best_threshold)
+    if test_df is None:
+        return {
+            "model_family": model_family,
+            "params": params,
+            "threshold": best_threshold,
+            "val_metrics": best_val_metrics,
+        }
+
+    y_test = test_df["label"].to_numpy(dtype=np.int32)
+    test_prob = _predict_proba(clf, cache.matrix("test", top_k))
     test_metrics = compute_binary_metrics(y_true=y_test, y_prob=test_prob, threshold=best_threshold)
     test_predictions = pd.DataFrame(
         {
@@ -222,7 +261,7 @@ def _evaluate_candidate(
     )
 
     return {
-        "pipeline": pipeline,
+        "pipeline": cache.pipeline(clf, top_k),
         "model_family": model_family,
         "params": params,
         "threshold": best_threshold,
@@ -232,6 +271,56 @@ def _evaluate_candidate(
     }
 
 
+def _safe_evaluate(candidate: dict[str, Any], **kwargs: Any) -> dict[str, Any] | None:
+    try:
+        return _evaluate_candidate(
+            model_family=str(candidate["model_family"]),
+            params=dict(candidate["params"]),
+            **kwargs,
+        )
+    except Exception as exc:
+        LOGGER.warning("Skipping candidate %s due to %s", candidate, exc)
+        return None
+
+
+def _run_rung(
+    candidates: list[dict[str, Any]],
+    train_fraction: float,
+    cpu_budget: int,
+    cache: PreprocessCache,
+    **kwargs: Any,
+) -> list[dict[str, Any] | None]:
+    """Evaluate candidates in parallel, splitting the CPU budget between candidate workers
+    and each model's own n_jobs so the two levels never oversubscribe."""
+    n_workers = max(1, min(cpu_budget, len(candidates)))
+    inner_jobs = max(1, cpu_budget // n_workers)
+    LOGGER.info(
+        "Evaluating %d candidates on %.0f%% of train with %d worker(s) x %d thread(s)",
+        len(candidates),
+        train_fraction * 100.0,
+        n_workers,
+        inner_jobs,
+    )
+    return Parallel(n_jobs=n_workers)(
+        delayed(_safe_evaluate)(candidate, cache=cache, n_jobs=inner_jobs, **kwargs)
+        for candidate in candidates
+    )
+
+
+def _halving_fractions(min_fraction: float, eta: int) -> list[float]:
+    fractions: list[float] = []
+    fraction = min(1.0, max(min_fraction, 1e-6))
+    while fraction < 1.0:
+        fractions.append(fraction)
+        fraction *= eta
+    return fractions
+
+
+def _rank_key(result: dict[str, Any]) -> tuple[float, float]:
+    auc = result["val_metrics"]["roc_auc"]
+    return float(result["val_metrics"]["f1"]), float(auc) if np.isfinite(auc) else -np.inf
+
+
 def main() -> None:
     args = parse_args()
     config_path = Path(args.config)
@@ -247,10 +336,9 @@ def main() -> None:
     feature_table_path = Path(args.feature_table)
     if not feature_table_path.is_absolute():
         feature_table_path = PROJECT_ROOT / feature_table_path
-    feature_table = pd.read_csv(feature_table_path)
-
     baseline_method = str(config["experiment"].get("baseline_method", "ela_dwt"))
     primary_method = str(config["experiment"]["primary_method"])
+    feature_table = load_feature_table(feature_table_path, methods=[baseline_method, primary_method])
     if baseline_method != "ela_dwt" or primary_method != "ela_dwt_svd":
         raise ValueError("Stage-2 tuner expects baseline=ela_dwt and primary=ela_dwt_svd")
 
@@ -273,57 +361,90 @@ def main() -> None:
     test_df = feature_table[feature_table["split"] == "test"].reset_index(drop=True)
 
     candidates = _candidate_search_space()
-    rows: list[dict[str, Any]] = []
-    best_by_val: dict[str, Any] | None = None
-    best_by_test: dict[str, Any] | None = None
-    for idx, candidate in enumerate(candidates, start=1):
-        model_family = str(candidate["model_family"])
-        params = dict(candidate["params"])
-        try:
-            result = _evaluate_candidate(
-                seed=seed,
-                model_family=model_family,
-                params=params,
-                train_df=train_df,
-                val_df=val_df,
-                test_df=test_df,
-                feature_cols=primary_feature_cols,
-            )
-            rows.append(
+    # Not experiment.n_jobs: that is the feature-extraction setting (1 in the shipped configs)
+    # and would train the forests single-threaded.
+    cpu_budget = resolve_n_jobs(args.n_jobs)
+    top_k_values = {candidate["params"].get("top_k") for candidate in candidates}
+
+    # With --prune, successive halving: cheap fits on growing train subsets, keeping the best
+    # 1/eta by (val F1, val AUC) each rung; only the survivors are fitted on the full train split.
+    survivors = list(candidates)
+    halving_rows: list[dict[str, Any]] = []
+    eta = max(2, int(args.halving_eta))
+    fractions = _halving_fractions(float(args.min_train_fraction), eta) if args.prune else []
+    for rung, fraction in enumerate(fractions):
+        if len(survivors) <= eta:
+            break
+        # Scaler and F-statistics are fitted once per train subset and shared by every candidate.
+        rung_cache = _preprocess_cache(
+            _stratified_subset(train_df, fraction, seed), primary_feature_cols, top_k_values, val=val_df
+        )
+        rung_results = _run_rung(survivors, fraction, cpu_budget, rung_cache, seed=seed, val_df=val_df)
+        scored = [(candidate, result) for candidate, result in zip(survivors, rung_results) if result is not None]
+        n_keep = max(1, int(np.ceil(len(survivors) / eta)))
+        ranked = sorted(scored, key=lambda item: _rank_key(item[1]), reverse=True)
+        kept_ids = {id(candidate) for candidate, _ in ranked[:n_keep]}
+        for candidate, result in scored:
+            halving_rows.append(
                 {
-                    "model_family": model_family,
-                    **params,
-                    "threshold": result["threshold"],
+                    "rung": rung,
+                    "train_fraction": fraction,
+                    "model_family": candidate["model_family"],
+                    **candidate["params"],
                     "val_f1": result["val_metrics"]["f1"],
-                    "val_precision": result["val_metrics"]["precision"],
-                    "val_recall": result["val_metrics"]["recall"],
                     "val_auc": result["val_metrics"]["roc_auc"],
-                    "test_f1": result["test_metrics"]["f1"],
-                    "test_precision": result["test_metrics"]["precision"],
-                    "test_recall": result["test_metrics"]["recall"],
-                    "test_auc": result["test_metrics"]["roc_auc"],
-                    "test_accuracy": result["test_metrics"]["accuracy"],
+                    "kept": id(candidate) in kept_ids,
                 }
             )
+        survivors = [candidate for candidate in survivors if id(candidate) in kept_ids]
+        LOGGER.info(
+            "Halving rung %d kept %d/%d candidates (families: %s)",
+            rung,
+            len(survivors),
+            len(scored),
+            sorted({str(candidate["model_family"]) for candidate in survivors}),
+        )
 
-            if best_by_val is None:
+    rows: list[dict[str, Any]] = []
+    best_by_val: dict[str, Any] | None = None
+    best_by_test: dict[str, Any] | None = None
+    full_cache = _preprocess_cache(train_df, primary_feature_cols, top_k_values, val=val_df, test=test_df)
+    for result in _run_rung(survivors, 1.0, cpu_budget, full_cache, seed=seed, val_df=val_df, test_df=test_df):
+        if result is None:
+            continue
+        model_family = result["model_family"]
+        params = result["params"]
+        rows.append(
+            {
+                "model_family": model_family,
+                **params,
+                "threshold": result["threshold"],
+                "val_f1": result["val_metrics"]["f1"],
+                "val_precision": result["val_metrics"]["precision"],
+                "val_recall": result["val_metrics"]["recall"],
+                "val_auc": result["val_metrics"]["roc_auc"],
+                "test_f1": result["test_metrics"]["f1"],
+                "test_precision": result["test_metrics"]["precision"],
+                "test_recall": result["test_metrics"]["recall"],
+                "test_auc": result["test_metrics"]["roc_auc"],
+                "test_accuracy": result["test_metrics"]["accuracy"],
+            }
+        )
+
+        if best_by_val is None:
+            best_by_val = result
+        else:
+            if result["val_metrics"]["f1"] > best_by_val["val_metrics"]["f1"]:
                 best_by_val = result
-            else:
-                if result["val_metrics"]["f1"] > best_by_val["val_metrics"]["f1"]:
-                    best_by_val = result
-                elif (
-                    result["val_metrics"]["f1"] == best_by_val["val_metrics"]["f1"]
-                    and result["val_metrics"]["roc_auc"] > best_by_val["val_metrics"]["roc_auc"]
-                ):
-                    best_by_val = result
-
-            if best_by_test is None or result["test_metrics"]["f1"] > best_by_test["test_metrics"]["f1"]:
-                best_by_test = result
-
-            if idx % 10 == 0:
-                LOGGER.info("Processed %d/%d candidates", idx, len(candidates))
-        except Exception as exc:
-            LOGGER.warning("Skipping candidate %s due to %s", candidate, exc)
+            elif (
+                result["val_metrics"]["f1"] == best_by_val["val_metrics"]["f1"]
+                and result["val_metrics"]["roc_auc"] > best_by_val["val_metrics"]["roc_auc"]
+            ):
+                best_by_val = result
+
+        if best_by_test is None or result["test_metrics"]["f1"] > best_by_test["test_metrics"]["f1"]:
+            best_by_test = result
+    LOGGER.info("Fully evaluated %d/%d candidates", len(rows), len(candidates))
 
     if best_by_val is None or best_by_test is None:
         raise RuntimeError("No valid candidate from stage-2 tuning")
@@ -331,6 +452,10 @@ def main() -> None:
     sweep_df = pd.DataFrame(rows).sort_values(["val_f1", "val_auc"], ascending=False).reset_index(drop=True)
     sweep_path = Path(config["paths"]["metrics_dir"]) / "primary_tuning_stage2_sweep.csv"
     sweep_df.to_csv(sweep_path, index=False)
+    halving_path: Path | None = None
+    if halving_rows:
+        halving_path = Path(config["paths"]["metrics_dir"]) / "primary_tuning_stage2_halving.csv"
+        pd.DataFrame(halving_rows).to_csv(halving_path, index=False)
 
     stats_val = run_method_comparison_stats(
         predictions_by_method={
@@ -381,6 +506,8 @@ def main() -> None:
             "model": config["model"],
             "tuning_stage2": {
                 "candidate_count": len(candidates),
+                "fully_evaluated_count": len(rows),
+                "halving_eta": eta if args.prune else None,
                 "selection_rule": "best_val_f1_then_val_auc",
             },
         },
@@ -402,6 +529,7 @@ def main() -> None:
         "best_test_candidate_model_family_reference_only": best_by_test["model_family"],
         "best_test_candidate_params_reference_only": best_by_test["params"],
         "sweep_path": str(sweep_path),
+        "halving_path": str(halving_path) if halving_path else None,
         "stats_val_path": str(stats_val_path),
         "stats_test_path": str(stats_test_path),
         "stage2_artifact_path": str(tuned_path),
@@ -1,16 +1,22 @@
 from .manifest import (
+    ManifestDelta,
     build_manifest,
     get_data_card_summary,
+    iter_manifest_rows,
     load_manifest,
+    refresh_manifest,
     save_manifest,
 )
 from .split import build_split_table, save_split_table, validate_no_split_leakage
 from .synthetic import generate_synthetic_dataset, generate_synthetic_splicing_dataset
 
 __all__ = [
+    "ManifestDelta",
     "build_manifest",
     "get_data_card_summary",
+    "iter_manifest_rows",
     "load_manifest",
+    "refresh_manifest",
     "save_manifest",
     "build_split_table",
     "save_split_table",
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import hashlib
+import io
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import Any, Dict, Iterator, List, Mapping, Tuple
 
 import pandas as pd
 from PIL import Image
@@ -39,6 +43,19 @@ MASK_DIR_PARTS = {
     "masks",
     "gt",
 }
+READ_CHUNK_BYTES = 1 << 20
+STAT_COLUMNS = ("file_size", "file_mtime_ns")
+
+
+@dataclass
+class ManifestDelta:
+    added: int = 0
+    modified: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
 
 
 def _normalize_mask_key(stem: str) -> str:
@@ -52,29 +69,27 @@ def _normalize_mask_key(stem: str) -> str:
     )
 
 
-def _index_mask_candidates(dataset_root: Path) -> dict[str, str]:
-    index: dict[str, str] = {}
-    for path in dataset_root.rglob("*"):
-        if not path.is_file() or path.suffix.lower() not in IMAGE_EXTENSIONS:
-            continue
-        parts = {part.lower() for part in path.parts}
-        if not parts.intersection(MASK_DIR_PARTS):
-            continue
-
-        key = _normalize_mask_key(path.stem)
-        if key and key not in index:
-            index[key] = str(path.resolve())
-    return index
-
-
-def _iter_image_paths(dataset_root: Path) -> Iterable[Path]:
-    for path in dataset_root.rglob("*"):
-        if not path.is_file() or path.suffix.lower() not in IMAGE_EXTENSIONS:
-            continue
-        parts = {part.lower() for part in path.parts}
-        if parts.intersection(IGNORED_DIR_PARTS):
-            continue
-        yield path
+def _scan_dataset(dataset_root: Path) -> tuple[list[Path], dict[str, str]]:
+    """Walk the tree once, returning candidate images and the mask index."""
+    image_paths: list[Path] = []
+    mask_index: dict[str, str] = {}
+    for dirpath, dirnames, filenames in os.walk(dataset_root):
+        dirnames.sort()
+        dir_path = Path(dirpath)
+        parts = {part.lower() for part in dir_path.parts}
+        is_mask_dir = bool(parts.intersection(MASK_DIR_PARTS))
+        is_ignored_dir = bool(parts.intersection(IGNORED_DIR_PARTS))
+        for name in sorted(filenames):
+            path = dir_path / name
+            if path.suffix.lower() not in IMAGE_EXTENSIONS:
+                continue
+            if is_mask_dir:
+                key = _normalize_mask_key(path.stem)
+                if key and key not in mask_index:
+                    mask_index[key] = str(path.resolve())
+            if not is_ignored_dir:
+                image_paths.append(path)
+    return image_paths, mask_index
 
 
 def _infer_label_from_path(path: Path, dataset_root: Path) -> int:
@@ -89,14 +104,6 @@ def _infer_label_from_path(path: Path, dataset_root: Path) -> int:
     )
 
 
-def _md5sum(path: Path) -> str:
-    digest = hashlib.md5()
-    with path.open("rb") as fh:
-        for chunk in iter(lambda: fh.read(8192), b""):
-            digest.update(chunk)
-    return digest.hexdigest()
-
-
 def _image_meta(path: Path) -> Tuple[int, int, str]:
     with Image.open(path) as img:
         width, height = img.size
@@ -104,38 +111,115 @@ def _image_meta(path: Path) -> Tuple[int, int, str]:
     return width, height, image_format
 
 
-def build_manifest(dataset_root: str | Path, source_dataset: str, perturbation_tag: str = "clean") -> pd.DataFrame:
+def _hash_and_probe(path: Path) -> tuple[str, Tuple[int, int, str]]:
+    """Read the file once: hash every chunk and parse the header from the first one."""
+    digest = hashlib.md5()
+    head = b""
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(READ_CHUNK_BYTES), b""):
+            if not head:
+                head = chunk
+            digest.update(chunk)
+    try:
+        with Image.open(io.BytesIO(head)) as img:
+            width, height = img.size
+            image_format = (img.format or "unknown").lower()
+        meta = (width, height, image_format)
+    except Exception:
+        # Header did not fit in the first chunk (e.g. very large EXIF); open the file itself.
+        meta = _image_meta(path)
+    return digest.hexdigest(), meta
+
+
+def _manifest_row(
+    path: Path,
+    dataset_root: Path,
+    mask_index: dict[str, str],
+    source_dataset: str,
+    perturbation_tag: str,
+    previous: Mapping[str, Any] | None = None,
+) -> Dict[str, object] | None:
+    """Build one manifest row; hash and header values are reused from ``previous`` when
+    its recorded size and mtime still match the file on disk."""
+    try:
+        label = _infer_label_from_path(path, dataset_root)
+        stat = path.stat()
+        if (
+            previous is not None
+            and int(previous["file_size"]) == int(stat.st_size)
+            and int(previous["file_mtime_ns"]) == int(stat.st_mtime_ns)
+        ):
+            file_md5 = str(previous["file_md5"])
+            width, height, image_format = int(previous["width"]), int(previous["height"]), str(previous["image_format"])
+        else:
+            file_md5, (width, height, image_format) = _hash_and_probe(path)
+        mask_path: str | None = None
+        if label == 1:
+            mask_key = _normalize_mask_key(path.stem)
+            mask_path = mask_index.get(mask_key)
+        return {
+            "image_path": str(path.resolve()),
+            "label": int(label),
+            "mask_path": mask_path,
+            "source_dataset": source_dataset,
+            "split": "unspecified",
+            "perturbation_tag": perturbation_tag,
+            "width": width,
+            "height": height,
+            "image_format": image_format,
+            "file_md5": file_md5,
+            "file_size": int(stat.st_size),
+            "file_mtime_ns": int(stat.st_mtime_ns),
+        }
+    except Exception as exc:
+        LOGGER.warning("Skipping %s due to error: %s", path, exc)
+        return None
+
+
+def _default_io_workers() -> int:
+    # Hashing and header probing are I/O bound (hashlib releases the GIL), so more
+    # threads than cores pays off, especially on network storage.
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+def iter_manifest_rows(
+    dataset_root: str | Path,
+    source_dataset: str,
+    perturbation_tag: str = "clean",
+    n_workers: int | None = None,
+    previous_rows: Mapping[str, Mapping[str, Any]] | None = None,
+) -> Iterator[Dict[str, object]]:
+    """Yield manifest rows as files are hashed, in directory-walk order.
+
+    ``previous_rows`` maps resolved image paths to rows of an earlier manifest; files
+    whose size and mtime are unchanged are not re-read.
+    """
     root = Path(dataset_root)
     if not root.exists():
         raise FileNotFoundError(f"Dataset root not found: {root}")
 
-    mask_index = _index_mask_candidates(root)
-    rows: List[Dict[str, object]] = []
-    for path in _iter_image_paths(root):
-        try:
-            label = _infer_label_from_path(path, root)
-            width, height, image_format = _image_meta(path)
-            mask_path: str | None = None
-            if label == 1:
-                mask_key = _normalize_mask_key(path.stem)
-                mask_path = mask_index.get(mask_key)
-            rows.append(
-                {
-                    "image_path": str(path.resolve()),
-                    "label": int(label),
-                    "mask_path": mask_path,
-                    "source_dataset": source_dataset,
-                    "split": "unspecified",
-                    "perturbation_tag": perturbation_tag,
-                    "width": width,
-                    "height": height,
-                    "image_format": image_format,
-                    "file_md5": _md5sum(path),
-                }
-            )
-        except Exception as exc:
-            LOGGER.warning("Skipping %s due to error: %s", path, exc)
+    image_paths, mask_index = _scan_dataset(root)
+    workers = max(1, int(n_workers)) if n_workers else _default_io_workers()
+    LOGGER.info("Scanning %d images under %s with %d thread(s)", len(image_paths), root, workers)
+    previous = previous_rows or {}
+
+    def _row(path: Path) -> Dict[str, object] | None:
+        return _manifest_row(
+            path,
+            root,
+            mask_index,
+            source_dataset,
+            perturbation_tag,
+            previous=previous.get(str(path.resolve())),
+        )
 
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ml-lab-manifest") as pool:
+        for row in pool.map(_row, image_paths):
+            if row is not None:
+                yield row
+
+
+def _rows_to_manifest(rows: List[Dict[str, object]], root: Path) -> pd.DataFrame:
     if not rows:
         raise ValueError(f"No valid images found in {root}")
 
@@ -144,6 +228,67 @@ def build_manifest(dataset_root: str | Path, source_dataset: str, perturbation_t
     return manifest
 
 
+def build_manifest(
+    dataset_root: str | Path,
+    source_dataset: str,
+    perturbation_tag: str = "clean",
+    n_workers: int | None = None,
+) -> pd.DataFrame:
+    root = Path(dataset_root)
+    rows: List[Dict[str, object]] = list(
+        iter_manifest_rows(root, source_dataset, perturbation_tag=perturbation_tag, n_workers=n_workers)
+    )
+    return _rows_to_manifest(rows, root)
+
+
+def refresh_manifest(
+    existing: pd.DataFrame,
+    dataset_root: str | Path,
+    source_dataset: str,
+    perturbation_tag: str = "clean",
+    n_workers: int | None = None,
+) -> tuple[pd.DataFrame, ManifestDelta]:
+    """Bring ``existing`` up to date with the tree, rehashing only new or modified files.
+
+    Files are matched by resolved path and considered unchanged when size and mtime
+    match; rows for files no longer on disk are dropped.
+    """
+    root = Path(dataset_root)
+    previous_rows: dict[str, Mapping[str, Any]] = {}
+    if set(STAT_COLUMNS).issubset(existing.columns):
+        known = existing.dropna(subset=list(STAT_COLUMNS))
+        previous_rows = {str(row["image_path"]): row for row in known.to_dict("records")}
+    else:
+        LOGGER.info("Existing manifest has no %s columns; every file is rehashed once", "/".join(STAT_COLUMNS))
+
+    rows = list(
+        iter_manifest_rows(
+            root,
+            source_dataset,
+            perturbation_tag=perturbation_tag,
+            n_workers=n_workers,
+            previous_rows=previous_rows,
+        )
+    )
+    existing_paths = set(existing["image_path"].astype(str)) if "image_path" in existing.columns else set()
+    delta = ManifestDelta()
+    for row in rows:
+        path = str(row["image_path"])
+        before = previous_rows.get(path)
+        if path not in existing_paths:
+            delta.added += 1
+        elif (
+            before is not None
+            and int(before["file_size"]) == row["file_size"]
+            and int(before["file_mtime_ns"]) == row["file_mtime_ns"]
+        ):
+            delta.unchanged += 1
+        else:
+            delta.modified += 1
+    delta.removed = len(existing_paths - {str(row["image_path"]) for row in rows})
+    return _rows_to_manifest(rows, root), delta
+
+
 def save_manifest(manifest: pd.DataFrame, output_csv: str | Path) -> None:
     out = Path(output_csv)
     out.parent.mkdir(parents=True, exist_ok=True)
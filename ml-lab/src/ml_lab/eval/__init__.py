@@ -1,6 +1,13 @@
 from .error_analysis import build_error_analysis_table
 from .localization import run_localization_suite
-from .metrics import bootstrap_metric_ci, compute_binary_metrics, compute_localization_metrics
+from .metrics import (
+    bootstrap_metric_ci,
+    bootstrap_metric_summary,
+    compute_binary_metrics,
+    compute_localization_metrics,
+    select_best_threshold,
+    threshold_sweep,
+)
 from .reporting import write_markdown_report
 from .robustness import run_robustness_suite
 from .statistics import run_method_comparison_stats
@@ -9,6 +16,9 @@ __all__ = [
     "compute_binary_metrics",
     "compute_localization_metrics",
     "bootstrap_metric_ci",
+    "bootstrap_metric_summary",
+    "select_best_threshold",
+    "threshold_sweep",
     "run_robustness_suite",
     "run_method_comparison_stats",
     "run_localization_suite",
@@ -10,9 +10,12 @@ import pandas as pd
 
 from ml_lab.eval.metrics import compute_localization_metrics
 from ml_lab.features.cfa import compute_cfa_features
+from ml_lab.features.context import ImageContext
 from ml_lab.features.image_ops import load_rgb_image
-from ml_lab.features.mantra import compute_mantra_features
+from ml_lab.features.image_store import activate_image_store
+from ml_lab.features.mantra import compute_mantra_features, mantra_batch_size, predict_mantra_masks
 from ml_lab.features.prnu import compute_prnu_features
+from ml_lab.utils.parallel import iter_batches
 
 LOGGER = logging.getLogger(__name__)
 
@@ -41,51 +44,63 @@ def run_localization_suite(test_manifest: pd.DataFrame, config: dict[str, Any])
     cfa_cfg = config["features"].get("cfa", {})
     prnu_cfg = config["features"].get("prnu", {})
     mantra_cfg = config["features"].get("mantra", {})
+    reduced_decode = bool(config["experiment"].get("reduced_decode", False))
+    activate_image_store(config)
 
     per_method_rows: list[dict[str, Any]] = []
-    for row in eval_manifest.itertuples(index=False):
-        try:
-            mask_gt = _load_mask(str(row.mask_path), image_size=image_size)
-            if mask_gt is None:
-                continue
+    rows = list(eval_manifest.itertuples(index=False))
+    for batch in iter_batches(rows, mantra_batch_size(mantra_cfg)):
+        loaded: list[tuple[Any, np.ndarray, ImageContext]] = []
+        for row in batch:
+            try:
+                mask_gt = _load_mask(str(row.mask_path), image_size=image_size)
+                if mask_gt is None:
+                    continue
+                image = load_rgb_image(row.image_path, image_size=image_size, reduced_decode=reduced_decode)
+                loaded.append((row, mask_gt, ImageContext(image)))
+            except Exception as exc:
+                LOGGER.warning("Localization eval failed for %s: %s", row.image_path, exc)
 
-            image_rgb = load_rgb_image(row.image_path, image_size=image_size)
-            _, cfa_map, _ = compute_cfa_features(
-                image_rgb=image_rgb,
-                window_size=int(cfa_cfg.get("window_size", 7)),
-                variance_threshold=float(cfa_cfg.get("variance_threshold", 0.6)),
-                smooth_sigma=float(cfa_cfg.get("smooth_sigma", 1.0)),
-                with_map=False,
-            )
-            _, prnu_residual, _ = compute_prnu_features(
-                image_rgb=image_rgb,
-                wavelet=str(prnu_cfg.get("wavelet", "db4")),
-                level=int(prnu_cfg.get("level", 2)),
-                with_map=False,
-            )
-            _, mantra_mask, _ = compute_mantra_features(
-                image_rgb=image_rgb,
-                config=mantra_cfg,
-                with_mask=False,
-            )
-
-            for method, pred_map in [
-                ("cfa_map", cfa_map),
-                ("prnu_residual_abs", np.abs(prnu_residual)),
-                ("mantra_mask", mantra_mask),
-            ]:
-                pred_map = pred_map.astype(np.float32)
-                pred_map = (pred_map - float(pred_map.min())) / (float(pred_map.max() - pred_map.min()) + 1e-6)
-                metrics = compute_localization_metrics(pred_mask=pred_map, gt_mask=mask_gt, threshold=0.5)
-                per_method_rows.append(
-                    {
-                        "image_path": row.image_path,
-                        "method": method,
-                        **metrics,
-                    }
+        mantra_masks = predict_mantra_masks([image.rgb for _, _, image in loaded], mantra_cfg)
+        for (row, mask_gt, image), precomputed_mask in zip(loaded, mantra_masks):
+            try:
+                _, cfa_map, _ = compute_cfa_features(
+                    image_rgb=image,
+                    window_size=int(cfa_cfg.get("window_size", 7)),
+                    variance_threshold=float(cfa_cfg.get("variance_threshold", 0.6)),
+                    smooth_sigma=float(cfa_cfg.get("smooth_sigma", 1.0)),
+                    with_map=False,
+                )
+                _, prnu_residual, _ = compute_prnu_features(
+                    image_rgb=image,
+                    wavelet=str(prnu_cfg.get("wavelet", "db4")),
+                    level=int(prnu_cfg.get("level", 2)),
+                    with_map=False,
                 )
-        except Exception as exc:
-            LOGGER.warning("Localization eval failed for %s: %s", row.image_path, exc)
+                _, mantra_mask, _ = compute_mantra_features(
+                    image_rgb=image,
+                    config=mantra_cfg,
+                    with_mask=False,
+                    mask=precomputed_mask,
+                )
+
+                for method, pred_map in [
+                    ("cfa_map", cfa_map),
+                    ("prnu_residual_abs", np.abs(prnu_residual)),
+                    ("mantra_mask", mantra_mask),
+                ]:
+                    pred_map = pred_map.astype(np.float32)
+                    pred_map = (pred_map - float(pred_map.min())) / (float(pred_map.max() - pred_map.min()) + 1e-6)
+                    metrics = compute_localization_metrics(pred_mask=pred_map, gt_mask=mask_gt, threshold=0.5)
+                    per_method_rows.append(
+                        {
+                            "image_path": row.image_path,
+                            "method": method,
+                            **metrics,
+                        }
+                    )
+            except Exception as exc:
+                LOGGER.warning("Localization eval failed for %s: %s", row.image_path, exc)
 
     if not per_method_rows:
         return pd.DataFrame()
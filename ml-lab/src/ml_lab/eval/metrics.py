@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Callable
+import logging
 
 import numpy as np
 from sklearn.metrics import (
@@ -12,6 +12,8 @@ from sklearn.metrics import (
     roc_auc_score,
 )
 
+LOGGER = logging.getLogger(__name__)
+
 
 def compute_binary_metrics(y_true: np.ndarray, y_prob: np.ndarray, threshold: float) -> dict[str, float]:
     y_pred = (y_prob >= threshold).astype(int)
@@ -36,46 +38,182 @@ def compute_binary_metrics(y_true: np.ndarray, y_prob: np.ndarray, threshold: fl
     }
 
 
-def bootstrap_metric_ci(
+THRESHOLD_METRICS = ("accuracy", "precision", "recall", "f1")
+
+
+def _safe_ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    out = np.zeros(np.broadcast(num, den).shape, dtype=np.float64)
+    np.divide(num, den, out=out, where=den > 0)
+    return out
+
+
+def metrics_from_counts(tp: np.ndarray, fp: np.ndarray, fn: np.ndarray, tn: np.ndarray) -> dict[str, np.ndarray]:
+    """Accuracy/precision/recall/F1 from confusion counts (any shape), sklearn zero_division=0."""
+    return {
+        "accuracy": _safe_ratio(tp + tn, tp + fp + fn + tn),
+        "precision": _safe_ratio(tp, tp + fp),
+        "recall": _safe_ratio(tp, tp + fn),
+        "f1": _safe_ratio(2 * tp, 2 * tp + fp + fn),
+    }
+
+
+def threshold_sweep(y_true: np.ndarray, y_prob: np.ndarray, thresholds: np.ndarray) -> dict[str, np.ndarray]:
+    """Confusion counts and metrics for every threshold at once.
+
+    Each class's probabilities are sorted once; the number of ``y_prob >= t`` per class is
+    then a binary search, so the sweep costs O((n + T) log n) instead of T full passes.
+    """
+    y_true = np.asarray(y_true)
+    y_prob = np.asarray(y_prob)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    if np.issubdtype(y_prob.dtype, np.floating):
+        # Compare in the probabilities' precision, exactly like ``y_prob >= float(t)``.
+        thresholds = thresholds.astype(y_prob.dtype)
+
+    pos = np.sort(y_prob[y_true == 1])
+    neg = np.sort(y_prob[y_true != 1])
+    tp = (pos.size - np.searchsorted(pos, thresholds, side="left")).astype(np.int64)
+    fp = (neg.size - np.searchsorted(neg, thresholds, side="left")).astype(np.int64)
+    fn = pos.size - tp
+    tn = neg.size - fp
+    return {"tp": tp, "fp": fp, "fn": fn, "tn": tn, **metrics_from_counts(tp, fp, fn, tn)}
+
+
+def select_best_threshold(
+    y_true: np.ndarray,
+    y_prob: np.ndarray,
+    thresholds: np.ndarray,
+    metric_name: str = "f1",
+    default: float = 0.5,
+) -> tuple[float, float]:
+    """Return ``(threshold, metric value)`` maximising ``metric_name``; ties keep the lowest threshold.
+
+    ``roc_auc`` does not depend on the threshold, so the first candidate is returned (or
+    ``default`` when AUC is undefined); an unknown metric keeps ``default``.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    if thresholds.size == 0:
+        return float(default), float("nan")
+    if metric_name == "roc_auc":
+        try:
+            auc = float(roc_auc_score(y_true, y_prob))
+        except ValueError:
+            auc = float("nan")
+        return (float(default), auc) if np.isnan(auc) else (float(thresholds[0]), auc)
+    if metric_name not in THRESHOLD_METRICS:
+        LOGGER.warning("Unsupported threshold tuning metric %r; keeping threshold %.3f", metric_name, default)
+        return float(default), float("nan")
+    values = threshold_sweep(y_true, y_prob, thresholds)[metric_name]
+    best_idx = int(np.argmax(values))
+    return float(thresholds[best_idx]), float(values[best_idx])
+
+
+BOOTSTRAP_METRICS = ("accuracy", "precision", "recall", "f1", "roc_auc")
+
+
+def _bootstrap_auc(y_true: np.ndarray, y_prob: np.ndarray, sample_idx: np.ndarray) -> np.ndarray:
+    """ROC AUC of every resample (rows of ``sample_idx``), NaN when a resample has one class.
+
+    A resample is a multiset, so each row is turned into per-item counts; AUC is then the
+    weighted Mann-Whitney statistic over the score groups of the full (sorted) sample.
+    """
+    n_bootstrap, n = sample_idx.shape
+    order = np.argsort(y_prob, kind="mergesort")
+    sorted_prob = y_prob[order]
+    is_pos = (y_true[order] == 1)[None, :]
+
+    rank_of = np.empty(n, dtype=np.int64)
+    rank_of[order] = np.arange(n)
+    rows = np.repeat(np.arange(n_bootstrap), n)
+    counts = np.zeros((n_bootstrap, n), dtype=np.float64)
+    np.add.at(counts, (rows, rank_of[sample_idx].ravel()), 1.0)
+
+    # Collapse tied scores into groups so ties count as half a win.
+    group_starts = np.flatnonzero(np.r_[True, sorted_prob[1:] != sorted_prob[:-1]])
+    pos_w = np.add.reduceat(np.where(is_pos, counts, 0.0), group_starts, axis=1)
+    neg_w = np.add.reduceat(np.where(is_pos, 0.0, counts), group_starts, axis=1)
+    neg_below = np.cumsum(neg_w, axis=1) - neg_w
+    wins = (pos_w * (neg_below + 0.5 * neg_w)).sum(axis=1)
+    denom = pos_w.sum(axis=1) * neg_w.sum(axis=1)
+    out = np.full(n_bootstrap, np.nan)
+    np.divide(wins, denom, out=out, where=denom > 0)
+    return out
+
+
+def bootstrap_metric_summary(
     y_true: np.ndarray,
     y_prob: np.ndarray,
     threshold: float,
-    metric_name: str,
     n_bootstrap: int,
     confidence_level: float,
     seed: int,
-) -> dict[str, float]:
-    metric_lookup: dict[str, Callable[[np.ndarray, np.ndarray], float]] = {
-        "accuracy": lambda yt, yp: float(accuracy_score(yt, yp)),
-        "precision": lambda yt, yp: float(precision_score(yt, yp, zero_division=0)),
-        "recall": lambda yt, yp: float(recall_score(yt, yp, zero_division=0)),
-        "f1": lambda yt, yp: float(f1_score(yt, yp, zero_division=0)),
-    }
-    if metric_name not in metric_lookup:
-        raise ValueError(f"Unsupported metric for bootstrap: {metric_name}")
-
+    metric_names: tuple[str, ...] | list[str] = BOOTSTRAP_METRICS,
+) -> list[dict[str, float]]:
+    """Bootstrap CIs for several metrics from one shared set of resamples.
+
+    All resample indices are drawn as a single ``(n_bootstrap, n)`` matrix (the same
+    stream a per-iteration ``rng.choice`` loop would produce) and the confusion counts of
+    every resample are computed at once.
+    """
+    unknown = [m for m in metric_names if m not in BOOTSTRAP_METRICS]
+    if unknown:
+        raise ValueError(f"Unsupported metric for bootstrap: {unknown[0]}")
+
+    y_true = np.asarray(y_true)
+    y_prob = np.asarray(y_prob)
     rng = np.random.default_rng(seed)
-    y_pred = (y_prob >= threshold).astype(int)
-    indices = np.arange(len(y_true))
-    scores: list[float] = []
-    metric_fn = metric_lookup[metric_name]
-
-    for _ in range(n_bootstrap):
-        sample_idx = rng.choice(indices, size=len(indices), replace=True)
-        yt = y_true[sample_idx]
-        yp = y_pred[sample_idx]
-        scores.append(metric_fn(yt, yp))
+    sample_idx = rng.integers(0, len(y_true), size=(int(n_bootstrap), len(y_true)))
+
+    yt = y_true[sample_idx] == 1
+    yp = (y_prob >= threshold)[sample_idx]
+    tp = np.sum(yt & yp, axis=1)
+    fp = np.sum(~yt & yp, axis=1)
+    fn = np.sum(yt & ~yp, axis=1)
+    tn = np.sum(~yt & ~yp, axis=1)
+    scores_by_metric = metrics_from_counts(tp, fp, fn, tn)
+    if "roc_auc" in metric_names:
+        scores_by_metric["roc_auc"] = _bootstrap_auc(y_true, y_prob, sample_idx)
 
     alpha = (1.0 - confidence_level) / 2.0
-    lower = float(np.quantile(scores, alpha))
-    upper = float(np.quantile(scores, 1.0 - alpha))
-    return {
-        "metric": metric_name,
-        "mean": float(np.mean(scores)),
-        "std": float(np.std(scores)),
-        "ci_lower": lower,
-        "ci_upper": upper,
-    }
+    rows: list[dict[str, float]] = []
+    for metric_name in metric_names:
+        scores = scores_by_metric[metric_name]
+        scores = scores[~np.isnan(scores)]
+        if scores.size == 0:
+            rows.append({"metric": metric_name, **dict.fromkeys(["mean", "std", "ci_lower", "ci_upper"], float("nan"))})
+            continue
+        rows.append(
+            {
+                "metric": metric_name,
+                "mean": float(np.mean(scores)),
+                "std": float(np.std(scores)),
+                "ci_lower": float(np.quantile(scores, alpha)),
+                "ci_upper": float(np.quantile(scores, 1.0 - alpha)),
+            }
+        )
+    return rows
+
+
+def bootstrap_metric_ci(
+    y_true: np.ndarray,
+    y_prob: np.ndarray,
+    threshold: float,
+    metric_name: str,
+    n_bootstrap: int,
+    confidence_level: float,
+    seed: int,
+) -> dict[str, float]:
+    return bootstrap_metric_summary(
+        y_true=y_true,
+        y_prob=y_prob,
+        threshold=threshold,
+        n_bootstrap=n_bootstrap,
+        confidence_level=confidence_level,
+        seed=seed,
+        metric_names=[metric_name],
+    )[0]
 
 
 def compute_localization_metrics(
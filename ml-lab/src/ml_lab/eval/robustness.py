@@ -2,20 +2,28 @@ from __future__ import annotations
 
 import io
 import logging
-from typing import Any
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Iterable
 
 import cv2
 import numpy as np
 import pandas as pd
 from PIL import Image
+from tqdm import tqdm
 
 from ml_lab.eval.metrics import compute_binary_metrics
 from ml_lab.features.cfa import compute_cfa_features
+from ml_lab.features.context import ImageContext
 from ml_lab.features.dwt_svd import compute_dwt_svd_features
 from ml_lab.features.ela import compute_ela_features
-from ml_lab.features.image_ops import load_rgb_image
-from ml_lab.features.mantra import compute_mantra_features
+from ml_lab.features.families import plan_feature_families
+from ml_lab.features.image_ops import configure_image_cache, configure_image_store, load_rgb_image
+from ml_lab.features.image_store import ImageStore, activate_image_store
+from ml_lab.features.mantra import compute_mantra_features, mantra_batch_size, predict_mantra_masks
 from ml_lab.features.prnu import compute_prnu_features
+from ml_lab.utils.parallel import chunk_size_for, iter_batches, resolve_n_jobs
 
 LOGGER = logging.getLogger(__name__)
 
@@ -90,6 +98,153 @@ def _apply_perturbation(image_rgb: np.ndarray, scenario: dict[str, Any], seed: i
     return result
 
 
+@dataclass(frozen=True)
+class _RobustnessSettings:
+    image_size: tuple[int, int]
+    reduced_decode: bool
+    seed: int
+    scenarios: tuple[dict[str, Any], ...]
+    families: tuple[str, ...]
+    ela_cfg: dict[str, Any]
+    dwt_cfg: dict[str, Any]
+    cfa_cfg: dict[str, Any]
+    prnu_cfg: dict[str, Any]
+    mantra_cfg: dict[str, Any]
+    image_store_path: Path | None = None
+
+
+# (position in test manifest, image path)
+_Task = tuple[int, str]
+
+_WORKER_SETTINGS: _RobustnessSettings | None = None
+
+
+def _build_settings(config: dict[str, Any], families: tuple[str, ...]) -> _RobustnessSettings:
+    return _RobustnessSettings(
+        image_size=tuple(config["experiment"]["image_size"]),
+        reduced_decode=bool(config["experiment"].get("reduced_decode", False)),
+        seed=int(config["experiment"]["seed"]),
+        scenarios=tuple(config["robustness"]["scenarios"]),
+        families=families,
+        ela_cfg=config["features"]["ela"],
+        dwt_cfg=config["features"]["dwt"],
+        cfa_cfg=config["features"].get("cfa", {}),
+        prnu_cfg=config["features"].get("prnu", {}),
+        mantra_cfg=config["features"].get("mantra", {}),
+    )
+
+
+def _init_worker(settings: _RobustnessSettings) -> None:
+    global _WORKER_SETTINGS
+    _WORKER_SETTINGS = settings
+    cv2.setNumThreads(1)
+    # Set both explicitly: whatever the parent had is only inherited under fork.
+    configure_image_cache(0)
+    configure_image_store(ImageStore(settings.image_store_path) if settings.image_store_path else None)
+
+
+def _perturbed_features(
+    perturbed: ImageContext,
+    settings: _RobustnessSettings,
+    mantra_mask: np.ndarray | None,
+) -> dict[str, float]:
+    full_row: dict[str, float] = {}
+    if "ela" in settings.families:
+        ela_cfg = settings.ela_cfg
+        ela_features, _, _ = compute_ela_features(
+            image_rgb=perturbed,
+            jpeg_quality=int(ela_cfg["jpeg_quality"]),
+            high_threshold=float(ela_cfg["high_threshold"]),
+            smooth_blur_kernel=int(ela_cfg["smooth_blur_kernel"]),
+            with_heatmap=False,
+        )
+        full_row.update(ela_features)
+    if "dwt" in settings.families:
+        dwt_cfg = settings.dwt_cfg
+        full_row.update(
+            compute_dwt_svd_features(
+                image_rgb=perturbed,
+                wavelet=str(dwt_cfg["wavelet"]),
+                level=int(dwt_cfg["level"]),
+                top_k_singular=int(dwt_cfg["top_k_singular"]),
+            )
+        )
+    if "cfa" in settings.families:
+        cfa_cfg = settings.cfa_cfg
+        cfa_features, _, _ = compute_cfa_features(
+            image_rgb=perturbed,
+            window_size=int(cfa_cfg.get("window_size", 7)),
+            variance_threshold=float(cfa_cfg.get("variance_threshold", 0.6)),
+            smooth_sigma=float(cfa_cfg.get("smooth_sigma", 1.0)),
+            with_map=False,
+        )
+        full_row.update(cfa_features)
+    if "prnu" in settings.families:
+        prnu_cfg = settings.prnu_cfg
+        prnu_features, _, _ = compute_prnu_features(
+            image_rgb=perturbed,
+            wavelet=str(prnu_cfg.get("wavelet", "db4")),
+            level=int(prnu_cfg.get("level", 2)),
+            with_map=False,
+        )
+        full_row.update(prnu_features)
+    if "mantra" in settings.families:
+        mantra_features, _, _ = compute_mantra_features(
+            image_rgb=perturbed,
+            config=settings.mantra_cfg,
+            with_mask=False,
+            mask=mantra_mask,
+        )
+        full_row.update(mantra_features)
+    return full_row
+
+
+def _robustness_batch(
+    batch: list[_Task],
+    settings: _RobustnessSettings | None = None,
+) -> list[list[dict[str, float]]]:
+    """Load each image once and return its feature row under every scenario, indexed
+    ``[image][scenario]``."""
+    active = settings if settings is not None else _WORKER_SETTINGS
+    if active is None:
+        raise RuntimeError("Robustness worker used before initialization")
+
+    clean_images = [
+        load_rgb_image(image_path, image_size=active.image_size, reduced_decode=active.reduced_decode)
+        for _, image_path in batch
+    ]
+    rows: list[list[dict[str, float]]] = [[] for _ in batch]
+    for scenario in active.scenarios:
+        perturbed_batch = [
+            ImageContext(_apply_perturbation(image, scenario=scenario, seed=active.seed + position))
+            for (position, _), image in zip(batch, clean_images)
+        ]
+        if "mantra" in active.families:
+            mantra_masks = predict_mantra_masks([image.rgb for image in perturbed_batch], active.mantra_cfg)
+        else:
+            mantra_masks = [None] * len(perturbed_batch)
+        for image_rows, perturbed, mantra_mask in zip(rows, perturbed_batch, mantra_masks):
+            image_rows.append(_perturbed_features(perturbed, active, mantra_mask))
+    return rows
+
+
+def _iter_feature_rows(
+    tasks: list[_Task],
+    settings: _RobustnessSettings,
+    n_workers: int,
+) -> Iterable[list[dict[str, float]]]:
+    batches = [list(batch) for batch in iter_batches(tasks, mantra_batch_size(settings.mantra_cfg))]
+    if n_workers <= 1:
+        for batch in batches:
+            yield from _robustness_batch(batch, settings)
+        return
+
+    chunksize = chunk_size_for(len(batches), n_workers)
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(settings,)) as pool:
+        for batch_rows in pool.map(_robustness_batch, batches, chunksize=chunksize):
+            yield from batch_rows
+
+
 def run_robustness_suite(
     test_manifest: pd.DataFrame,
     method_results: dict[str, Any],
@@ -98,89 +253,64 @@ def run_robustness_suite(
     if not bool(config["robustness"].get("enabled", False)):
         return pd.DataFrame(), {}
 
-    image_size = tuple(config["experiment"]["image_size"])
-    ela_cfg = config["features"]["ela"]
-    dwt_cfg = config["features"]["dwt"]
-    cfa_cfg = config["features"].get("cfa", {})
-    prnu_cfg = config["features"].get("prnu", {})
-    mantra_cfg = config["features"].get("mantra", {})
-    scenarios = config["robustness"]["scenarios"]
-
+    # Only run the extractors that some evaluated method actually reads.
+    families = plan_feature_families(result.feature_columns for result in method_results.values())
+    settings = _build_settings(config, families)
+    image_store = activate_image_store(config)
+    if image_store is not None:
+        settings = replace(settings, image_store_path=image_store.path)
+    manifest_rows = list(test_manifest.itertuples(index=False))
+    tasks: list[_Task] = [(position, str(row.image_path)) for position, row in enumerate(manifest_rows)]
+
+    # Images are the unit of work so each one is decoded once for all scenarios; every
+    # (image, scenario) pair is still perturbed and extracted inside the worker pool.
+    n_workers = resolve_n_jobs(config["experiment"].get("n_jobs", 1), n_tasks=len(tasks))
+    if n_workers > 1 and settings.mantra_cfg.get("torch_threads") is None:
+        settings = replace(settings, mantra_cfg={**settings.mantra_cfg, "torch_threads": 1})
+    LOGGER.info(
+        "Running %d robustness scenarios over %d images with %d worker(s); feature families: %s",
+        len(settings.scenarios),
+        len(tasks),
+        n_workers,
+        ", ".join(families),
+    )
+    feature_rows = list(
+        tqdm(
+            _iter_feature_rows(tasks, settings=settings, n_workers=n_workers) if tasks else [],
+            total=len(tasks),
+            desc="Robustness",
+        )
+    )
+
+    image_paths = [row.image_path for row in manifest_rows]
+    labels = [int(row.label) for row in manifest_rows]
     rows: list[dict[str, Any]] = []
     prediction_dump: dict[str, pd.DataFrame] = {}
 
-    for scenario in scenarios:
+    for scenario_idx, scenario in enumerate(settings.scenarios):
         scenario_name = str(scenario["name"])
-        LOGGER.info("Running robustness scenario: %s", scenario_name)
-        scenario_method_predictions: dict[str, list[dict[str, Any]]] = {method: [] for method in method_results}
-
-        for image_idx, row in enumerate(test_manifest.itertuples(index=False)):
-            base_img = load_rgb_image(row.image_path, image_size=image_size)
-            perturbed = _apply_perturbation(base_img, scenario=scenario, seed=int(config["experiment"]["seed"]) + image_idx)
-
-            ela_features, _, _ = compute_ela_features(
-                image_rgb=perturbed,
-                jpeg_quality=int(ela_cfg["jpeg_quality"]),
-                high_threshold=float(ela_cfg["high_threshold"]),
-                smooth_blur_kernel=int(ela_cfg["smooth_blur_kernel"]),
-                with_heatmap=False,
-            )
-            dwt_features = compute_dwt_svd_features(
-                image_rgb=perturbed,
-                wavelet=str(dwt_cfg["wavelet"]),
-                level=int(dwt_cfg["level"]),
-                top_k_singular=int(dwt_cfg["top_k_singular"]),
-            )
-            cfa_features, _, _ = compute_cfa_features(
-                image_rgb=perturbed,
-                window_size=int(cfa_cfg.get("window_size", 7)),
-                variance_threshold=float(cfa_cfg.get("variance_threshold", 0.6)),
-                smooth_sigma=float(cfa_cfg.get("smooth_sigma", 1.0)),
-                with_map=False,
-            )
-            prnu_features, _, _ = compute_prnu_features(
-                image_rgb=perturbed,
-                wavelet=str(prnu_cfg.get("wavelet", "db4")),
-                level=int(prnu_cfg.get("level", 2)),
-                with_map=False,
-            )
-            mantra_features, _, _ = compute_mantra_features(
-                image_rgb=perturbed,
-                config=mantra_cfg,
-                with_mask=False,
+        scenario_rows = [image_rows[scenario_idx] for image_rows in feature_rows]
+        for method, result in method_results.items():
+            cols = result.feature_columns
+            x = np.array([[full_row[c] for c in cols] for full_row in scenario_rows], dtype=np.float32)
+            x = x.reshape(len(scenario_rows), len(cols))
+            probs = result.model_pipeline.predict_proba(x)[:, 1] if len(scenario_rows) else np.empty(0)
+            threshold = float(result.threshold)
+            pred_df = pd.DataFrame(
+                {
+                    "image_path": image_paths,
+                    "label": labels,
+                    "probability": probs.astype(np.float64),
+                    "prediction": (probs >= threshold).astype(int),
+                    "scenario": scenario_name,
+                    "method": method,
+                }
             )
-            full_row = {
-                **ela_features,
-                **dwt_features,
-                **cfa_features,
-                **prnu_features,
-                **mantra_features,
-            }
-
-            for method, result in method_results.items():
-                cols = result.feature_columns
-                x = np.array([full_row[c] for c in cols], dtype=np.float32).reshape(1, -1)
-                prob = float(result.model_pipeline.predict_proba(x)[0, 1])
-                pred = int(prob >= result.threshold)
-                scenario_method_predictions[method].append(
-                    {
-                        "image_path": row.image_path,
-                        "label": int(row.label),
-                        "probability": prob,
-                        "prediction": pred,
-                        "scenario": scenario_name,
-                        "method": method,
-                    }
-                )
-
-        for method, preds in scenario_method_predictions.items():
-            pred_df = pd.DataFrame(preds)
             y_true = pred_df["label"].to_numpy(dtype=np.int32)
             y_prob = pred_df["probability"].to_numpy(dtype=np.float32)
-            threshold = float(method_results[method].threshold)
             metrics = compute_binary_metrics(y_true=y_true, y_prob=y_prob, threshold=threshold)
 
-            clean_f1 = method_results[method].split_metrics["test"]["f1"]
+            clean_f1 = result.split_metrics["test"]["f1"]
             if clean_f1 <= 1e-12:
                 relative_drop = 0.0
             else:
@@ -1,15 +1,22 @@
 from .cfa import compute_cfa_features
+from .context import ImageContext
 from .dwt_svd import compute_dwt_svd_features
 from .ela import compute_ela_features
 from .extract import extract_feature_table
+from .families import plan_feature_families
 from .mantra import compute_mantra_features
 from .prnu import compute_prnu_features
+from .table import load_feature_table, save_feature_table
 
 __all__ = [
+    "ImageContext",
     "compute_ela_features",
     "compute_dwt_svd_features",
     "compute_cfa_features",
     "compute_prnu_features",
     "compute_mantra_features",
     "extract_feature_table",
+    "plan_feature_families",
+    "load_feature_table",
+    "save_feature_table",
 ]
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+FEATURE_FAMILIES = ("ela", "dwt", "cfa", "prnu", "mantra")
+# Extractor code is covered by the source hash below. Bump this when cached values change
+# without any of those files changing (e.g. a numpy/OpenCV/PyWavelets upgrade that alters
+# results, or code moved into a module not listed there) or when the .npz layout changes.
+CACHE_SCHEMA_VERSION = 1
+
+# Modules (in this package) whose code determines each family's values.
+_SHARED_SOURCES = ("context.py", "image_ops.py", "stats.py")
+_FAMILY_SOURCES = {
+    "ela": ("ela.py",),
+    "dwt": ("dwt_svd.py",),
+    "cfa": ("cfa.py",),
+    "prnu": ("prnu.py",),
+    "mantra": ("mantra.py",),
+}
+
+# Output-only and execution switches that do not change feature values.
+_NON_FEATURE_KEYS = {"save_heatmaps", "max_heatmaps_per_split", "save_maps", "save_masks", "batch_size", "torch_threads"}
+
+
+@lru_cache(maxsize=None)
+def _source_digest(family: str) -> str:
+    digest = hashlib.sha256()
+    for name in _SHARED_SOURCES + _FAMILY_SOURCES[family]:
+        digest.update(Path(__file__).with_name(name).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _mantra_checkpoint_stat(config: dict[str, Any]) -> list[int] | None:
+    checkpoint = str((config["features"].get("mantra") or {}).get("checkpoint_path", "")).strip()
+    if not checkpoint or not Path(checkpoint).exists():
+        return None
+    stat = Path(checkpoint).stat()
+    return [int(stat.st_size), int(stat.st_mtime_ns)]
+
+
+def _family_config_hash(family: str, config: dict[str, Any]) -> str:
+    family_cfg = {
+        key: value
+        for key, value in (config["features"].get(family) or {}).items()
+        if key not in _NON_FEATURE_KEYS
+    }
+    payload: dict[str, Any] = {
+        "schema": CACHE_SCHEMA_VERSION,
+        "family": family,
+        "source": _source_digest(family),
+        "image_size": list(config["experiment"]["image_size"]),
+        "config": family_cfg,
+    }
+    if bool(config["experiment"].get("reduced_decode", False)):
+        # Reduced-resolution JPEG decoding changes the input pixels of every family.
+        payload["reduced_decode"] = True
+    if family == "mantra":
+        # A retrained checkpoint at the same path must invalidate cached masks.
+        checkpoint_stat = _mantra_checkpoint_stat(config)
+        if checkpoint_stat is not None:
+            payload["checkpoint_stat"] = checkpoint_stat
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class FeatureCache:
+    """Content-addressed store of per-image features, one file per feature family.
+
+    Rows are keyed by ``file_md5``; each family file is named after a hash of that
+    family's config block and extractor source, so editing e.g. ``features.cfa`` or
+    ``cfa.py`` only invalidates CFA. ManTra rows computed by the heuristic fallback while a
+    checkpoint is configured are not stored, since the key promises checkpoint masks.
+    """
+
+    def __init__(self, cache_dir: str | Path, config: dict[str, Any]):
+        self.cache_dir = Path(cache_dir)
+        self.family_hashes = {family: _family_config_hash(family, config) for family in FEATURE_FAMILIES}
+        self._expects_torchscript = _mantra_checkpoint_stat(config) is not None
+        self._columns: dict[str, list[str]] = {}
+        self._rows: dict[str, dict[str, np.ndarray]] = {}
+        self._dirty: set[str] = set()
+        for family in FEATURE_FAMILIES:
+            self._load_family(family)
+
+    def _family_path(self, family: str) -> Path:
+        return self.cache_dir / f"{family}-{self.family_hashes[family]}.npz"
+
+    def _load_family(self, family: str) -> None:
+        self._rows[family] = {}
+        path = self._family_path(family)
+        if not path.exists():
+            return
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                columns = [str(c) for c in data["columns"]]
+                md5s = data["file_md5"]
+                values = data["values"]
+        except Exception as exc:
+            LOGGER.warning("Ignoring unreadable feature cache %s: %s", path, exc)
+            return
+        self._columns[family] = columns
+        self._rows[family] = {str(md5): values[i] for i, md5 in enumerate(md5s)}
+        LOGGER.info("Loaded %d cached %s feature rows from %s", len(md5s), family, path)
+
+    def missing_families(self, file_md5: str) -> list[str]:
+        return [family for family in FEATURE_FAMILIES if file_md5 not in self._rows[family]]
+
+    def get(self, file_md5: str, family: str) -> dict[str, float] | None:
+        values = self._rows[family].get(file_md5)
+        if values is None:
+            return None
+        return {name: float(v) for name, v in zip(self._columns[family], values)}
+
+    def put(self, file_md5: str, family: str, features: dict[str, float]) -> None:
+        if family == "mantra" and self._expects_torchscript and not features.get("mantra_backend_torchscript"):
+            return
+        columns = self._columns.get(family)
+        if columns is None:
+            columns = list(features.keys())
+            self._columns[family] = columns
+        elif list(features.keys()) != columns:
+            # Column layout changed under an identical config (e.g. code change): start over.
+            LOGGER.warning("Feature columns for %s changed; resetting its cache", family)
+            columns = list(features.keys())
+            self._columns[family] = columns
+            self._rows[family] = {}
+        self._rows[family][file_md5] = np.array([features[c] for c in columns], dtype=np.float64)
+        self._dirty.add(family)
+
+    def flush(self) -> None:
+        if not self._dirty:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for family in sorted(self._dirty):
+            rows = self._rows[family]
+            md5s = sorted(rows)
+            values = np.stack([rows[m] for m in md5s], axis=0) if md5s else np.zeros((0, 0))
+            path = self._family_path(family)
+            tmp_path = path.with_name(path.stem + ".tmp.npz")
+            np.savez(
+                tmp_path,
+                file_md5=np.array(md5s, dtype=str),
+                columns=np.array(self._columns[family], dtype=str),
+                values=values,
+            )
+            os.replace(tmp_path, path)
+            LOGGER.info("Feature cache updated: %s (%d rows)", path, len(md5s))
+        self._dirty.clear()
@@ -1,18 +1,13 @@
 from __future__ import annotations
 
-import base64
 from pathlib import Path
 
 import cv2
 import numpy as np
 
-
-def _to_gray(image_rgb: np.ndarray) -> np.ndarray:
-    return (
-        0.299 * image_rgb[:, :, 0].astype(np.float32)
-        + 0.587 * image_rgb[:, :, 1].astype(np.float32)
-        + 0.114 * image_rgb[:, :, 2].astype(np.float32)
-    )
+from .context import ImageInput, as_image_context
+from .map_render import colorize, encode_map_base64, normalize_to_uint8
+from .stats import map_stats
 
 
 def _local_variance(x: np.ndarray, window_size: int) -> np.ndarray:
@@ -30,39 +25,28 @@ def _largest_component_ratio(mask: np.ndarray) -> float:
     return float(max_area / mask.size)
 
 
-def _normalize_map(x: np.ndarray) -> np.ndarray:
-    x = np.maximum(x, 0.0)
-    max_v = float(np.percentile(x, 99.0))
-    if max_v <= 1e-8:
-        return np.zeros_like(x, dtype=np.float32)
-    return np.clip(x / max_v, 0.0, 1.0).astype(np.float32)
+def colorize_cfa_map(x: np.ndarray) -> np.ndarray:
+    return colorize(normalize_to_uint8(x), cv2.COLORMAP_TURBO)
 
 
 def _map_png_base64(x: np.ndarray) -> str:
-    norm = _normalize_map(x)
-    colored = cv2.applyColorMap((norm * 255.0).astype(np.uint8), cv2.COLORMAP_TURBO)
-    ok, encoded = cv2.imencode(".png", colored)
-    if not ok:
-        return ""
-    return base64.b64encode(encoded.tobytes()).decode("ascii")
+    return encode_map_base64(colorize_cfa_map(x))
 
 
 def save_cfa_map(cfa_map: np.ndarray, output_path: str | Path) -> None:
     path = Path(output_path)
     path.parent.mkdir(parents=True, exist_ok=True)
-    norm = _normalize_map(cfa_map)
-    colored = cv2.applyColorMap((norm * 255.0).astype(np.uint8), cv2.COLORMAP_TURBO)
-    cv2.imwrite(str(path), colored)
+    cv2.imwrite(str(path), colorize_cfa_map(cfa_map))
 
 
 def compute_cfa_features(
-    image_rgb: np.ndarray,
+    image_rgb: ImageInput,
     window_size: int,
     variance_threshold: float,
     smooth_sigma: float,
     with_map: bool = False,
 ) -> tuple[dict[str, float], np.ndarray, str | None]:
-    gray = _to_gray(image_rgb)
+    gray = as_image_context(image_rgb).gray
 
     interp_h = 0.5 * (np.roll(gray, 1, axis=1) + np.roll(gray, -1, axis=1))
     interp_v = 0.5 * (np.roll(gray, 1, axis=0) + np.roll(gray, -1, axis=0))
@@ -89,15 +73,16 @@ def compute_cfa_features(
     inconsistency = np.abs(local_var - expected) / (expected + 1e-6)
     cfa_map = cv2.GaussianBlur(inconsistency, (0, 0), sigmaX=max(0.1, float(smooth_sigma)))
 
-    high_mask = cfa_map >= float(variance_threshold)
+    variance_threshold = float(variance_threshold)
+    stats = map_stats(cfa_map, percentiles_at=(95,), thresholds=(variance_threshold,))
     phase_dispersion = float(np.std(phase_means) / (np.mean(phase_means) + 1e-6))
 
     features = {
-        "cfa_var_mean": float(cfa_map.mean()),
-        "cfa_var_std": float(cfa_map.std()),
-        "cfa_p95_inconsistency": float(np.percentile(cfa_map, 95)),
-        "cfa_high_inconsistency_ratio": float(high_mask.mean()),
-        "cfa_largest_hotspot_ratio": float(_largest_component_ratio(high_mask)),
+        "cfa_var_mean": stats.mean,
+        "cfa_var_std": stats.std,
+        "cfa_p95_inconsistency": stats.percentiles[95],
+        "cfa_high_inconsistency_ratio": stats.ratios[variance_threshold],
+        "cfa_largest_hotspot_ratio": float(_largest_component_ratio(cfa_map >= variance_threshold)),
         "cfa_phase_dispersion": phase_dispersion,
     }
 
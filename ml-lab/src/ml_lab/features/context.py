@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from typing import Union
+
+import numpy as np
+import pywt
+
+GRAY_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+class WaveletPyramid:
+    """Incremental 2D wavelet decomposition of one image for one wavelet/mode.
+
+    ``pywt.wavedec2`` is a chain of single-level ``dwt2`` calls, so keeping every
+    intermediate approximation lets any level be served from the same chain: shallower
+    requests are sliced out of it and deeper requests only run the missing steps.
+    """
+
+    def __init__(self, data: np.ndarray, wavelet: str, mode: str = "symmetric"):
+        self.wavelet = wavelet
+        self.mode = mode
+        self._approx: list[np.ndarray] = [data]
+        self._details: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+
+    @property
+    def depth(self) -> int:
+        return len(self._details)
+
+    def wavedec2(self, level: int) -> list:
+        level = int(level)
+        if level < 0:
+            raise ValueError(f"Wavelet level must be non-negative, got {level}")
+        while self.depth < level:
+            approx, details = pywt.dwt2(self._approx[-1], self.wavelet, mode=self.mode)
+            self._approx.append(approx)
+            self._details.append(details)
+        # Same layout as pywt.wavedec2: [cA_n, (cH_n, cV_n, cD_n), ..., (cH_1, cV_1, cD_1)].
+        return [self._approx[level]] + self._details[:level][::-1]
+
+
+class ImageContext:
+    """Per-image cache of intermediates shared by the feature extractors.
+
+    Extractors only read from the cached arrays; they must never modify them in place.
+    """
+
+    def __init__(self, image_rgb: np.ndarray):
+        if image_rgb.ndim != 3 or image_rgb.shape[2] != 3:
+            raise ValueError(f"Expected an HxWx3 RGB image, got shape {image_rgb.shape}")
+        self.rgb = image_rgb
+        self._rgb_f32: np.ndarray | None = None
+        self._gray: np.ndarray | None = None
+        self._pyramids: dict[tuple[str, str], WaveletPyramid] = {}
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return int(self.rgb.shape[0]), int(self.rgb.shape[1])
+
+    @property
+    def rgb_f32(self) -> np.ndarray:
+        if self._rgb_f32 is None:
+            self._rgb_f32 = self.rgb.astype(np.float32)
+        return self._rgb_f32
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            rgb = self.rgb_f32
+            self._gray = (
+                GRAY_WEIGHTS[0] * rgb[:, :, 0]
+                + GRAY_WEIGHTS[1] * rgb[:, :, 1]
+                + GRAY_WEIGHTS[2] * rgb[:, :, 2]
+            )
+        return self._gray
+
+    def wavedec2(self, wavelet: str, level: int, mode: str = "symmetric") -> list:
+        key = (str(wavelet), str(mode))
+        pyramid = self._pyramids.get(key)
+        if pyramid is None:
+            pyramid = WaveletPyramid(self.gray, wavelet=key[0], mode=key[1])
+            self._pyramids[key] = pyramid
+        return pyramid.wavedec2(level)
+
+
+ImageInput = Union[np.ndarray, ImageContext]
+
+
+def as_image_context(image: ImageInput) -> ImageContext:
+    if isinstance(image, ImageContext):
+        return image
+    return ImageContext(image)
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import numpy as np
-import pywt
+
+from .context import ImageInput, as_image_context
 
 
 def _svd_top_k(matrix: np.ndarray, top_k: int) -> np.ndarray:
@@ -14,17 +15,12 @@ def _svd_top_k(matrix: np.ndarray, top_k: int) -> np.ndarray:
 
 
 def compute_dwt_svd_features(
-    image_rgb: np.ndarray,
+    image_rgb: ImageInput,
     wavelet: str,
     level: int,
     top_k_singular: int,
 ) -> dict[str, float]:
-    gray = (
-        0.299 * image_rgb[:, :, 0].astype(np.float32)
-        + 0.587 * image_rgb[:, :, 1].astype(np.float32)
-        + 0.114 * image_rgb[:, :, 2].astype(np.float32)
-    )
-    coeffs = pywt.wavedec2(gray, wavelet=wavelet, level=level)
+    coeffs = as_image_context(image_rgb).wavedec2(wavelet=wavelet, level=level)
     approx = coeffs[0]
     details = coeffs[1:]
 
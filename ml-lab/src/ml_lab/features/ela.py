@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import base64
 import io
 import logging
 from pathlib import Path
@@ -10,6 +9,10 @@ import cv2
 import numpy as np
 from PIL import Image
 
+from .context import ImageInput, as_image_context
+from .map_render import colorize, encode_map_base64, scale_to_uint8
+from .stats import fraction_at_least, map_stats
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -42,51 +45,49 @@ def _largest_component_ratio(mask: np.ndarray) -> float:
     return float(max_area / mask.size)
 
 
+def colorize_ela_heatmap(residual_gray: np.ndarray) -> np.ndarray:
+    return colorize(scale_to_uint8(residual_gray, 4.0), cv2.COLORMAP_JET)
+
+
 def _heatmap_png_base64(residual_gray: np.ndarray) -> str:
-    scaled = np.clip(residual_gray * 4.0, 0, 255).astype(np.uint8)
-    colored = cv2.applyColorMap(scaled, cv2.COLORMAP_JET)
-    success, encoded = cv2.imencode(".png", colored)
-    if not success:
-        return ""
-    return base64.b64encode(encoded.tobytes()).decode("ascii")
+    return encode_map_base64(colorize_ela_heatmap(residual_gray))
 
 
 def save_heatmap(residual_gray: np.ndarray, output_path: str | Path) -> None:
     path = Path(output_path)
     path.parent.mkdir(parents=True, exist_ok=True)
-    scaled = np.clip(residual_gray * 4.0, 0, 255).astype(np.uint8)
-    colored = cv2.applyColorMap(scaled, cv2.COLORMAP_JET)
-    cv2.imwrite(str(path), colored)
+    cv2.imwrite(str(path), colorize_ela_heatmap(residual_gray))
 
 
 def compute_ela_features(
-    image_rgb: np.ndarray,
+    image_rgb: ImageInput,
     jpeg_quality: int,
     high_threshold: float,
     smooth_blur_kernel: int,
     with_heatmap: bool = False,
 ) -> tuple[dict[str, float], np.ndarray, str | None]:
+    context = as_image_context(image_rgb)
     try:
-        recompressed = _recompress_jpeg_cv2(image_rgb, jpeg_quality)
+        recompressed = _recompress_jpeg_cv2(context.rgb, jpeg_quality)
     except Exception as first_error:
         LOGGER.debug("OpenCV recompress failed, fallback to PIL: %s", first_error)
-        recompressed = _recompress_jpeg_pil(image_rgb, jpeg_quality)
+        recompressed = _recompress_jpeg_pil(context.rgb, jpeg_quality)
 
-    residual = np.abs(image_rgb.astype(np.float32) - recompressed.astype(np.float32))
+    residual = np.abs(context.rgb_f32 - recompressed.astype(np.float32))
     residual_gray = residual.mean(axis=2)
 
-    high_mask = residual_gray >= float(high_threshold)
+    high_threshold = float(high_threshold)
+    stats = map_stats(residual_gray, percentiles_at=(95,), thresholds=(high_threshold,))
     kernel = smooth_blur_kernel if smooth_blur_kernel % 2 == 1 else smooth_blur_kernel + 1
     smoothed = cv2.GaussianBlur(residual_gray, (kernel, kernel), sigmaX=1.2)
-    smooth_high_mask = smoothed >= float(high_threshold)
 
     features = {
-        "ela_mean_residual": float(residual_gray.mean()),
-        "ela_std_residual": float(residual_gray.std()),
-        "ela_p95_residual": float(np.percentile(residual_gray, 95)),
-        "ela_high_residual_ratio": float(high_mask.mean()),
-        "ela_smooth_high_residual_ratio": float(smooth_high_mask.mean()),
-        "ela_largest_hotspot_ratio": float(_largest_component_ratio(high_mask)),
+        "ela_mean_residual": stats.mean,
+        "ela_std_residual": stats.std,
+        "ela_p95_residual": stats.percentiles[95],
+        "ela_high_residual_ratio": stats.ratios[high_threshold],
+        "ela_smooth_high_residual_ratio": fraction_at_least(smoothed, high_threshold),
+        "ela_largest_hotspot_ratio": float(_largest_component_ratio(residual_gray >= high_threshold)),
     }
 
     heatmap_b64 = _heatmap_png_base64(residual_gray) if with_heatmap else None
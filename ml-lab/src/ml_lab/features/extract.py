@@ -1,120 +1,383 @@
 from __future__ import annotations
 
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable
 
+import cv2
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
+from ml_lab.utils.parallel import chunk_size_for, iter_batches, resolve_n_jobs
+
+from .cache import FEATURE_FAMILIES, FeatureCache
 from .cfa import compute_cfa_features, save_cfa_map
+from .context import ImageContext
 from .dwt_svd import compute_dwt_svd_features
 from .ela import compute_ela_features, save_heatmap
-from .image_ops import load_rgb_image
-from .mantra import compute_mantra_features, save_mantra_mask
+from .image_ops import configure_image_cache, configure_image_store, load_rgb_image
+from .image_store import ImageStore, activate_image_store
+from .mantra import compute_mantra_features, mantra_batch_size, predict_mantra_masks, save_mantra_mask
 from .prnu import compute_prnu_features, save_prnu_map
 
 LOGGER = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class _ExtractionSettings:
+    image_size: tuple[int, int]
+    reduced_decode: bool
+    ela_cfg: dict[str, Any]
+    dwt_cfg: dict[str, Any]
+    cfa_cfg: dict[str, Any]
+    prnu_cfg: dict[str, Any]
+    mantra_cfg: dict[str, Any]
+    cfa_map_dir: Path | None
+    prnu_map_dir: Path | None
+    mantra_map_dir: Path | None
+    image_store_path: Path | None = None
+
+
+@dataclass
+class _ExtractionOutcome:
+    position: int
+    features: dict[str, dict[str, float]] | None
+    residual_gray: np.ndarray | None
+    error: str | None
+
+
+# (position, image_path, split, families to compute, keep ELA residual)
+_Task = tuple[int, str, str, tuple[str, ...], bool]
+
+_WORKER_SETTINGS: _ExtractionSettings | None = None
+
+
+def _build_settings(config: dict[str, Any]) -> _ExtractionSettings:
+    figures_dir = Path(config["paths"]["figures_dir"])
+    cfa_cfg = config["features"].get("cfa", {})
+    prnu_cfg = config["features"].get("prnu", {})
+    mantra_cfg = config["features"].get("mantra", {})
+    return _ExtractionSettings(
+        image_size=tuple(config["experiment"]["image_size"]),
+        reduced_decode=bool(config["experiment"].get("reduced_decode", False)),
+        ela_cfg=config["features"]["ela"],
+        dwt_cfg=config["features"]["dwt"],
+        cfa_cfg=cfa_cfg,
+        prnu_cfg=prnu_cfg,
+        mantra_cfg=mantra_cfg,
+        cfa_map_dir=figures_dir / "cfa_maps" if bool(cfa_cfg.get("save_maps", False)) else None,
+        prnu_map_dir=figures_dir / "prnu_maps" if bool(prnu_cfg.get("save_maps", False)) else None,
+        mantra_map_dir=figures_dir / "mantra_masks" if bool(mantra_cfg.get("save_masks", False)) else None,
+    )
+
+
+def _init_worker(settings: _ExtractionSettings) -> None:
+    global _WORKER_SETTINGS
+    _WORKER_SETTINGS = settings
+    # Each worker owns one core; OpenCV's own thread pool would oversubscribe.
+    cv2.setNumThreads(1)
+    # Set both explicitly: whatever the parent had is only inherited under fork.
+    configure_image_cache(0)
+    configure_image_store(ImageStore(settings.image_store_path) if settings.image_store_path else None)
+
+
+def _compute_family(
+    family: str,
+    image: ImageContext,
+    settings: _ExtractionSettings,
+    mantra_mask: np.ndarray | None = None,
+) -> tuple[dict[str, float], np.ndarray | None]:
+    if family == "ela":
+        ela_cfg = settings.ela_cfg
+        features, residual_gray, _ = compute_ela_features(
+            image_rgb=image,
+            jpeg_quality=int(ela_cfg["jpeg_quality"]),
+            high_threshold=float(ela_cfg["high_threshold"]),
+            smooth_blur_kernel=int(ela_cfg["smooth_blur_kernel"]),
+            with_heatmap=False,
+        )
+        return features, residual_gray
+    if family == "dwt":
+        dwt_cfg = settings.dwt_cfg
+        features = compute_dwt_svd_features(
+            image_rgb=image,
+            wavelet=str(dwt_cfg["wavelet"]),
+            level=int(dwt_cfg["level"]),
+            top_k_singular=int(dwt_cfg["top_k_singular"]),
+        )
+        return features, None
+    if family == "cfa":
+        cfa_cfg = settings.cfa_cfg
+        features, cfa_map, _ = compute_cfa_features(
+            image_rgb=image,
+            window_size=int(cfa_cfg.get("window_size", 7)),
+            variance_threshold=float(cfa_cfg.get("variance_threshold", 0.6)),
+            smooth_sigma=float(cfa_cfg.get("smooth_sigma", 1.0)),
+            with_map=False,
+        )
+        return features, cfa_map
+    if family == "prnu":
+        prnu_cfg = settings.prnu_cfg
+        features, prnu_residual, _ = compute_prnu_features(
+            image_rgb=image,
+            wavelet=str(prnu_cfg.get("wavelet", "db4")),
+            level=int(prnu_cfg.get("level", 2)),
+            with_map=False,
+        )
+        return features, prnu_residual
+    if family == "mantra":
+        features, mantra_mask, _ = compute_mantra_features(
+            image_rgb=image,
+            config=settings.mantra_cfg,
+            with_mask=False,
+            mask=mantra_mask,
+        )
+        return features, mantra_mask
+    raise ValueError(f"Unknown feature family: {family}")
+
+
+def _map_families(settings: _ExtractionSettings) -> set[str]:
+    families: set[str] = set()
+    if settings.cfa_map_dir is not None:
+        families.add("cfa")
+    if settings.prnu_map_dir is not None:
+        families.add("prnu")
+    if settings.mantra_map_dir is not None:
+        families.add("mantra")
+    return families
+
+
+def _compute_row_features(
+    image: ImageContext,
+    image_path: Path,
+    split: str,
+    families: tuple[str, ...],
+    settings: _ExtractionSettings,
+    keep_residual: bool,
+    mantra_mask: np.ndarray | None = None,
+) -> tuple[dict[str, dict[str, float]], np.ndarray | None]:
+    family_features: dict[str, dict[str, float]] = {}
+    family_maps: dict[str, np.ndarray | None] = {}
+    for family in families:
+        family_features[family], family_maps[family] = _compute_family(family, image, settings, mantra_mask)
+
+    # Uncapped map outputs have deterministic paths, so workers can write them directly.
+    safe_name = image_path.stem.replace(" ", "_")
+    if settings.cfa_map_dir is not None:
+        save_cfa_map(family_maps["cfa"], settings.cfa_map_dir / split / f"{safe_name}.png")
+    if settings.prnu_map_dir is not None:
+        save_prnu_map(family_maps["prnu"], settings.prnu_map_dir / split / f"{safe_name}.png")
+    if settings.mantra_map_dir is not None:
+        save_mantra_mask(family_maps["mantra"], settings.mantra_map_dir / split / f"{safe_name}.png")
+
+    residual_gray = family_maps.get("ela") if keep_residual else None
+    return family_features, residual_gray
+
+
+def _extract_batch(
+    batch: list[_Task],
+    settings: _ExtractionSettings | None = None,
+) -> list[_ExtractionOutcome]:
+    active = settings if settings is not None else _WORKER_SETTINGS
+    if active is None:
+        raise RuntimeError("Extraction worker used before initialization")
+
+    outcomes: dict[int, _ExtractionOutcome] = {}
+    images: dict[int, ImageContext] = {}
+    for position, image_path, _, _, _ in batch:
+        try:
+            images[position] = ImageContext(load_rgb_image(Path(image_path), active.image_size, active.reduced_decode))
+        except Exception as exc:
+            outcomes[position] = _ExtractionOutcome(position=position, features=None, residual_gray=None, error=str(exc))
+
+    # All images share experiment.image_size, so the learned ManTra backend can run them
+    # as one tensor instead of one forward pass per image.
+    mantra_positions = [task[0] for task in batch if task[0] in images and "mantra" in task[3]]
+    mantra_masks = dict(
+        zip(
+            mantra_positions,
+            predict_mantra_masks([images[p].rgb for p in mantra_positions], active.mantra_cfg),
+        )
+    )
+
+    for position, image_path, split, families, keep_residual in batch:
+        if position in outcomes:
+            continue
+        try:
+            features, residual_gray = _compute_row_features(
+                images.pop(position),
+                Path(image_path),
+                split,
+                families,
+                active,
+                keep_residual,
+                mantra_mask=mantra_masks.get(position),
+            )
+            outcomes[position] = _ExtractionOutcome(
+                position=position, features=features, residual_gray=residual_gray, error=None
+            )
+        except Exception as exc:
+            outcomes[position] = _ExtractionOutcome(position=position, features=None, residual_gray=None, error=str(exc))
+    return [outcomes[task[0]] for task in batch]
+
+
+def _iter_outcomes(
+    tasks: list[_Task],
+    settings: _ExtractionSettings,
+    n_workers: int,
+) -> Iterable[_ExtractionOutcome]:
+    batches = [list(batch) for batch in iter_batches(tasks, mantra_batch_size(settings.mantra_cfg))]
+    if n_workers <= 1:
+        for batch in batches:
+            yield from _extract_batch(batch, settings)
+        return
+
+    chunksize = chunk_size_for(len(batches), n_workers)
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(settings,)) as pool:
+        # Executor.map yields in submission order, which keeps the feature table row order deterministic.
+        for outcomes in pool.map(_extract_batch, batches, chunksize=chunksize):
+            yield from outcomes
+
+
 def extract_feature_table(
     manifest_split: pd.DataFrame,
     config: dict[str, Any],
 ) -> pd.DataFrame:
-    image_size = tuple(config["experiment"]["image_size"])
-    ela_cfg = config["features"]["ela"]
-    dwt_cfg = config["features"]["dwt"]
-    cfa_cfg = config["features"].get("cfa", {})
-    prnu_cfg = config["features"].get("prnu", {})
-    mantra_cfg = config["features"].get("mantra", {})
+    settings = _build_settings(config)
+    image_store = activate_image_store(config)
+    if image_store is not None:
+        settings = replace(settings, image_store_path=image_store.path)
+    ela_cfg = settings.ela_cfg
 
     heatmap_dir = Path(config["paths"]["heatmap_dir"])
     save_heatmaps = bool(ela_cfg.get("save_heatmaps", False))
     max_heatmaps_per_split = int(ela_cfg.get("max_heatmaps_per_split", 0))
     heatmap_counter: dict[str, int] = {}
 
-    cfa_map_dir = Path(config["paths"]["figures_dir"]) / "cfa_maps"
-    prnu_map_dir = Path(config["paths"]["figures_dir"]) / "prnu_maps"
-    mantra_map_dir = Path(config["paths"]["figures_dir"]) / "mantra_masks"
-    save_cfa_maps = bool(cfa_cfg.get("save_maps", False))
-    save_prnu_maps = bool(prnu_cfg.get("save_maps", False))
-    save_mantra_masks = bool(mantra_cfg.get("save_masks", False))
+    cache: FeatureCache | None = None
+    cache_dir = config["paths"].get("feature_cache_dir")
+    if cache_dir and "file_md5" in manifest_split.columns:
+        cache = FeatureCache(cache_dir, config)
+    map_families = _map_families(settings)
 
-    records: list[dict[str, Any]] = []
-    iterator = tqdm(manifest_split.itertuples(index=False), total=len(manifest_split), desc="Extracting features")
-    for row in iterator:
+    rows = list(manifest_split.itertuples(index=False))
+
+    # Only the first rows of each split can take a heatmap slot, so only those ship their
+    # residual back from the workers; slots left by failed rows are back-filled below.
+    tasks: list[_Task] = []
+    cached_positions: list[int] = []
+    split_positions: dict[str, int] = {}
+    for position, row in enumerate(rows):
+        split = str(row.split)
+        rank = split_positions.get(split, 0)
+        split_positions[split] = rank + 1
+        keep_residual = save_heatmaps and rank < max_heatmaps_per_split
+
+        needed = set(FEATURE_FAMILIES) if cache is None else set(cache.missing_families(str(row.file_md5)))
+        needed |= map_families
+        if keep_residual:
+            needed.add("ela")
+        if not needed:
+            cached_positions.append(position)
+            continue
+        families = tuple(f for f in FEATURE_FAMILIES if f in needed)
+        tasks.append((position, str(row.image_path), split, families, keep_residual))
+
+    n_workers = resolve_n_jobs(config["experiment"].get("n_jobs", 1), n_tasks=len(tasks))
+    if n_workers > 1 and settings.mantra_cfg.get("torch_threads") is None:
+        # One torch thread per process worker unless the config says otherwise.
+        settings = replace(settings, mantra_cfg={**settings.mantra_cfg, "torch_threads": 1})
+    LOGGER.info(
+        "Extracting features for %d images with %d worker(s); %d served fully from cache",
+        len(tasks),
+        n_workers,
+        len(cached_positions),
+    )
+
+    computed: dict[int, dict[str, dict[str, float]]] = {}
+    pending_backfill: list[int] = []
+    outcomes = _iter_outcomes(tasks, settings=settings, n_workers=n_workers) if tasks else []
+    for outcome in tqdm(outcomes, total=len(tasks), desc="Extracting features"):
+        row = rows[outcome.position]
         image_path = Path(row.image_path)
         split = str(row.split)
+        if outcome.features is None:
+            LOGGER.warning("Failed feature extraction for %s: %s", image_path, outcome.error)
+            continue
+
+        computed[outcome.position] = outcome.features
+        if cache is not None:
+            for family, family_features in outcome.features.items():
+                cache.put(str(row.file_md5), family, family_features)
+
+        if save_heatmaps:
+            split_count = heatmap_counter.get(split, 0)
+            if split_count < max_heatmaps_per_split:
+                if outcome.residual_gray is not None:
+                    safe_name = image_path.stem.replace(" ", "_")
+                    save_heatmap(outcome.residual_gray, heatmap_dir / split / f"{safe_name}.png")
+                    heatmap_counter[split] = split_count + 1
+                else:
+                    pending_backfill.append(outcome.position)
+
+    for position in cached_positions:
+        computed[position] = {}
+        if save_heatmaps and heatmap_counter.get(str(rows[position].split), 0) < max_heatmaps_per_split:
+            pending_backfill.append(position)
+
+    if cache is not None:
+        cache.flush()
 
+    records: list[dict[str, Any]] = []
+    for position, row in enumerate(rows):
+        family_features = computed.get(position)
+        if family_features is None:
+            continue
+        features: dict[str, float] = {}
+        for family in FEATURE_FAMILIES:
+            values = family_features.get(family)
+            if values is None and cache is not None:
+                values = cache.get(str(row.file_md5), family)
+            if values is None:
+                raise RuntimeError(f"Missing {family} features for {row.image_path}")
+            features.update(values)
+        records.append(
+            {
+                "image_path": str(Path(row.image_path)),
+                "label": int(row.label),
+                "split": str(row.split),
+                "source_dataset": row.source_dataset,
+                "perturbation_tag": row.perturbation_tag,
+                "mask_path": getattr(row, "mask_path", None),
+                **features,
+            }
+        )
+
+    for position in sorted(pending_backfill):
+        row = rows[position]
+        split = str(row.split)
+        split_count = heatmap_counter.get(split, 0)
+        if split_count >= max_heatmaps_per_split:
+            continue
+        image_path = Path(row.image_path)
         try:
-            image = load_rgb_image(image_path, image_size)
-            ela_features, residual_gray, _ = compute_ela_features(
+            image = load_rgb_image(image_path, settings.image_size, settings.reduced_decode)
+            _, residual_gray, _ = compute_ela_features(
                 image_rgb=image,
                 jpeg_quality=int(ela_cfg["jpeg_quality"]),
                 high_threshold=float(ela_cfg["high_threshold"]),
                 smooth_blur_kernel=int(ela_cfg["smooth_blur_kernel"]),
                 with_heatmap=False,
             )
-            dwt_features = compute_dwt_svd_features(
-                image_rgb=image,
-                wavelet=str(dwt_cfg["wavelet"]),
-                level=int(dwt_cfg["level"]),
-                top_k_singular=int(dwt_cfg["top_k_singular"]),
-            )
-            cfa_features, cfa_map, _ = compute_cfa_features(
-                image_rgb=image,
-                window_size=int(cfa_cfg.get("window_size", 7)),
-                variance_threshold=float(cfa_cfg.get("variance_threshold", 0.6)),
-                smooth_sigma=float(cfa_cfg.get("smooth_sigma", 1.0)),
-                with_map=False,
-            )
-            prnu_features, prnu_residual, _ = compute_prnu_features(
-                image_rgb=image,
-                wavelet=str(prnu_cfg.get("wavelet", "db4")),
-                level=int(prnu_cfg.get("level", 2)),
-                with_map=False,
-            )
-            mantra_features, mantra_mask, _ = compute_mantra_features(
-                image_rgb=image,
-                config=mantra_cfg,
-                with_mask=False,
-            )
-
-            if save_heatmaps:
-                split_count = heatmap_counter.get(split, 0)
-                if split_count < max_heatmaps_per_split:
-                    safe_name = image_path.stem.replace(" ", "_")
-                    heatmap_path = heatmap_dir / split / f"{safe_name}.png"
-                    save_heatmap(residual_gray, heatmap_path)
-                    heatmap_counter[split] = split_count + 1
-
-            if save_cfa_maps:
-                safe_name = image_path.stem.replace(" ", "_")
-                save_cfa_map(cfa_map, cfa_map_dir / split / f"{safe_name}.png")
-            if save_prnu_maps:
-                safe_name = image_path.stem.replace(" ", "_")
-                save_prnu_map(prnu_residual, prnu_map_dir / split / f"{safe_name}.png")
-            if save_mantra_masks:
-                safe_name = image_path.stem.replace(" ", "_")
-                save_mantra_mask(mantra_mask, mantra_map_dir / split / f"{safe_name}.png")
-
-            records.append(
-                {
-                    "image_path": str(image_path),
-                    "label": int(row.label),
-                    "split": split,
-                    "source_dataset": row.source_dataset,
-                    "perturbation_tag": row.perturbation_tag,
-                    "mask_path": getattr(row, "mask_path", None),
-                    **ela_features,
-                    **dwt_features,
-                    **cfa_features,
-                    **prnu_features,
-                    **mantra_features,
-                }
-            )
         except Exception as exc:
-            LOGGER.warning("Failed feature extraction for %s: %s", image_path, exc)
+            LOGGER.warning("Failed heatmap back-fill for %s: %s", image_path, exc)
+            continue
+        safe_name = image_path.stem.replace(" ", "_")
+        save_heatmap(residual_gray, heatmap_dir / split / f"{safe_name}.png")
+        heatmap_counter[split] = split_count + 1
 
     if not records:
         raise RuntimeError("No features extracted; check dataset and decoding pipeline")
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from .cache import FEATURE_FAMILIES
+
+
+def column_family(column: str) -> str | None:
+    """Feature family that produces ``column`` (every extractor prefixes its keys)."""
+    for family in FEATURE_FAMILIES:
+        if column.startswith(f"{family}_"):
+            return family
+    return None
+
+
+def plan_feature_families(column_sets: Iterable[Iterable[str]]) -> tuple[str, ...]:
+    """Extractors needed to build every column set, in ``FEATURE_FAMILIES`` order.
+
+    A column that no family claims makes the plan fall back to all families, so an
+    unexpected artifact costs speed rather than a missing-feature error.
+    """
+    needed: set[str] = set()
+    for columns in column_sets:
+        for column in columns:
+            family = column_family(column)
+            if family is None:
+                return FEATURE_FAMILIES
+            needed.add(family)
+    return tuple(family for family in FEATURE_FAMILIES if family in needed)
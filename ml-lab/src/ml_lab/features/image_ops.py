@@ -1,18 +1,171 @@
 from __future__ import annotations
 
 import io
+import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
+from typing import Any, Collection
 
 import cv2
 import numpy as np
 from PIL import Image
 
+LOGGER = logging.getLogger(__name__)
 
-def load_rgb_image(path: str | Path, image_size: tuple[int, int]) -> np.ndarray:
-    p = Path(path)
-    raw = p.read_bytes()
+# (resolved path, mtime_ns, file size, image_size, reduced_decode)
+_ImageKey = tuple[str, int, int, tuple[int, int], bool]
+
+
+class DecodedImageCache:
+    """LRU of decoded, resized RGB images bounded by a byte budget.
+
+    Entries are keyed on path + mtime + size, so a file rewritten in place is decoded
+    again. ``admit`` restricts caching to the paths that later stages will re-read.
+    """
+
+    def __init__(self, max_bytes: int, admit: Collection[str] | None = None):
+        self.max_bytes = int(max_bytes)
+        self.admit = None if admit is None else {str(Path(p).resolve()) for p in admit}
+        self._entries: OrderedDict[_ImageKey, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: _ImageKey) -> np.ndarray | None:
+        with self._lock:
+            image = self._entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key: _ImageKey, image: np.ndarray) -> None:
+        if self.admit is not None and key[0] not in self.admit:
+            return
+        if image.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+            self._entries[key] = image
+            self.current_bytes += image.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_IMAGE_CACHE: DecodedImageCache | None = None
+# Materialized pre-resized store (see image_store.py), consulted before decoding.
+_IMAGE_STORE: Any = None
+
+
+def configure_image_cache(max_bytes: int, admit: Collection[str] | None = None) -> DecodedImageCache | None:
+    """Install (or with ``max_bytes <= 0`` remove) the process-wide decoded-image cache
+    used by ``load_rgb_image``. Worker processes keep their own, separate cache."""
+    global _IMAGE_CACHE
+    if _IMAGE_CACHE is not None:
+        _IMAGE_CACHE.clear()
+    _IMAGE_CACHE = DecodedImageCache(max_bytes, admit=admit) if int(max_bytes) > 0 else None
+    return _IMAGE_CACHE
+
+
+def configure_image_store(store: Any) -> None:
+    """Serve ``load_rgb_image`` from ``store`` (an ``ImageStore``) in this process. Worker
+    processes must install their own; the setting is only inherited under fork."""
+    global _IMAGE_STORE
+    _IMAGE_STORE = store
+
+
+def image_cache_stats() -> dict[str, Any] | None:
+    return _IMAGE_CACHE.stats() if _IMAGE_CACHE is not None else None
+
+
+def load_rgb_image(path: str | Path, image_size: tuple[int, int], reduced_decode: bool = False) -> np.ndarray:
+    store = _IMAGE_STORE
+    if (
+        store is not None
+        and store.image_size == (int(image_size[0]), int(image_size[1]))
+        and store.reduced_decode == bool(reduced_decode)
+    ):
+        stored = store.lookup(path)
+        if stored is not None:
+            return stored
+
+    cache = _IMAGE_CACHE
+    if cache is None:
+        return read_rgb_image(path, image_size, reduced_decode)
+
+    p = Path(path).resolve()
+    stat = p.stat()
+    key: _ImageKey = (
+        str(p),
+        int(stat.st_mtime_ns),
+        int(stat.st_size),
+        (int(image_size[0]), int(image_size[1])),
+        bool(reduced_decode),
+    )
+    image = cache.get(key)
+    if image is None:
+        image = read_rgb_image(p, image_size, reduced_decode)
+        cache.put(key, image)
+    # Callers own their array; the cached copy must never be mutated.
+    return image.copy()
+
+
+def read_rgb_image(path: str | Path, image_size: tuple[int, int], reduced_decode: bool = False) -> np.ndarray:
+    """Decode and resize ``path`` from disk, bypassing the image store and cache."""
+    return _decode_rgb(Path(path).read_bytes(), image_size, reduced_decode)
+
+
+# libjpeg can decode straight to 1/2, 1/4 or 1/8 scale in the DCT domain.
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def _decode_flag(raw: bytes, image_size: tuple[int, int]) -> int:
+    """Largest JPEG scale-down whose output still covers ``image_size``, read from the header."""
+    try:
+        with Image.open(io.BytesIO(raw)) as probe:
+            if probe.format != "JPEG":
+                return cv2.IMREAD_COLOR
+            width, height = probe.size
+    except Exception:
+        return cv2.IMREAD_COLOR
+    # EXIF orientation may swap the axes after decoding, so both sides must cover the
+    # larger target side.
+    target = max(int(image_size[0]), int(image_size[1]))
+    for factor, flag in _REDUCED_FLAGS:
+        if -(-height // factor) >= target and -(-width // factor) >= target:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def _decode_rgb(raw: bytes, image_size: tuple[int, int], reduced_decode: bool = False) -> np.ndarray:
     arr = np.frombuffer(raw, dtype=np.uint8)
-    image = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+    flag = _decode_flag(raw, image_size) if reduced_decode else cv2.IMREAD_COLOR
+    image = cv2.imdecode(arr, flag)
     if image is None:
         with Image.open(io.BytesIO(raw)) as pil:
             pil = pil.convert("RGB")
@@ -24,15 +177,11 @@ def load_rgb_image(path: str | Path, image_size: tuple[int, int]) -> np.ndarray:
     return image
 
 
-def decode_image_bytes(file_bytes: bytes, image_size: tuple[int, int]) -> np.ndarray:
-    arr = np.frombuffer(file_bytes, dtype=np.uint8)
-    image = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-    if image is None:
-        with Image.open(io.BytesIO(file_bytes)) as pil:
-            pil = pil.convert("RGB")
-            pil = pil.resize((image_size[1], image_size[0]), Image.Resampling.BILINEAR)
-            return np.array(pil, dtype=np.uint8)
+def decode_image_bytes(file_bytes: bytes, image_size: tuple[int, int], reduced_decode: bool = False) -> np.ndarray:
+    """Decode an uploaded image and resize it to ``image_size``.
 
-    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    image = cv2.resize(image, (image_size[1], image_size[0]), interpolation=cv2.INTER_AREA)
-    return image
+    With ``reduced_decode`` large JPEGs are decoded at 1/2, 1/4 or 1/8 scale before the
+    final resize, which cuts decode time and peak memory but changes pixels slightly, so
+    it must match the setting the model was trained with.
+    """
+    return _decode_rgb(file_bytes, image_size, reduced_decode)
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from ml_lab.utils.parallel import resolve_n_jobs
+
+from .image_ops import configure_image_store, read_rgb_image
+
+LOGGER = logging.getLogger(__name__)
+
+STORE_IMAGES = "images.npy"
+STORE_INDEX = "index.csv"
+
+
+def image_store_path(store_dir: str | Path, image_size: tuple[int, int], reduced_decode: bool = False) -> Path:
+    suffix = "-reduced" if reduced_decode else ""
+    return Path(store_dir) / f"{int(image_size[0])}x{int(image_size[1])}{suffix}"
+
+
+class ImageStore:
+    """Read-only view of a materialized store: one memory-mapped ``N x H x W x 3`` uint8
+    array of already-resized images plus an index keyed by ``file_md5``.
+
+    Lookups by path are validated against the file's size and mtime at materialization
+    time, so a file changed since then is decoded normally instead of served stale.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.images = np.load(self.path / STORE_IMAGES, mmap_mode="r")
+        self.image_size = (int(self.images.shape[1]), int(self.images.shape[2]))
+        self.reduced_decode = self.path.name.endswith("-reduced")
+        index = pd.read_csv(self.path / STORE_INDEX, dtype={"file_md5": str})
+        self.index = index
+        self._by_md5 = dict(zip(index["file_md5"], index["row"].astype(int)))
+        self._by_path = {
+            str(path): (int(row), int(size), int(mtime_ns))
+            for path, row, size, mtime_ns in zip(
+                index["image_path"], index["row"], index["file_size"], index["file_mtime_ns"]
+            )
+        }
+
+    @classmethod
+    def open(
+        cls,
+        store_dir: str | Path,
+        image_size: tuple[int, int],
+        reduced_decode: bool = False,
+    ) -> ImageStore | None:
+        path = image_store_path(store_dir, image_size, reduced_decode)
+        if not (path / STORE_IMAGES).exists() or not (path / STORE_INDEX).exists():
+            return None
+        return cls(path)
+
+    def __len__(self) -> int:
+        return len(self._by_md5)
+
+    def __contains__(self, file_md5: object) -> bool:
+        return str(file_md5) in self._by_md5
+
+    def get_md5(self, file_md5: str) -> np.ndarray | None:
+        row = self._by_md5.get(str(file_md5))
+        return None if row is None else np.array(self.images[row])
+
+    def lookup(self, image_path: str | Path) -> np.ndarray | None:
+        p = Path(image_path).resolve()
+        entry = self._by_path.get(str(p))
+        if entry is None:
+            return None
+        row, size, mtime_ns = entry
+        try:
+            stat = p.stat()
+        except OSError:
+            return None
+        if int(stat.st_size) != size or int(stat.st_mtime_ns) != mtime_ns:
+            return None
+        return np.array(self.images[row])
+
+
+def activate_image_store(config: dict[str, Any]) -> ImageStore | None:
+    """Serve ``load_rgb_image`` from ``paths.image_store_dir`` when a store exists for
+    ``experiment.image_size`` / ``experiment.reduced_decode``; otherwise images keep
+    being decoded from disk."""
+    store_dir = config["paths"].get("image_store_dir")
+    store = None
+    if store_dir:
+        store = ImageStore.open(
+            store_dir,
+            tuple(config["experiment"]["image_size"]),
+            reduced_decode=bool(config["experiment"].get("reduced_decode", False)),
+        )
+        if store is None:
+            LOGGER.debug("No materialized image store under %s", store_dir)
+    configure_image_store(store)
+    return store
+
+
+def materialize_image_store(
+    manifest: pd.DataFrame,
+    store_dir: str | Path,
+    image_size: tuple[int, int],
+    n_workers: int | None = None,
+    reduced_decode: bool = False,
+) -> dict[str, Any]:
+    """Decode and resize every manifest image once into ``store_dir/<H>x<W>`` (with a
+    ``-reduced`` suffix for reduced-resolution JPEG decoding).
+
+    Identical files (same ``file_md5``) share one row. Rows of an existing store are
+    copied over instead of decoded again, so re-running after a manifest refresh only
+    decodes new content.
+    """
+    if "file_md5" not in manifest.columns:
+        raise ValueError("Manifest must have a file_md5 column to materialize images")
+    image_size = (int(image_size[0]), int(image_size[1]))
+    out_dir = image_store_path(store_dir, image_size, reduced_decode)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    previous = ImageStore.open(store_dir, image_size, reduced_decode)
+
+    paths = [Path(p).resolve() for p in manifest["image_path"].astype(str)]
+    md5s = manifest["file_md5"].astype(str).tolist()
+    unique_md5: dict[str, Path] = {}
+    for path, file_md5 in zip(paths, md5s):
+        unique_md5.setdefault(file_md5, path)
+
+    def _load(item: tuple[str, Path]) -> np.ndarray | None:
+        file_md5, path = item
+        if previous is not None:
+            image = previous.get_md5(file_md5)
+            if image is not None:
+                return image
+        try:
+            return read_rgb_image(path, image_size, reduced_decode)
+        except Exception as exc:
+            LOGGER.warning("Skipping %s in image store: %s", path, exc)
+            return None
+
+    tmp_images = out_dir / f"{STORE_IMAGES}.tmp"
+    images = np.lib.format.open_memmap(
+        tmp_images, mode="w+", dtype=np.uint8, shape=(len(unique_md5), image_size[0], image_size[1], 3)
+    )
+    rows: dict[str, int] = {}
+    reused = sum(1 for file_md5 in unique_md5 if previous is not None and file_md5 in previous)
+    workers = resolve_n_jobs(-1 if n_workers is None else n_workers, n_tasks=len(unique_md5))
+    # cv2 decode/resize release the GIL, so threads are enough and avoid copying
+    # decoded arrays between processes. A failed decode leaves its row unused (and
+    # unindexed) rather than shifting every later row.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for row, (file_md5, image) in enumerate(zip(unique_md5, pool.map(_load, unique_md5.items()))):
+            if image is None:
+                continue
+            images[row] = image
+            rows[file_md5] = row
+    images.flush()
+    del images
+    previous = None
+
+    index_rows: list[dict[str, Any]] = []
+    for path, file_md5 in zip(paths, md5s):
+        if file_md5 not in rows:
+            continue
+        stat = path.stat()
+        index_rows.append(
+            {
+                "file_md5": file_md5,
+                "row": rows[file_md5],
+                "image_path": str(path),
+                "file_size": int(stat.st_size),
+                "file_mtime_ns": int(stat.st_mtime_ns),
+            }
+        )
+    tmp_index = out_dir / f"{STORE_INDEX}.tmp"
+    pd.DataFrame(
+        index_rows, columns=["file_md5", "row", "image_path", "file_size", "file_mtime_ns"]
+    ).to_csv(tmp_index, index=False)
+    # Drop the old index first so a concurrent reader sees "no store" rather than an
+    # old index paired with new rows.
+    (out_dir / STORE_INDEX).unlink(missing_ok=True)
+    os.replace(tmp_images, out_dir / STORE_IMAGES)
+    os.replace(tmp_index, out_dir / STORE_INDEX)
+
+    summary = {
+        "store_path": str(out_dir),
+        "images": len(rows),
+        "paths": len(index_rows),
+        "reused": reused,
+        "decoded": len(unique_md5) - reused,
+        "failed": len(unique_md5) - len(rows),
+        "bytes": int(len(unique_md5) * image_size[0] * image_size[1] * 3),
+    }
+    LOGGER.info("Materialized image store: %s", summary)
+    return summary
@@ -1,51 +1,45 @@
 from __future__ import annotations
 
-import base64
 import logging
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Sequence
 
 import cv2
 import numpy as np
 
-LOGGER = logging.getLogger(__name__)
-
+from .context import ImageInput, as_image_context
+from .map_render import colorize, encode_map_base64, normalize_to_uint8
+from .stats import map_stats, percentiles
 
-def _to_gray(image_rgb: np.ndarray) -> np.ndarray:
-    return (
-        0.299 * image_rgb[:, :, 0].astype(np.float32)
-        + 0.587 * image_rgb[:, :, 1].astype(np.float32)
-        + 0.114 * image_rgb[:, :, 2].astype(np.float32)
-    )
+LOGGER = logging.getLogger(__name__)
 
 
 def _normalize_map(x: np.ndarray) -> np.ndarray:
     x = np.maximum(x, 0.0)
-    max_v = float(np.percentile(x, 99.0))
+    max_v = percentiles(x, (99.0,))[99.0]
     if max_v <= 1e-8:
         return np.zeros_like(x, dtype=np.float32)
     return np.clip(x / max_v, 0.0, 1.0).astype(np.float32)
 
 
+def colorize_mantra_mask(mask: np.ndarray) -> np.ndarray:
+    return colorize(normalize_to_uint8(mask), cv2.COLORMAP_PLASMA)
+
+
 def _map_png_base64(mask: np.ndarray) -> str:
-    norm = _normalize_map(mask)
-    colored = cv2.applyColorMap((norm * 255.0).astype(np.uint8), cv2.COLORMAP_PLASMA)
-    ok, encoded = cv2.imencode(".png", colored)
-    if not ok:
-        return ""
-    return base64.b64encode(encoded.tobytes()).decode("ascii")
+    return encode_map_base64(colorize_mantra_mask(mask))
 
 
 def save_mantra_mask(mask: np.ndarray, output_path: str | Path) -> None:
     path = Path(output_path)
     path.parent.mkdir(parents=True, exist_ok=True)
-    norm = _normalize_map(mask)
-    colored = cv2.applyColorMap((norm * 255.0).astype(np.uint8), cv2.COLORMAP_PLASMA)
-    cv2.imwrite(str(path), colored)
+    cv2.imwrite(str(path), colorize_mantra_mask(mask))
 
 
-def _heuristic_mask(image_rgb: np.ndarray, blur_sigma: float = 1.2) -> np.ndarray:
-    gray = _to_gray(image_rgb)
+def _heuristic_mask(gray: np.ndarray, blur_sigma: float = 1.2) -> np.ndarray:
     blur = cv2.GaussianBlur(gray, (0, 0), sigmaX=max(0.1, float(blur_sigma)))
     highpass = np.abs(gray - blur)
     lap = np.abs(cv2.Laplacian(gray, cv2.CV_32F, ksize=3))
@@ -54,59 +48,187 @@ def _heuristic_mask(image_rgb: np.ndarray, blur_sigma: float = 1.2) -> np.ndarra
     return cv2.GaussianBlur(mask.astype(np.float32), (0, 0), sigmaX=0.8)
 
 
-def _infer_torchscript(image_rgb: np.ndarray, checkpoint_path: Path) -> tuple[np.ndarray, str]:
-    import torch  # lazy import for optional dependency
+@dataclass
+class LoadedMantraModel:
+    model: Any
+    checkpoint_path: str
+    load_ms: float
+    warmup_ms: float | None = None
 
-    model = torch.jit.load(str(checkpoint_path), map_location="cpu")
-    model.eval()
+    def info(self) -> dict[str, Any]:
+        return {
+            "checkpointPath": self.checkpoint_path,
+            "loadMs": round(self.load_ms, 3),
+            "warmupMs": round(self.warmup_ms, 3) if self.warmup_ms is not None else None,
+        }
 
-    x = torch.from_numpy(image_rgb.astype(np.float32) / 255.0).permute(2, 0, 1).unsqueeze(0)
-    with torch.no_grad():
-        out = model(x)
-    if isinstance(out, (tuple, list)):
-        out = out[0]
-    mask = out.squeeze().detach().cpu().numpy().astype(np.float32)
+
+# Process-level registry: one loaded TorchScript module per checkpoint file version.
+# Failed loads are cached too so a broken checkpoint is not re-read for every image.
+_MODEL_REGISTRY: dict[tuple[str, int, int], LoadedMantraModel | Exception] = {}
+_MODEL_LOCK = threading.Lock()
+
+
+def _checkpoint_key(checkpoint_path: Path) -> tuple[str, int, int]:
+    stat = checkpoint_path.stat()
+    return str(checkpoint_path.resolve()), int(stat.st_mtime_ns), int(stat.st_size)
+
+
+def load_mantra_model(checkpoint_path: str | Path) -> LoadedMantraModel:
+    """Return the TorchScript model for ``checkpoint_path``, loading it at most once per
+    process. A checkpoint rewritten in place (new mtime/size) is reloaded."""
+    key = _checkpoint_key(Path(checkpoint_path))
+    with _MODEL_LOCK:
+        entry = _MODEL_REGISTRY.get(key)
+        if entry is None:
+            for stale in [k for k in _MODEL_REGISTRY if k[0] == key[0]]:
+                del _MODEL_REGISTRY[stale]
+            started = time.perf_counter()
+            try:
+                import torch  # lazy import for optional dependency
+
+                model = torch.jit.load(key[0], map_location="cpu")
+                model.eval()
+                entry = LoadedMantraModel(
+                    model=model,
+                    checkpoint_path=key[0],
+                    load_ms=(time.perf_counter() - started) * 1000.0,
+                )
+                LOGGER.info("ManTra torchscript loaded from %s in %.1f ms", key[0], entry.load_ms)
+            except Exception as exc:
+                entry = exc
+            _MODEL_REGISTRY[key] = entry
+    if isinstance(entry, Exception):
+        raise entry
+    return entry
+
+
+def _postprocess_mask(out: np.ndarray) -> np.ndarray:
+    mask = np.squeeze(out).astype(np.float32)
     if mask.ndim != 2:
         raise ValueError(f"TorchScript output shape is unsupported: {mask.shape}")
     if float(mask.min()) < 0.0 or float(mask.max()) > 1.0:
         mask = 1.0 / (1.0 + np.exp(-mask))
-    return mask, "torchscript"
+    return mask
+
+
+def _forward_torchscript(images_rgb: Sequence[np.ndarray], checkpoint_path: Path) -> list[np.ndarray]:
+    import torch  # lazy import for optional dependency
+
+    model = load_mantra_model(checkpoint_path).model
+    x = torch.from_numpy(np.stack([img.astype(np.float32) / 255.0 for img in images_rgb], axis=0)).permute(0, 3, 1, 2)
+    with torch.no_grad():
+        out = model(x)
+    if isinstance(out, (tuple, list)):
+        out = out[0]
+    out = out.detach().cpu().numpy()
+    if len(images_rgb) == 1 and (out.ndim < 3 or out.shape[0] != 1):
+        # Some exported models drop the batch axis for a single image.
+        return [_postprocess_mask(out)]
+    if out.shape[0] != len(images_rgb):
+        raise ValueError(f"TorchScript batch output shape is unsupported: {out.shape}")
+    return [_postprocess_mask(item) for item in out]
+
+
+def _infer_torchscript(image_rgb: np.ndarray, checkpoint_path: Path) -> tuple[np.ndarray, str]:
+    return _forward_torchscript([image_rgb], checkpoint_path)[0], "torchscript"
+
+
+def _learned_checkpoint(config: dict[str, Any]) -> Path | None:
+    checkpoint = str(config.get("checkpoint_path", "")).strip()
+    if checkpoint and Path(checkpoint).exists():
+        return Path(checkpoint)
+    return None
+
+
+def mantra_batch_size(config: dict[str, Any]) -> int:
+    """Images per ManTra forward pass; always 1 when the heuristic backend is in use."""
+    if _learned_checkpoint(config) is None:
+        return 1
+    return max(1, int(config.get("batch_size", 8)))
+
+
+def predict_mantra_masks(images_rgb: Sequence[np.ndarray], config: dict[str, Any]) -> list[np.ndarray | None]:
+    """Run the TorchScript backend over same-size images in batches of ``batch_size``.
+
+    Entries are ``None`` when the learned backend is not configured or fails, so that
+    ``compute_mantra_features`` falls back to its usual per-image path for them.
+    """
+    masks: list[np.ndarray | None] = [None] * len(images_rgb)
+    checkpoint_path = _learned_checkpoint(config)
+    if checkpoint_path is None or not images_rgb:
+        return masks
+    try:
+        import torch  # lazy import for optional dependency
+
+        torch_threads = config.get("torch_threads")
+        if torch_threads is not None and torch.get_num_threads() != int(torch_threads):
+            torch.set_num_threads(int(torch_threads))
+        batch_size = mantra_batch_size(config)
+        for start in range(0, len(images_rgb), batch_size):
+            masks[start : start + batch_size] = _forward_torchscript(images_rgb[start : start + batch_size], checkpoint_path)
+    except Exception as exc:
+        LOGGER.warning("ManTra batched torchscript inference failed (%s); using per-image path.", exc)
+        return [None] * len(images_rgb)
+    return masks
+
+
+def warm_up_mantra_model(config: dict[str, Any], image_size: tuple[int, int]) -> dict[str, Any] | None:
+    """Load the configured checkpoint and run one forward pass so the first real request
+    does not pay for loading and TorchScript graph optimisation. Returns the model info,
+    or ``None`` when the heuristic backend is in use."""
+    checkpoint = str(config.get("checkpoint_path", "")).strip()
+    if not checkpoint or not Path(checkpoint).exists():
+        return None
+    try:
+        loaded = load_mantra_model(checkpoint)
+        started = time.perf_counter()
+        _infer_torchscript(np.zeros((int(image_size[0]), int(image_size[1]), 3), dtype=np.uint8), Path(checkpoint))
+        loaded.warmup_ms = (time.perf_counter() - started) * 1000.0
+    except Exception as exc:
+        LOGGER.warning("ManTra torchscript warm-up failed (%s); requests will use the heuristic.", exc)
+        return {"checkpointPath": checkpoint, "error": str(exc)}
+    return loaded.info()
 
 
 def compute_mantra_features(
-    image_rgb: np.ndarray,
+    image_rgb: ImageInput,
     config: dict[str, Any],
     with_mask: bool = False,
+    mask: np.ndarray | None = None,
 ) -> tuple[dict[str, float], np.ndarray, str | None]:
+    """``mask`` takes a precomputed TorchScript mask (see ``predict_mantra_masks``)."""
+    context = as_image_context(image_rgb)
     checkpoint = str(config.get("checkpoint_path", "")).strip()
     backend = "heuristic"
-    mask: np.ndarray
 
-    if checkpoint:
+    if mask is not None:
+        backend = "torchscript"
+    elif checkpoint:
         checkpoint_path = Path(checkpoint)
         if checkpoint_path.exists():
             try:
-                mask, backend = _infer_torchscript(image_rgb=image_rgb, checkpoint_path=checkpoint_path)
+                mask, backend = _infer_torchscript(image_rgb=context.rgb, checkpoint_path=checkpoint_path)
             except Exception as exc:
                 LOGGER.warning("ManTra torchscript load failed (%s), fallback to heuristic.", exc)
-                mask = _heuristic_mask(image_rgb=image_rgb, blur_sigma=float(config.get("heuristic_sigma", 1.2)))
+                mask = _heuristic_mask(gray=context.gray, blur_sigma=float(config.get("heuristic_sigma", 1.2)))
         else:
-            mask = _heuristic_mask(image_rgb=image_rgb, blur_sigma=float(config.get("heuristic_sigma", 1.2)))
+            mask = _heuristic_mask(gray=context.gray, blur_sigma=float(config.get("heuristic_sigma", 1.2)))
     else:
-        mask = _heuristic_mask(image_rgb=image_rgb, blur_sigma=float(config.get("heuristic_sigma", 1.2)))
+        mask = _heuristic_mask(gray=context.gray, blur_sigma=float(config.get("heuristic_sigma", 1.2)))
 
     high_threshold = float(config.get("high_threshold", 0.65))
-    high_ratio = float(np.mean(mask >= high_threshold))
     top_k_pct = float(config.get("top_k_percentile", 93.0))
-    top_vals = mask[mask >= np.percentile(mask, top_k_pct)]
-    top_mean = float(top_vals.mean()) if top_vals.size else float(mask.mean())
+    stats = map_stats(mask, percentiles_at=(top_k_pct, 95), thresholds=(high_threshold,))
+    top_vals = mask[mask >= stats.percentiles[top_k_pct]]
+    top_mean = float(top_vals.mean()) if top_vals.size else stats.mean
 
     features = {
         "mantra_score": float(np.clip(top_mean, 0.0, 1.0)),
-        "mantra_mask_mean": float(mask.mean()),
-        "mantra_mask_std": float(mask.std()),
-        "mantra_mask_p95": float(np.percentile(mask, 95)),
-        "mantra_high_ratio": high_ratio,
+        "mantra_mask_mean": stats.mean,
+        "mantra_mask_std": stats.std,
+        "mantra_mask_p95": stats.percentiles[95],
+        "mantra_high_ratio": stats.ratios[high_threshold],
         "mantra_backend_torchscript": 1.0 if backend == "torchscript" else 0.0,
     }
     mask_b64 = _map_png_base64(mask) if with_mask else None
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import base64
+from dataclasses import dataclass
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# Maps above this many pixels estimate their normalization percentile from a strided
+# sample. The stride is kept odd so it does not alias with even-periodic patterns
+# (e.g. the 2x2 CFA lattice).
+MAX_EXACT_PIXELS = 1 << 20
+
+# format -> (cv2 extension, media type)
+MAP_FORMATS = {
+    "png": (".png", "image/png"),
+    "webp": (".webp", "image/webp"),
+    "jpeg": (".jpg", "image/jpeg"),
+}
+
+
+@dataclass(frozen=True)
+class MapEncoding:
+    """How a colorized map is compressed.
+
+    ``png_compression=None`` keeps OpenCV's default (fast, RLE-style) PNG settings;
+    0-9 trade speed for size. ``quality`` applies to the lossy formats.
+    """
+
+    format: str = "png"
+    png_compression: int | None = None
+    quality: int = 85
+
+    def __post_init__(self) -> None:
+        if self.format not in MAP_FORMATS:
+            raise ValueError(f"Unsupported map format {self.format!r}; expected one of {sorted(MAP_FORMATS)}")
+
+    @property
+    def media_type(self) -> str:
+        return MAP_FORMATS[self.format][1]
+
+    def params(self) -> list[int]:
+        if self.format == "png":
+            return [] if self.png_compression is None else [int(cv2.IMWRITE_PNG_COMPRESSION), int(self.png_compression)]
+        if self.format == "webp":
+            return [int(cv2.IMWRITE_WEBP_QUALITY), int(self.quality)]
+        return [int(cv2.IMWRITE_JPEG_QUALITY), int(self.quality)]
+
+
+DEFAULT_ENCODING = MapEncoding()
+
+
+def robust_max(x: np.ndarray, q: float = 99.0) -> float:
+    """``q``-th percentile of ``max(x, 0)``.
+
+    Nearest rank with a single-kth ``np.partition`` instead of ``np.percentile``'s
+    interpolated two-kth partition: ~10x faster and within a rank of the exact value.
+    """
+    flat = np.asarray(x).reshape(-1)
+    stride = 1 if flat.size <= MAX_EXACT_PIXELS else (flat.size // MAX_EXACT_PIXELS) | 1
+    sample = flat[::stride]
+    if sample.size == 0:
+        return 0.0
+    kth = int(round(q / 100.0 * (sample.size - 1)))
+    return max(float(np.partition(sample, kth)[kth]), 0.0)
+
+
+def scale_to_uint8(x: np.ndarray, scale: float) -> np.ndarray:
+    """``clip(x * scale, 0, 255)`` truncated to uint8 in one buffer."""
+    scaled = np.multiply(x, np.float32(scale), dtype=np.float32)
+    np.clip(scaled, 0.0, 255.0, out=scaled)
+    return scaled.astype(np.uint8)
+
+
+def normalize_to_uint8(x: np.ndarray, q: float = 99.0) -> np.ndarray:
+    """Map ``[0, p_q]`` onto ``[0, 255]``; an all-zero map stays zero."""
+    max_v = robust_max(x, q)
+    if max_v <= 1e-8:
+        return np.zeros(np.shape(x), dtype=np.uint8)
+    return scale_to_uint8(x, 255.0 / max_v)
+
+
+@lru_cache(maxsize=None)
+def colormap_lut(colormap: int) -> np.ndarray:
+    """256 x 3 BGR table of an OpenCV colormap, built once per colormap."""
+    ramp = np.arange(256, dtype=np.uint8).reshape(256, 1)
+    lut = cv2.applyColorMap(ramp, colormap).reshape(256, 3)
+    lut.setflags(write=False)
+    return lut
+
+
+def colorize(index: np.ndarray, colormap: int) -> np.ndarray:
+    """BGR image of a uint8 index map through ``colormap``."""
+    return np.take(colormap_lut(colormap), index, axis=0)
+
+
+def encode_map(colored: np.ndarray, encoding: MapEncoding = DEFAULT_ENCODING) -> bytes:
+    ok, encoded = cv2.imencode(MAP_FORMATS[encoding.format][0], colored, encoding.params())
+    if not ok:
+        raise RuntimeError(f"Encoding a map as {encoding.format} failed")
+    return encoded.tobytes()
+
+
+def encode_map_base64(colored: np.ndarray, encoding: MapEncoding = DEFAULT_ENCODING) -> str:
+    """Base64 payload of ``encode_map``; empty when encoding fails, like the inline maps always were."""
+    try:
+        return base64.b64encode(encode_map(colored, encoding)).decode("ascii")
+    except RuntimeError:
+        return ""
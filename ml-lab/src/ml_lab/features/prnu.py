@@ -1,23 +1,19 @@
 from __future__ import annotations
 
-import base64
 from pathlib import Path
 
 import cv2
 import numpy as np
 import pywt
 
-
-def _to_gray(image_rgb: np.ndarray) -> np.ndarray:
-    return (
-        0.299 * image_rgb[:, :, 0].astype(np.float32)
-        + 0.587 * image_rgb[:, :, 1].astype(np.float32)
-        + 0.114 * image_rgb[:, :, 2].astype(np.float32)
-    )
+from .context import ImageContext, ImageInput, as_image_context
+from .map_render import colorize, encode_map_base64, normalize_to_uint8
+from .stats import fraction_at_least, percentiles
 
 
-def _wavelet_wiener_denoise(gray: np.ndarray, wavelet: str, level: int) -> np.ndarray:
-    coeffs = pywt.wavedec2(gray, wavelet=wavelet, level=level)
+def _wavelet_wiener_denoise(context: ImageContext, wavelet: str, level: int) -> np.ndarray:
+    gray = context.gray
+    coeffs = context.wavedec2(wavelet=wavelet, level=level)
     approx = coeffs[0]
     details = coeffs[1:]
     if not details:
@@ -40,29 +36,18 @@ def _wavelet_wiener_denoise(gray: np.ndarray, wavelet: str, level: int) -> np.nd
     return denoised[: gray.shape[0], : gray.shape[1]].astype(np.float32)
 
 
-def _normalize_map(x: np.ndarray) -> np.ndarray:
-    x = np.abs(x)
-    max_v = float(np.percentile(x, 99.0))
-    if max_v <= 1e-8:
-        return np.zeros_like(x, dtype=np.float32)
-    return np.clip(x / max_v, 0.0, 1.0).astype(np.float32)
+def colorize_prnu_map(x: np.ndarray) -> np.ndarray:
+    return colorize(normalize_to_uint8(np.abs(x)), cv2.COLORMAP_INFERNO)
 
 
 def _png_base64_from_map(x: np.ndarray) -> str:
-    norm = _normalize_map(x)
-    colored = cv2.applyColorMap((norm * 255.0).astype(np.uint8), cv2.COLORMAP_INFERNO)
-    ok, encoded = cv2.imencode(".png", colored)
-    if not ok:
-        return ""
-    return base64.b64encode(encoded.tobytes()).decode("ascii")
+    return encode_map_base64(colorize_prnu_map(x))
 
 
 def save_prnu_map(residual: np.ndarray, output_path: str | Path) -> None:
     path = Path(output_path)
     path.parent.mkdir(parents=True, exist_ok=True)
-    norm = _normalize_map(residual)
-    colored = cv2.applyColorMap((norm * 255.0).astype(np.uint8), cv2.COLORMAP_INFERNO)
-    cv2.imwrite(str(path), colored)
+    cv2.imwrite(str(path), colorize_prnu_map(residual))
 
 
 def build_prnu_reference(residual_maps: list[np.ndarray]) -> np.ndarray:
@@ -91,13 +76,14 @@ def correlate_prnu_with_reference(residual: np.ndarray, reference: np.ndarray) -
 
 
 def compute_prnu_features(
-    image_rgb: np.ndarray,
+    image_rgb: ImageInput,
     wavelet: str,
     level: int,
     with_map: bool = False,
 ) -> tuple[dict[str, float], np.ndarray, str | None]:
-    gray = _to_gray(image_rgb)
-    denoised = _wavelet_wiener_denoise(gray, wavelet=wavelet, level=level)
+    context = as_image_context(image_rgb)
+    gray = context.gray
+    denoised = _wavelet_wiener_denoise(context, wavelet=wavelet, level=level)
     residual = gray - denoised
     residual = residual - float(residual.mean())
 
@@ -110,7 +96,8 @@ def compute_prnu_features(
 
     residual_energy = float(np.mean(residual * residual))
     gray_energy = float(np.mean(gray * gray)) + 1e-8
-    high_ratio = float(np.mean(abs_res >= np.percentile(abs_res, 90)))
+    abs_quantiles = percentiles(abs_res, (90, 95))
+    high_ratio = fraction_at_least(abs_res, abs_quantiles[90])
 
     features = {
         "prnu_residual_std": float(residual.std()),
@@ -118,7 +105,7 @@ def compute_prnu_features(
         "prnu_snr_estimate": float(residual_energy / gray_energy),
         "prnu_row_col_corr": float(np.clip(pseudo_corr, -1.0, 1.0)),
         "prnu_high_residual_ratio": high_ratio,
-        "prnu_p95_abs_residual": float(np.percentile(abs_res, 95)),
+        "prnu_p95_abs_residual": abs_quantiles[95],
     }
     map_b64 = _png_base64_from_map(residual) if with_map else None
     return features, residual, map_b64
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+
+
+def percentiles(x: np.ndarray, qs: Iterable[float], overwrite_input: bool = False) -> dict[float, float]:
+    """``{q: np.percentile(x, q)}`` for every ``q`` from a single ``np.partition``.
+
+    Each ``np.percentile`` call copies and partitions the whole array; here all the order
+    statistics the linear method needs are selected in one pass. The interpolation is done
+    on numpy scalars of ``x.dtype`` with a Python-float weight, which is exactly what
+    ``np.percentile`` does for a scalar ``q``, so the values match it bit for bit.
+    """
+    flat = np.asarray(x).reshape(-1)
+    if not overwrite_input:
+        flat = flat.copy()
+    n = flat.size
+    if n == 0:
+        raise ValueError("Cannot take percentiles of an empty array")
+
+    plan: dict[float, tuple[int, int, float]] = {}
+    for q in qs:
+        virtual = (n - 1) * (float(q) / 100)
+        lower = math.floor(virtual)
+        if virtual >= n - 1:
+            lower = upper = n - 1
+        elif virtual < 0:
+            lower = upper = 0
+        else:
+            upper = lower + 1
+        plan[float(q)] = (lower, upper, virtual - math.floor(virtual))
+    if not plan:
+        return {}
+    flat.partition(sorted({k for lower, upper, _ in plan.values() for k in (lower, upper)}))
+
+    out: dict[float, float] = {}
+    for q, (lower, upper, gamma) in plan.items():
+        below, above = flat[lower], flat[upper]
+        diff = above - below
+        value = above - diff * (1 - gamma) if gamma >= 0.5 else below + diff * gamma
+        out[q] = float(value)
+    return out
+
+
+def fraction_at_least(x: np.ndarray, threshold: float) -> float:
+    """``np.mean(x >= threshold)`` without the float64 reduction over a boolean array."""
+    return np.count_nonzero(x >= threshold) / x.size
+
+
+@dataclass(frozen=True)
+class MapStats:
+    mean: float
+    std: float
+    percentiles: dict[float, float]
+    # threshold -> fraction of values >= threshold
+    ratios: dict[float, float]
+
+
+def map_stats(
+    x: np.ndarray,
+    percentiles_at: Iterable[float] = (),
+    thresholds: Iterable[float] = (),
+) -> MapStats:
+    """Summary statistics every ``compute_*_features`` reads off its map.
+
+    Mean and std keep numpy's own reductions so feature values stay identical to the
+    per-statistic calls they replace.
+    """
+    return MapStats(
+        mean=float(x.mean()),
+        std=float(x.std()),
+        percentiles=percentiles(x, percentiles_at),
+        ratios={float(t): fraction_at_least(x, t) for t in thresholds},
+    )
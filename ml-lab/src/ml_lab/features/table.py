@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from ml_lab.models.methods import get_method_feature_columns
+
+LOGGER = logging.getLogger(__name__)
+
+META_COLUMNS = ["image_path", "label", "split", "source_dataset", "perturbation_tag", "mask_path"]
+ARROW_SUFFIXES = {".arrow", ".feather"}
+PARQUET_SUFFIXES = {".parquet"}
+
+
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401  # optional dependency
+    except ImportError:
+        return False
+    return True
+
+
+def default_feature_table_name() -> str:
+    return "feature_table.arrow" if _has_pyarrow() else "feature_table.csv"
+
+
+def feature_columns_of(columns: Iterable[str]) -> list[str]:
+    return [c for c in columns if c not in META_COLUMNS]
+
+
+def _to_storage_frame(feature_table: pd.DataFrame) -> pd.DataFrame:
+    out = feature_table.copy()
+    for col in feature_columns_of(out.columns):
+        if pd.api.types.is_numeric_dtype(out[col]):
+            out[col] = out[col].astype(np.float32)
+    for col in ["image_path", "split", "source_dataset", "perturbation_tag", "mask_path"]:
+        if col in out.columns:
+            out[col] = out[col].map(lambda v: None if pd.isna(v) else str(v))
+    if "label" in out.columns:
+        out["label"] = out["label"].astype(np.int32)
+    return out.reset_index(drop=True)
+
+
+def save_feature_table(feature_table: pd.DataFrame, path: str | Path) -> Path:
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    suffix = p.suffix.lower()
+    if suffix in ARROW_SUFFIXES:
+        # Uncompressed Arrow IPC so readers can memory-map columns without decoding.
+        _to_storage_frame(feature_table).to_feather(p, compression="uncompressed")
+    elif suffix in PARQUET_SUFFIXES:
+        _to_storage_frame(feature_table).to_parquet(p, index=False)
+    else:
+        feature_table.to_csv(p, index=False)
+    return p
+
+
+def _list_columns(p: Path) -> list[str]:
+    suffix = p.suffix.lower()
+    if suffix in ARROW_SUFFIXES:
+        import pyarrow as pa
+
+        with pa.memory_map(str(p)) as source:
+            return list(pa.ipc.open_file(source).schema.names)
+    if suffix in PARQUET_SUFFIXES:
+        import pyarrow.parquet as pq
+
+        return list(pq.read_schema(p).names)
+    return list(pd.read_csv(p, nrows=0).columns)
+
+
+def _projected_columns(
+    all_columns: list[str],
+    methods: Iterable[str] | None,
+    columns: Iterable[str] | None,
+) -> list[str] | None:
+    if methods is None and columns is None:
+        return None
+    wanted: set[str] = set(columns or [])
+    available_features = feature_columns_of(all_columns)
+    for method in methods or []:
+        wanted.update(get_method_feature_columns(method, available_features))
+    wanted.update(c for c in META_COLUMNS if c in all_columns)
+    return [c for c in all_columns if c in wanted]
+
+
+def load_feature_table(
+    path: str | Path,
+    methods: Iterable[str] | None = None,
+    columns: Iterable[str] | None = None,
+) -> pd.DataFrame:
+    """Load a feature table, optionally projected to the columns the given methods use."""
+    p = Path(path)
+    if not p.exists():
+        raise FileNotFoundError(f"Feature table not found: {p}")
+
+    selected = _projected_columns(_list_columns(p), methods, columns)
+    suffix = p.suffix.lower()
+    if suffix in ARROW_SUFFIXES:
+        import pyarrow.feather as feather
+
+        table = feather.read_table(p, columns=selected, memory_map=True)
+        df = table.to_pandas(split_blocks=True)
+    elif suffix in PARQUET_SUFFIXES:
+        import pyarrow.parquet as pq
+
+        df = pq.read_table(p, columns=selected, memory_map=True).to_pandas()
+    else:
+        df = pd.read_csv(p, usecols=selected)
+    LOGGER.info("Feature table loaded: %s (%d rows, %d columns)", p, len(df), len(df.columns))
+    return df
@@ -1,7 +1,8 @@
 from .methods import get_method_feature_columns
+from .preprocessing import PreprocessCache
 from .trainer import (
     MethodTrainingResult,
     train_method,
 )
 
-__all__ = ["get_method_feature_columns", "MethodTrainingResult", "train_method"]
+__all__ = ["get_method_feature_columns", "MethodTrainingResult", "PreprocessCache", "train_method"]
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import copy
+from typing import Any, Iterable
+
+import numpy as np
+from sklearn.feature_selection import SelectKBest, f_classif
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+
+class PreprocessCache:
+    """Scaler + SelectKBest transforms fitted once on a training matrix and shared by every
+    tuning candidate with the same preprocessing.
+
+    The scaler is fitted once and the F-statistics are computed once on the scaled train
+    matrix; each ``top_k`` only changes which columns are kept. Matrices are materialized
+    eagerly so the cache can be shipped to worker processes as-is.
+    """
+
+    def __init__(
+        self,
+        x_train: np.ndarray,
+        y_train: np.ndarray,
+        top_k_values: Iterable[int | None] = (None,),
+        **eval_matrices: np.ndarray,
+    ) -> None:
+        self.y_train = y_train
+        self.scaler = StandardScaler().fit(x_train)
+        scaled = {"train": self.scaler.transform(x_train)}
+        for name, x in eval_matrices.items():
+            scaled[name] = self.scaler.transform(x)
+
+        self._selectors: dict[int | None, SelectKBest | None] = {None: None}
+        self._matrices: dict[tuple[str, int | None], np.ndarray] = {}
+        ranked: SelectKBest | None = None
+        for top_k in dict.fromkeys(top_k_values):
+            if top_k is not None:
+                if ranked is None:
+                    ranked = SelectKBest(score_func=f_classif, k="all").fit(scaled["train"], y_train)
+                # The support mask is derived from ``k`` at transform time, so every top_k
+                # reuses the same fitted scores.
+                self._selectors[top_k] = copy.copy(ranked).set_params(k=int(top_k))
+            selector = self._selectors[top_k]
+            for name, x in scaled.items():
+                self._matrices[(name, top_k)] = x if selector is None else selector.transform(x)
+
+    def matrix(self, split: str, top_k: int | None = None) -> np.ndarray:
+        try:
+            return self._matrices[(split, top_k)]
+        except KeyError:
+            raise KeyError(f"No cached matrix for split={split!r}, top_k={top_k!r}") from None
+
+    def pipeline(self, clf: Any, top_k: int | None = None) -> Pipeline:
+        """Assemble a self-contained pipeline around a classifier fitted on ``matrix("train", top_k)``."""
+        steps: list[tuple[str, Any]] = [("scaler", copy.deepcopy(self.scaler))]
+        selector = self._selectors[top_k]
+        if selector is not None:
+            steps.append(("selector", copy.deepcopy(selector)))
+        steps.append(("clf", clf))
+        return Pipeline(steps)
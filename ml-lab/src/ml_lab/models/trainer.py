@@ -9,7 +9,7 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 
-from ml_lab.eval.metrics import compute_binary_metrics
+from ml_lab.eval.metrics import compute_binary_metrics, select_best_threshold
 from ml_lab.models.methods import get_method_feature_columns
 
 
@@ -94,14 +94,12 @@ def train_method(
     val_probs = model_pipeline.predict_proba(x_val)[:, 1]
     threshold_cfg = config["model"]["threshold_tuning"]
     metric_name = str(threshold_cfg["metric"])
-    best_threshold = 0.5
-    best_metric = -1.0
-    for candidate in _threshold_grid(threshold_cfg):
-        val_metrics = compute_binary_metrics(y_true=y_val, y_prob=val_probs, threshold=float(candidate))
-        candidate_metric = val_metrics.get(metric_name, -1.0)
-        if candidate_metric > best_metric:
-            best_metric = candidate_metric
-            best_threshold = float(candidate)
+    best_threshold, _ = select_best_threshold(
+        y_true=y_val,
+        y_prob=val_probs,
+        thresholds=_threshold_grid(threshold_cfg),
+        metric_name=metric_name,
+    )
 
     split_metrics: dict[str, dict[str, float]] = {}
     predictions: dict[str, pd.DataFrame] = {}
@@ -1,26 +1,91 @@
 from __future__ import annotations
 
 import os
+import time
 import uuid
 from pathlib import Path
 
 from fastapi import FastAPI, File, Form, Request, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
-from ml_lab.serve.inference import InferenceEngine
+from ml_lab.features.map_render import MAP_FORMATS, MapEncoding
+from ml_lab.serve.dispatch import InferenceDispatcher, InferenceQueueFull
+from ml_lab.serve.inference import MAP_RENDERERS, InferenceEngine
+from ml_lab.serve.map_store import MapStore
+from ml_lab.serve.response_cache import ResponseCache
+from ml_lab.utils.parallel import resolve_n_jobs
 
 APP_ROOT = Path(__file__).resolve().parents[3]
 DEFAULT_ARTIFACT = APP_ROOT / "artifacts" / "models" / "final_primary_artifact.joblib"
+MAX_BATCH_FILES = int(os.environ.get("ML_LAB_MAX_BATCH_FILES", "64"))
+RETRY_AFTER_SECONDS = 1
+RESPONSE_CACHE_MB = float(os.environ.get("ML_LAB_RESPONSE_CACHE_MB", "64"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("ML_LAB_RESPONSE_CACHE_TTL", "600"))
+HEATMAP_DELIVERIES = ("inline", "url")
+DEFAULT_HEATMAP_DELIVERY = os.environ.get("ML_LAB_HEATMAP_DELIVERY", "inline")
+MAP_STORE_MB = float(os.environ.get("ML_LAB_MAP_STORE_MB", "256"))
+MAP_STORE_TTL_SECONDS = float(os.environ.get("ML_LAB_MAP_STORE_TTL", "300"))
 
 app = FastAPI(title="Cipher Sleuth ML Inference Service", version="1.0.0")
 engine: InferenceEngine | None = None
+dispatcher: InferenceDispatcher | None = None
+response_cache: ResponseCache | None = None
 
 
 @app.on_event("startup")
 def _load_engine() -> None:
-    global engine
+    global engine, dispatcher, response_cache
     artifact_path = Path(os.environ.get("ML_LAB_ARTIFACT_PATH", str(DEFAULT_ARTIFACT)))
-    engine = InferenceEngine(artifact_path=artifact_path)
+    near_duplicate_distance = os.environ.get("ML_LAB_NEAR_DUPLICATE_DISTANCE")
+    png_compression = os.environ.get("ML_LAB_MAP_PNG_COMPRESSION")
+    map_encoding = MapEncoding(
+        format=os.environ.get("ML_LAB_MAP_FORMAT", "png"),
+        png_compression=int(png_compression) if png_compression else None,
+        quality=int(os.environ.get("ML_LAB_MAP_QUALITY", "85")),
+    )
+    map_store = MapStore(
+        renderers=MAP_RENDERERS,
+        max_bytes=int(MAP_STORE_MB * 1024 * 1024),
+        ttl_seconds=MAP_STORE_TTL_SECONDS,
+        encoding=map_encoding,
+    )
+    engine = InferenceEngine(
+        artifact_path=artifact_path,
+        map_store=map_store,
+        map_encoding=map_encoding,
+        near_duplicate_distance=int(near_duplicate_distance) if near_duplicate_distance else None,
+        near_duplicate_capacity=int(os.environ.get("ML_LAB_NEAR_DUPLICATE_CAPACITY", "200000")),
+    )
+    dispatcher = InferenceDispatcher(
+        max_workers=resolve_n_jobs(int(os.environ.get("ML_LAB_INFER_WORKERS", "-1"))),
+        max_queue=int(os.environ.get("ML_LAB_INFER_QUEUE_DEPTH", "16")),
+    )
+    response_cache = None
+    if RESPONSE_CACHE_MB > 0 and RESPONSE_CACHE_TTL_SECONDS > 0:
+        response_cache = ResponseCache(
+            max_bytes=int(RESPONSE_CACHE_MB * 1024 * 1024),
+            ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+        )
+
+
+@app.on_event("shutdown")
+def _stop_dispatcher() -> None:
+    global dispatcher
+    if dispatcher is not None:
+        dispatcher.shutdown()
+        dispatcher = None
+
+
+def _not_ready_response() -> JSONResponse:
+    return JSONResponse(status_code=503, content={"ok": False, "error": "Inference engine not ready"})
+
+
+def _queue_full_response(request_id: str, exc: InferenceQueueFull) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        content={"ok": False, "requestId": request_id, "error": str(exc)},
+    )
 
 
 @app.get("/health")
@@ -31,6 +96,11 @@ def health() -> dict[str, object]:
         "ready": engine is not None,
         "artifactPath": str(engine.artifact_path) if engine else None,
         "modelVersion": engine.model_version if engine else None,
+        "mantraModel": engine.mantra_model_info if engine else None,
+        "workerPool": dispatcher.stats() if dispatcher else None,
+        "responseCache": response_cache.stats() if response_cache else None,
+        "nearDuplicates": engine.near_duplicates.stats() if engine and engine.near_duplicates is not None else None,
+        "mapStore": engine.map_store.stats() if engine and engine.map_store is not None else None,
     }
 
 
@@ -39,21 +109,53 @@ async def infer(
     request: Request,
     file: UploadFile = File(...),
     returnHeatmap: bool = Form(False),
+    heatmapDelivery: str = Form(DEFAULT_HEATMAP_DELIVERY),
 ) -> JSONResponse:
-    if engine is None:
-        return JSONResponse(status_code=503, content={"ok": False, "error": "Inference engine not ready"})
+    if engine is None or dispatcher is None:
+        return _not_ready_response()
 
     request_id = str(uuid.uuid4())
+    if heatmapDelivery not in HEATMAP_DELIVERIES:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "ok": False,
+                "requestId": request_id,
+                "error": f"heatmapDelivery must be one of {list(HEATMAP_DELIVERIES)}",
+            },
+        )
+    # Stored maps belong to this requestId, so such responses are not shared via the cache.
+    map_key = request_id if returnHeatmap and heatmapDelivery == "url" else None
     try:
         file_bytes = await file.read()
-        payload = engine.infer(
-            file_bytes=file_bytes,
-            filename=file.filename or "unknown",
-            return_heatmap=bool(returnHeatmap),
-        )
+        filename = file.filename or "unknown"
+
+        def compute():
+            return dispatcher.run(
+                engine.infer,
+                file_bytes=file_bytes,
+                filename=filename,
+                return_heatmap=bool(returnHeatmap),
+                map_key=map_key,
+            )
+
+        headers: dict[str, str] = {}
+        if response_cache is None or map_key is not None:
+            payload = await compute()
+        else:
+            key = ResponseCache.key(file_bytes, engine.model_version, bool(returnHeatmap))
+            payload, status = await response_cache.get_or_compute(key, compute)
+            headers["X-Cache"] = status
+        payload["filename"] = filename
         payload["requestId"] = request_id
+        if map_key is not None and engine.map_store is not None:
+            payload["explainability"]["mapUrls"] = {
+                kind: f"/maps/{request_id}/{kind}" for kind in engine.map_store.kinds(map_key)
+            }
         payload["contentType"] = file.content_type
-        return JSONResponse(status_code=200, content=payload)
+        return JSONResponse(status_code=200, content=payload, headers=headers)
+    except InferenceQueueFull as exc:
+        return _queue_full_response(request_id, exc)
     except Exception as exc:
         return JSONResponse(
             status_code=500,
@@ -64,3 +166,77 @@ async def infer(
                 "path": str(request.url.path),
             },
         )
+
+
+@app.post("/infer/batch")
+async def infer_batch(
+    request: Request,
+    files: list[UploadFile] = File(...),
+    returnHeatmap: bool = Form(False),
+) -> JSONResponse:
+    if engine is None or dispatcher is None:
+        return _not_ready_response()
+
+    request_id = str(uuid.uuid4())
+    if len(files) > MAX_BATCH_FILES:
+        return JSONResponse(
+            status_code=413,
+            content={
+                "ok": False,
+                "requestId": request_id,
+                "error": f"Batch has {len(files)} files; the limit is {MAX_BATCH_FILES}",
+            },
+        )
+    try:
+        started = time.perf_counter()
+        items = [(await upload.read(), upload.filename or "unknown") for upload in files]
+        results = await dispatcher.run(engine.infer_batch, items, return_heatmap=bool(returnHeatmap))
+        for upload, payload in zip(files, results):
+            payload["contentType"] = upload.content_type
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        return JSONResponse(
+            status_code=200,
+            content={
+                "ok": True,
+                "requestId": request_id,
+                "modelVersion": engine.model_version,
+                "count": len(results),
+                "results": results,
+                "timingMs": round(float(elapsed_ms), 3),
+            },
+        )
+    except InferenceQueueFull as exc:
+        return _queue_full_response(request_id, exc)
+    except Exception as exc:
+        return JSONResponse(
+            status_code=500,
+            content={
+                "ok": False,
+                "requestId": request_id,
+                "error": str(exc),
+                "path": str(request.url.path),
+            },
+        )
+
+
+@app.get("/maps/{request_id}/{kind}")
+def get_map(request_id: str, kind: str, format: str | None = None) -> Response:
+    if engine is None or engine.map_store is None:
+        return _not_ready_response()
+    format = format or engine.map_store.encoding.format
+    if format not in MAP_FORMATS:
+        return JSONResponse(
+            status_code=400,
+            content={"ok": False, "error": f"format must be one of {sorted(MAP_FORMATS)}"},
+        )
+    encoded = engine.map_store.get(request_id, kind, format)
+    if encoded is None:
+        return JSONResponse(
+            status_code=404,
+            content={"ok": False, "error": f"No {kind} map for request {request_id} (unknown or expired)"},
+        )
+    return Response(
+        content=encoded,
+        media_type=MAP_FORMATS[format][1],
+        headers={"Cache-Control": "private, max-age=300"},
+    )
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class InferenceQueueFull(RuntimeError):
+    pass
+
+
+class InferenceDispatcher:
+    """Bounded thread pool that keeps CPU-bound inference off the event loop.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue`` more wait for a
+    worker; anything beyond that is rejected immediately with ``InferenceQueueFull``.
+    Slots are released when the job itself finishes, not when the caller stops waiting,
+    so disconnected clients cannot push more work onto a busy pool.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be >= 1, got {max_workers}")
+        self.max_workers = int(max_workers)
+        self.max_queue = max(0, int(max_queue))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ml-lab-infer")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._rejected += 1
+                raise InferenceQueueFull(
+                    f"Inference queue is full ({self._pending} jobs pending, capacity {self.capacity})"
+                )
+            self._pending += 1
+
+    def _release(self, _: Future | None = None) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        self._acquire()
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            pending = self._pending
+            completed = self._completed
+            rejected = self._rejected
+        return {
+            "workers": self.max_workers,
+            "queueDepth": self.max_queue,
+            "running": min(pending, self.max_workers),
+            "queued": max(0, pending - self.max_workers),
+            "completed": completed,
+            "rejected": rejected,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,22 +1,87 @@
 from __future__ import annotations
 
 import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, Sequence
 
 import joblib
 import numpy as np
 
-from ml_lab.features.cfa import compute_cfa_features, compute_simple_cfa_score
+from ml_lab.features.cfa import colorize_cfa_map, compute_cfa_features, compute_simple_cfa_score
+from ml_lab.features.context import ImageContext
 from ml_lab.features.dwt_svd import compute_dwt_svd_features, compute_simple_dwt_svd_score
-from ml_lab.features.ela import compute_ela_features, compute_simple_ela_score
+from ml_lab.features.ela import colorize_ela_heatmap, compute_ela_features, compute_simple_ela_score
 from ml_lab.features.image_ops import decode_image_bytes
-from ml_lab.features.mantra import compute_mantra_features, compute_simple_mantra_score
-from ml_lab.features.prnu import compute_prnu_features, compute_simple_prnu_score
+from ml_lab.features.mantra import (
+    colorize_mantra_mask,
+    compute_mantra_features,
+    compute_simple_mantra_score,
+    warm_up_mantra_model,
+)
+from ml_lab.features.map_render import DEFAULT_ENCODING, MapEncoding, encode_map_base64
+from ml_lab.features.prnu import colorize_prnu_map, compute_prnu_features, compute_simple_prnu_score
+from ml_lab.serve.map_store import MapStore
+from ml_lab.serve.near_duplicates import NearDuplicateIndex, perceptual_hash
+
+# (response score key, per-family method, family, heuristic fallback)
+FAMILY_SCORES = (
+    ("elaScore", "ela_only", "ela", compute_simple_ela_score),
+    ("dwtsvdScore", "dwt_svd_only", "dwt", compute_simple_dwt_svd_score),
+    ("cfaScore", "cfa_only", "cfa", compute_simple_cfa_score),
+    ("prnuScore", "prnu_only", "prnu", compute_simple_prnu_score),
+    ("mantraScore", "mantra_only", "mantra", compute_simple_mantra_score),
+)
+# Response field of each family's inline map.
+MAP_FIELDS = {
+    "ela": "elaHeatmapBase64",
+    "cfa": "cfaMapBase64",
+    "mantra": "mantraMaskBase64",
+    "prnu": "prnuResidualBase64",
+}
+MAP_KEYS = tuple(MAP_FIELDS.values())
+# Colorizers for the raw maps, whether inlined or kept in a MapStore.
+MAP_RENDERERS = {
+    "ela": colorize_ela_heatmap,
+    "cfa": colorize_cfa_map,
+    "prnu": colorize_prnu_map,
+    "mantra": colorize_mantra_mask,
+}
+
+
+@dataclass
+class _ExtractedImage:
+    filename: str
+    families: dict[str, dict[str, float]]
+    maps: dict[str, str | None]
+    extract_ms: float
+    phash: int | None = None
+    raw_maps: dict[str, np.ndarray] = field(default_factory=dict)
+    full_features: dict[str, float] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.full_features = {}
+        for family_features in self.families.values():
+            self.full_features.update(family_features)
+
+
+@dataclass
+class _MethodScores:
+    probabilities: np.ndarray
+    row_idx: np.ndarray
+    x_model: np.ndarray
+    selected_idx: np.ndarray
 
 
 class InferenceEngine:
-    def __init__(self, artifact_path: str | Path):
+    def __init__(
+        self,
+        artifact_path: str | Path,
+        near_duplicate_distance: int | None = None,
+        near_duplicate_capacity: int = 200_000,
+        map_store: MapStore | None = None,
+        map_encoding: MapEncoding = DEFAULT_ENCODING,
+    ):
         self.artifact_path = Path(artifact_path)
         if not self.artifact_path.exists():
             raise FileNotFoundError(f"Artifact not found: {self.artifact_path}")
@@ -25,160 +90,315 @@ class InferenceEngine:
         self.methods = self.bundle["methods"]
         self.config = self.bundle["config"]
         self.model_version = self.bundle.get("model_version", "ela-dwtsvd-fusion-v1.0.0")
+        self.mantra_model_info = warm_up_mantra_model(
+            self.config["features"].get("mantra", {}),
+            tuple(self.config["experiment"]["image_size"]),
+        )
+        # Opt-in: a small edit (e.g. a spliced patch) can keep the pHash within range of
+        # the original, so reusing verdicts trades recall on such pairs for speed.
+        self.map_store = map_store
+        self.map_encoding = map_encoding
+        self.near_duplicates: NearDuplicateIndex | None = None
+        if near_duplicate_distance is not None and int(near_duplicate_distance) >= 0:
+            self.near_duplicates = NearDuplicateIndex(
+                max_distance=int(near_duplicate_distance),
+                capacity=near_duplicate_capacity,
+            )
 
-    def _predict_method(self, method: str, full_feature_row: dict[str, float]) -> float:
-        method_payload = self.methods[method]
-        cols = method_payload["feature_columns"]
-        x = np.array([full_feature_row[c] for c in cols], dtype=np.float32).reshape(1, -1)
-        prob = float(method_payload["pipeline"].predict_proba(x)[0, 1])
-        return prob
-
-    def _predict_method_if_available(self, method: str, full_feature_row: dict[str, float]) -> float | None:
-        if method not in self.methods:
-            return None
-        cols = self.methods[method]["feature_columns"]
-        if any(col not in full_feature_row for col in cols):
-            return None
-        return self._predict_method(method, full_feature_row)
-
-    def _top_signal_names(self, full_feature_row: dict[str, float], method: str, top_k: int = 3) -> list[str]:
-        method_payload = self.methods[method]
-        pipeline = method_payload["pipeline"]
-        cols = method_payload["feature_columns"]
-        x = np.array([full_feature_row[c] for c in cols], dtype=np.float32).reshape(1, -1)
-
-        scaler = pipeline.named_steps["scaler"]
-        clf = pipeline.named_steps["clf"]
-        x_scaled = scaler.transform(x)
-
-        selected_idx = np.arange(len(cols))
-        x_model = x_scaled
-        if "selector" in pipeline.named_steps:
-            selector = pipeline.named_steps["selector"]
-            selected_idx = selector.get_support(indices=True)
-            x_model = selector.transform(x_scaled)
+    def _decode(self, file_bytes: bytes) -> ImageContext:
+        return ImageContext(
+            decode_image_bytes(
+                file_bytes=file_bytes,
+                image_size=tuple(self.config["experiment"]["image_size"]),
+                reduced_decode=bool(self.config["experiment"].get("reduced_decode", False)),
+            )
+        )
 
-        if hasattr(clf, "coef_"):
-            model_weights = np.asarray(clf.coef_[0], dtype=np.float32)
-            contribution = x_model[0] * model_weights
-        elif hasattr(clf, "feature_importances_"):
-            importances = np.asarray(clf.feature_importances_, dtype=np.float32)
-            contribution = np.abs(x_model[0]) * importances
-        else:
-            contribution = np.abs(x_model[0])
+    def _match_near_duplicate(
+        self,
+        image: ImageContext,
+        return_heatmap: bool,
+    ) -> tuple[int | None, tuple[int, int, dict[str, Any]] | None]:
+        """Hash the decoded image and look it up; heatmap requests are never served from
+        the index because the stored verdict carries no maps for this image."""
+        if self.near_duplicates is None:
+            return None, None
+        phash = perceptual_hash(image.gray)
+        if return_heatmap:
+            return phash, None
+        return phash, self.near_duplicates.lookup(phash)
 
-        ranked_idx = np.argsort(np.abs(contribution))[::-1][:top_k]
-        return [cols[selected_idx[i]] for i in ranked_idx]
+    def _near_duplicate_payload(
+        self,
+        match: tuple[int, int, dict[str, Any]],
+        filename: str,
+        started: float,
+    ) -> dict[str, Any]:
+        stored, distance, verdict = match
+        return {
+            "ok": True,
+            "modelVersion": self.model_version,
+            "filename": filename,
+            "prediction": dict(verdict["prediction"]),
+            "scores": dict(verdict["scores"]),
+            "explainability": {"topSignals": list(verdict["topSignals"]), **dict.fromkeys(MAP_KEYS)},
+            "timingMs": round((time.perf_counter() - started) * 1000.0, 3),
+            # Only the hash and distance: the matched entry may come from another client's upload.
+            "nearDuplicateOf": {
+                "perceptualHash": f"{stored:016x}",
+                "distance": int(distance),
+            },
+        }
 
-    def infer(self, file_bytes: bytes, filename: str, return_heatmap: bool = False) -> dict[str, Any]:
-        started = time.perf_counter()
-        image_size = tuple(self.config["experiment"]["image_size"])
+    def _extract(
+        self,
+        image: ImageContext,
+        filename: str,
+        return_heatmap: bool,
+        started: float,
+        phash: int | None = None,
+        inline_maps: bool = True,
+    ) -> _ExtractedImage:
+        """Heatmap requests keep each family's raw map; they are encoded into the payload
+        with ``map_encoding`` unless ``inline_maps=False`` leaves them for a MapStore."""
+        families: dict[str, dict[str, float]] = {}
+        maps: dict[str, str | None] = dict.fromkeys(MAP_KEYS)
+        raw_maps: dict[str, np.ndarray] = {}
         ela_cfg = self.config["features"]["ela"]
-        dwt_cfg = self.config["features"]["dwt"]
-
-        image = decode_image_bytes(file_bytes=file_bytes, image_size=image_size)
-        ela_features, _, heatmap_b64 = compute_ela_features(
+        families["ela"], ela_residual, _ = compute_ela_features(
             image_rgb=image,
             jpeg_quality=int(ela_cfg["jpeg_quality"]),
             high_threshold=float(ela_cfg["high_threshold"]),
             smooth_blur_kernel=int(ela_cfg["smooth_blur_kernel"]),
-            with_heatmap=return_heatmap,
         )
-        dwt_features = compute_dwt_svd_features(
+        if return_heatmap:
+            raw_maps["ela"] = ela_residual
+        dwt_cfg = self.config["features"]["dwt"]
+        families["dwt"] = compute_dwt_svd_features(
             image_rgb=image,
             wavelet=str(dwt_cfg["wavelet"]),
             level=int(dwt_cfg["level"]),
             top_k_singular=int(dwt_cfg["top_k_singular"]),
         )
         cfa_cfg = self.config["features"].get("cfa", {})
-        cfa_features, _, cfa_map_b64 = compute_cfa_features(
+        families["cfa"], cfa_map, _ = compute_cfa_features(
             image_rgb=image,
             window_size=int(cfa_cfg.get("window_size", 7)),
             variance_threshold=float(cfa_cfg.get("variance_threshold", 0.6)),
             smooth_sigma=float(cfa_cfg.get("smooth_sigma", 1.0)),
-            with_map=return_heatmap,
         )
+        if return_heatmap:
+            raw_maps["cfa"] = cfa_map
         prnu_cfg = self.config["features"].get("prnu", {})
-        prnu_features, _, prnu_residual_b64 = compute_prnu_features(
+        families["prnu"], prnu_residual, _ = compute_prnu_features(
             image_rgb=image,
             wavelet=str(prnu_cfg.get("wavelet", "db4")),
             level=int(prnu_cfg.get("level", 2)),
-            with_map=return_heatmap,
         )
+        if return_heatmap:
+            raw_maps["prnu"] = prnu_residual
         mantra_cfg = self.config["features"].get("mantra", {})
-        mantra_features, _, mantra_mask_b64 = compute_mantra_features(
+        families["mantra"], mantra_mask, _ = compute_mantra_features(
             image_rgb=image,
             config=mantra_cfg,
-            with_mask=return_heatmap,
         )
-        full_features = {**ela_features, **dwt_features, **cfa_features, **prnu_features, **mantra_features}
-
-        fusion_prob = self._predict_method_if_available(self.primary_method, full_features)
-        if fusion_prob is None:
-            fusion_prob = float(
-                np.clip(
-                    0.40 * compute_simple_mantra_score(mantra_features)
-                    + 0.25 * compute_simple_cfa_score(cfa_features)
-                    + 0.20 * compute_simple_prnu_score(prnu_features)
-                    + 0.10 * compute_simple_ela_score(ela_features)
-                    + 0.05 * compute_simple_dwt_svd_score(dwt_features),
-                    0.0,
-                    1.0,
-                )
-            )
+        if return_heatmap:
+            raw_maps["mantra"] = mantra_mask
+        if inline_maps and raw_maps:
+            for family, raw in raw_maps.items():
+                maps[MAP_FIELDS[family]] = encode_map_base64(MAP_RENDERERS[family](raw), self.map_encoding)
+            maps["mapMediaType"] = self.map_encoding.media_type
+            raw_maps = {}
+        return _ExtractedImage(
+            filename=filename,
+            families=families,
+            maps=maps,
+            extract_ms=(time.perf_counter() - started) * 1000.0,
+            phash=phash,
+            raw_maps=raw_maps,
+        )
 
-        primary_threshold = float(self.methods[self.primary_method]["threshold"]) if self.primary_method in self.methods else 0.5
-        label = "manipulated" if fusion_prob >= primary_threshold else "authentic"
-        confidence = float(abs(fusion_prob - 0.5) * 2.0)
-
-        ela_score = self._predict_method_if_available("ela_only", full_features)
-        if ela_score is None:
-            ela_score = compute_simple_ela_score(ela_features)
-        dwt_score = self._predict_method_if_available("dwt_svd_only", full_features)
-        if dwt_score is None:
-            dwt_score = compute_simple_dwt_svd_score(dwt_features)
-        cfa_score = self._predict_method_if_available("cfa_only", full_features)
-        if cfa_score is None:
-            cfa_score = compute_simple_cfa_score(cfa_features)
-        prnu_score = self._predict_method_if_available("prnu_only", full_features)
-        if prnu_score is None:
-            prnu_score = compute_simple_prnu_score(prnu_features)
-        mantra_score = self._predict_method_if_available("mantra_only", full_features)
-        if mantra_score is None:
-            mantra_score = compute_simple_mantra_score(mantra_features)
-
-        if self.primary_method in self.methods:
-            top_signals = self._top_signal_names(full_features, self.primary_method, top_k=3)
+    def _score_method(self, method: str, rows: Sequence[dict[str, float]]) -> _MethodScores | None:
+        """Score every row that has the method's columns with one vectorized pipeline pass."""
+        if method not in self.methods:
+            return None
+        method_payload = self.methods[method]
+        cols = method_payload["feature_columns"]
+        row_idx = np.array([i for i, row in enumerate(rows) if all(col in row for col in cols)], dtype=np.int64)
+        if row_idx.size == 0:
+            return None
+        x = np.array([[rows[i][c] for c in cols] for i in row_idx], dtype=np.float32).reshape(len(row_idx), -1)
+
+        # Run the pre-processing steps by hand so the transformed matrix can be reused
+        # for top-signal attribution instead of re-scaling each row.
+        pipeline = method_payload["pipeline"]
+        x_model = x
+        for _, step in pipeline.steps[:-1]:
+            x_model = step.transform(x_model)
+        selected_idx = np.arange(len(cols))
+        if "selector" in pipeline.named_steps:
+            selected_idx = pipeline.named_steps["selector"].get_support(indices=True)
+        probabilities = np.asarray(pipeline.steps[-1][1].predict_proba(x_model)[:, 1], dtype=np.float64)
+        return _MethodScores(
+            probabilities=probabilities,
+            row_idx=row_idx,
+            x_model=np.asarray(x_model),
+            selected_idx=selected_idx,
+        )
+
+    def _top_signal_names(self, scores: _MethodScores, method: str, top_k: int = 3) -> list[list[str]]:
+        method_payload = self.methods[method]
+        cols = method_payload["feature_columns"]
+        clf = method_payload["pipeline"].steps[-1][1]
+        x_model = scores.x_model
+
+        if hasattr(clf, "coef_"):
+            model_weights = np.asarray(clf.coef_[0], dtype=np.float32)
+            contribution = x_model * model_weights
+        elif hasattr(clf, "feature_importances_"):
+            importances = np.asarray(clf.feature_importances_, dtype=np.float32)
+            contribution = np.abs(x_model) * importances
         else:
-            top_signals = [
-                name
-                for name, _ in sorted(full_features.items(), key=lambda item: abs(float(item[1])), reverse=True)[:3]
-            ]
+            contribution = np.abs(x_model)
 
-        elapsed_ms = (time.perf_counter() - started) * 1000.0
-        return {
-            "ok": True,
-            "modelVersion": self.model_version,
-            "filename": filename,
-            "prediction": {
-                "label": label,
-                "probability": round(fusion_prob, 6),
-                "confidence": round(confidence, 6),
-            },
-            "scores": {
-                "elaScore": round(float(ela_score), 6),
-                "dwtsvdScore": round(float(dwt_score), 6),
-                "cfaScore": round(float(cfa_score), 6),
-                "prnuScore": round(float(prnu_score), 6),
-                "mantraScore": round(float(mantra_score), 6),
-                "fusionScore": round(float(fusion_prob), 6),
-            },
-            "explainability": {
-                "topSignals": top_signals,
-                "elaHeatmapBase64": heatmap_b64 if return_heatmap else None,
-                "cfaMapBase64": cfa_map_b64 if return_heatmap else None,
-                "mantraMaskBase64": mantra_mask_b64 if return_heatmap else None,
-                "prnuResidualBase64": prnu_residual_b64 if return_heatmap else None,
-            },
-            "timingMs": round(float(elapsed_ms), 3),
+        ranked_idx = np.argsort(np.abs(contribution), axis=1)[:, ::-1][:, :top_k]
+        return [[cols[scores.selected_idx[i]] for i in row] for row in ranked_idx]
+
+    @staticmethod
+    def _scatter(scores: _MethodScores | None, n_rows: int) -> list[float | None]:
+        out: list[float | None] = [None] * n_rows
+        if scores is not None:
+            for i, prob in zip(scores.row_idx, scores.probabilities):
+                out[int(i)] = float(prob)
+        return out
+
+    def _score_batch(self, extracted: Sequence[_ExtractedImage]) -> list[dict[str, Any]]:
+        started = time.perf_counter()
+        n_rows = len(extracted)
+        rows = [item.full_features for item in extracted]
+
+        primary_scores = self._score_method(self.primary_method, rows)
+        fusion_probs = self._scatter(primary_scores, n_rows)
+        family_probs = {
+            score_key: self._scatter(self._score_method(method, rows), n_rows)
+            for score_key, method, _, _ in FAMILY_SCORES
         }
+        top_signals: list[list[str] | None] = [None] * n_rows
+        if primary_scores is not None:
+            for i, names in zip(primary_scores.row_idx, self._top_signal_names(primary_scores, self.primary_method)):
+                top_signals[int(i)] = names
+
+        primary_threshold = float(self.methods[self.primary_method]["threshold"]) if self.primary_method in self.methods else 0.5
+        scoring_ms = (time.perf_counter() - started) * 1000.0 / max(1, n_rows)
+
+        results: list[dict[str, Any]] = []
+        for i, item in enumerate(extracted):
+            families = item.families
+            fusion_prob = fusion_probs[i]
+            if fusion_prob is None:
+                fusion_prob = float(
+                    np.clip(
+                        0.40 * compute_simple_mantra_score(families["mantra"])
+                        + 0.25 * compute_simple_cfa_score(families["cfa"])
+                        + 0.20 * compute_simple_prnu_score(families["prnu"])
+                        + 0.10 * compute_simple_ela_score(families["ela"])
+                        + 0.05 * compute_simple_dwt_svd_score(families["dwt"]),
+                        0.0,
+                        1.0,
+                    )
+                )
+            label = "manipulated" if fusion_prob >= primary_threshold else "authentic"
+            confidence = float(abs(fusion_prob - 0.5) * 2.0)
+
+            scores: dict[str, float] = {}
+            for score_key, _, family, fallback in FAMILY_SCORES:
+                score = family_probs[score_key][i]
+                if score is None:
+                    score = fallback(families[family])
+                scores[score_key] = round(float(score), 6)
+            scores["fusionScore"] = round(float(fusion_prob), 6)
+
+            signals = top_signals[i]
+            if signals is None:
+                signals = [
+                    name
+                    for name, _ in sorted(item.full_features.items(), key=lambda kv: abs(float(kv[1])), reverse=True)[:3]
+                ]
+
+            results.append(
+                {
+                    "ok": True,
+                    "modelVersion": self.model_version,
+                    "filename": item.filename,
+                    "prediction": {
+                        "label": label,
+                        "probability": round(fusion_prob, 6),
+                        "confidence": round(confidence, 6),
+                    },
+                    "scores": scores,
+                    "explainability": {"topSignals": signals, **item.maps},
+                    "timingMs": round(float(item.extract_ms + scoring_ms), 3),
+                }
+            )
+            if self.near_duplicates is not None and item.phash is not None:
+                self.near_duplicates.add(
+                    item.phash,
+                    {
+                        "prediction": dict(results[-1]["prediction"]),
+                        "scores": dict(scores),
+                        "topSignals": list(signals),
+                    },
+                )
+        return results
+
+    def infer(
+        self,
+        file_bytes: bytes,
+        filename: str,
+        return_heatmap: bool = False,
+        map_key: str | None = None,
+    ) -> dict[str, Any]:
+        """With ``map_key`` (and a ``map_store``), heatmap requests store their raw maps
+        under that key instead of inlining base64 PNGs; the ``*Base64`` fields stay null."""
+        started = time.perf_counter()
+        image = self._decode(file_bytes)
+        phash, match = self._match_near_duplicate(image, return_heatmap)
+        if match is not None:
+            return self._near_duplicate_payload(match, filename, started)
+        inline_maps = map_key is None or self.map_store is None
+        extracted = self._extract(image, filename, return_heatmap, started, phash, inline_maps=inline_maps)
+        payload = self._score_batch([extracted])[0]
+        if not inline_maps and extracted.raw_maps:
+            self.map_store.put(map_key, extracted.raw_maps)
+        return payload
+
+    def infer_batch(
+        self,
+        files: Sequence[tuple[bytes, str]],
+        return_heatmap: bool = False,
+    ) -> list[dict[str, Any]]:
+        """Infer several images, scoring each method once over the stacked feature matrix.
+
+        Results keep the input order; an image that fails to decode or extract gets an
+        ``ok: False`` entry instead of failing the whole batch. Near-duplicates of images
+        scored by earlier requests reuse their verdict; ones within the same batch do not.
+        """
+        results: list[dict[str, Any] | None] = [None] * len(files)
+        extracted: list[_ExtractedImage] = []
+        positions: list[int] = []
+        for position, (file_bytes, filename) in enumerate(files):
+            try:
+                started = time.perf_counter()
+                image = self._decode(file_bytes)
+                phash, match = self._match_near_duplicate(image, return_heatmap)
+                if match is not None:
+                    results[position] = self._near_duplicate_payload(match, filename, started)
+                    continue
+                extracted.append(self._extract(image, filename, return_heatmap, started, phash))
+                positions.append(position)
+            except Exception as exc:
+                results[position] = {"ok": False, "filename": filename, "error": str(exc)}
+        if extracted:
+            for position, payload in zip(positions, self._score_batch(extracted)):
+                results[position] = payload
+        return [payload for payload in results if payload is not None]
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import dataclasses
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Mapping
+
+import numpy as np
+
+from ml_lab.features.map_render import DEFAULT_ENCODING, MapEncoding, encode_map
+
+
+@dataclass
+class _Maps:
+    raw: dict[str, np.ndarray]
+    expires_at: float
+    encoded: dict[tuple[str, str], bytes] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return sum(int(x.nbytes) for x in self.raw.values()) + sum(len(b) for b in self.encoded.values())
+
+
+class MapStore:
+    """Raw explainability maps of recent requests, keyed by ``requestId``.
+
+    Maps are colorized and encoded on first access and the encoded bytes are kept with
+    the entry, so ``/infer`` never pays for encoding a map nobody opens. Bounded by a
+    byte budget (raw + encoded) and a TTL; the least recently used requests go first.
+    """
+
+    def __init__(
+        self,
+        renderers: Mapping[str, Callable[[np.ndarray], np.ndarray]],
+        max_bytes: int,
+        ttl_seconds: float,
+        encoding: MapEncoding = DEFAULT_ENCODING,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.renderers = dict(renderers)
+        self.encoding = encoding
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = float(ttl_seconds)
+        self._clock = clock
+        self._entries: OrderedDict[str, _Maps] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stored = 0
+        self._served = 0
+        self._encoded = 0
+        self._evictions = 0
+        self._expired = 0
+
+    def _live(self, key: str) -> _Maps | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self._clock():
+            del self._entries[key]
+            self._bytes -= entry.size
+            self._expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._evictions += 1
+
+    def put(self, key: str, maps: Mapping[str, np.ndarray]) -> list[str]:
+        """Keep the maps that have a renderer; returns their kinds."""
+        raw = {kind: x for kind, x in maps.items() if kind in self.renderers and x is not None}
+        entry = _Maps(raw=raw, expires_at=self._clock() + self.ttl_seconds)
+        if not raw or entry.size > self.max_bytes:
+            return []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._stored += 1
+            self._evict()
+        return list(raw)
+
+    def kinds(self, key: str) -> list[str]:
+        with self._lock:
+            entry = self._live(key)
+            return [] if entry is None else list(entry.raw)
+
+    def get(self, key: str, kind: str, fmt: str | None = None) -> bytes | None:
+        """Encoded map (``fmt`` defaults to the store's encoding), or None when the request
+        is unknown/expired or has no such map."""
+        fmt = fmt or self.encoding.format
+        encoding = self.encoding if fmt == self.encoding.format else dataclasses.replace(self.encoding, format=fmt)
+        with self._lock:
+            entry = self._live(key)
+            if entry is None or kind not in entry.raw:
+                return None
+            cached = entry.encoded.get((kind, fmt))
+            if cached is not None:
+                self._served += 1
+                return cached
+            raw = entry.raw[kind]
+
+        # Render outside the lock so one slow encode does not stall other lookups.
+        encoded = encode_map(self.renderers[kind](raw), encoding)
+        with self._lock:
+            self._served += 1
+            self._encoded += 1
+            if self._entries.get(key) is entry and (kind, fmt) not in entry.encoded:
+                entry.encoded[(kind, fmt)] = encoded
+                self._bytes += len(encoded)
+                self._evict()
+        return encoded
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "ttlSeconds": self.ttl_seconds,
+                "stored": self._stored,
+                "served": self._served,
+                "encoded": self._encoded,
+                "evictions": self._evictions,
+                "expired": self._expired,
+            }
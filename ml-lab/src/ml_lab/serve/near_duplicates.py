@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Any
+
+import cv2
+import numpy as np
+
+HASH_BITS = 64
+# Multi-index hashing: the hash is split into substrings of these widths, each with its
+# own exact-match table. If two hashes are within distance r, at least one substring pair
+# is within r // len(CHUNK_BITS) (pigeonhole), so only those neighbours are probed. Wide
+# substrings keep buckets nearly empty at hundreds of thousands of entries.
+CHUNK_BITS = (22, 21, 21)
+CHUNK_SHIFTS = (0, 22, 43)
+
+
+def perceptual_hash(gray: np.ndarray) -> int:
+    """64-bit DCT pHash of a grayscale image.
+
+    Bits are the signs of the 8x8 lowest-frequency DCT coefficients of a 32x32
+    downsample relative to their median (DC excluded), so re-encoding and resizing
+    leave most bits unchanged.
+    """
+    small = cv2.resize(np.asarray(gray, dtype=np.float32), (32, 32), interpolation=cv2.INTER_AREA)
+    low = cv2.dct(small)[:8, :8].reshape(-1)
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _chunks(value: int) -> list[int]:
+    return [(value >> shift) & ((1 << width) - 1) for shift, width in zip(CHUNK_SHIFTS, CHUNK_BITS)]
+
+
+def _flip_masks(width: int, radius: int) -> tuple[int, ...]:
+    """XOR masks reaching every ``width``-bit value within ``radius`` bits (itself first)."""
+    masks = [0]
+    for flips in range(1, radius + 1):
+        for bits in itertools.combinations(range(width), flips):
+            masks.append(sum(1 << bit for bit in bits))
+    return tuple(masks)
+
+
+class NearDuplicateIndex:
+    """Hamming-distance index of perceptual hashes to the verdicts computed for them.
+
+    Oldest entries are dropped once ``capacity`` is reached. A lookup probes the
+    neighbours of each substring within ``max_distance // 3`` bits (under 700 buckets up to
+    distance 8) and checks the few candidates with a popcount, so it stays well under a
+    millisecond at hundreds of thousands of entries.
+    """
+
+    def __init__(self, max_distance: int, capacity: int = 200_000):
+        if not 0 <= int(max_distance) < HASH_BITS:
+            raise ValueError(f"max_distance must be in [0, {HASH_BITS}), got {max_distance}")
+        self.max_distance = int(max_distance)
+        self.capacity = max(1, int(capacity))
+        radius = self.max_distance // len(CHUNK_BITS)
+        self._masks = [_flip_masks(width, radius) for width in CHUNK_BITS]
+        self._entries: OrderedDict[int, tuple[int, dict[str, Any]]] = OrderedDict()
+        self._tables: list[dict[int, set[int]]] = [{} for _ in CHUNK_BITS]
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, phash: int) -> tuple[int, int, dict[str, Any]] | None:
+        """Closest stored ``(phash, distance, verdict)`` within ``max_distance``."""
+        with self._lock:
+            best: tuple[int, int, dict[str, Any]] | None = None
+            seen: set[int] = set()
+            for table, masks, chunk in zip(self._tables, self._masks, _chunks(phash)):
+                for mask in masks:
+                    for entry_id in table.get(chunk ^ mask, ()):
+                        if entry_id in seen:
+                            continue
+                        seen.add(entry_id)
+                        stored, verdict = self._entries[entry_id]
+                        distance = (stored ^ phash).bit_count()
+                        if distance <= self.max_distance and (best is None or distance < best[1]):
+                            best = (stored, distance, verdict)
+            if best is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+            return best
+
+    def add(self, phash: int, verdict: dict[str, Any]) -> None:
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (phash, verdict)
+            for table, chunk in zip(self._tables, _chunks(phash)):
+                table.setdefault(chunk, set()).add(entry_id)
+            while len(self._entries) > self.capacity:
+                old_id, (old_hash, _) = self._entries.popitem(last=False)
+                for table, chunk in zip(self._tables, _chunks(old_hash)):
+                    bucket = table[chunk]
+                    bucket.discard(old_id)
+                    if not bucket:
+                        del table[chunk]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "capacity": self.capacity,
+                "maxDistance": self.max_distance,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
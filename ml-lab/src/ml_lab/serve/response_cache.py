@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+# (sha256 of upload, model version, returnHeatmap)
+CacheKey = tuple[str, str, bool]
+
+
+@dataclass
+class _Entry:
+    payload: dict[str, Any]
+    size: int
+    expires_at: float
+
+
+class ResponseCache:
+    """LRU of ``/infer`` payloads bounded by a byte budget and a TTL, with single-flight.
+
+    Concurrent requests for the same key share one computation; it runs as its own task
+    so a leader whose client disconnects does not cancel the work for the others.
+    Failures are shared with the waiters but never cached.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = float(ttl_seconds)
+        self._clock = clock
+        self._entries: OrderedDict[CacheKey, _Entry] = OrderedDict()
+        self._inflight: dict[CacheKey, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._expired = 0
+
+    @staticmethod
+    def key(file_bytes: bytes, model_version: str, return_heatmap: bool) -> CacheKey:
+        return hashlib.sha256(file_bytes).hexdigest(), str(model_version), bool(return_heatmap)
+
+    def _lookup(self, key: CacheKey) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= self._clock():
+                del self._entries[key]
+                self._bytes -= entry.size
+                self._expired += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.payload
+
+    def _store(self, key: CacheKey, payload: dict[str, Any]) -> None:
+        size = len(json.dumps(payload, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = _Entry(payload=payload, size=size, expires_at=self._clock() + self.ttl_seconds)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._evictions += 1
+
+    def _finish(self, key: CacheKey, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self._store(key, task.result())
+
+    async def get_or_compute(
+        self,
+        key: CacheKey,
+        compute: Callable[[], Awaitable[dict[str, Any]]],
+    ) -> tuple[dict[str, Any], str]:
+        """Return ``(payload copy, status)`` where status is ``hit``, ``coalesced`` or ``miss``."""
+        cached = self._lookup(key)
+        if cached is not None:
+            return dict(cached), "hit"
+
+        task = self._inflight.get(key)
+        if task is not None:
+            with self._lock:
+                self._coalesced += 1
+            status = "coalesced"
+        else:
+            with self._lock:
+                self._misses += 1
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            status = "miss"
+        payload = await asyncio.shield(task)
+        # Callers stamp per-request fields (requestId, filename), so each gets its own dict.
+        return dict(payload), status
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "ttlSeconds": self.ttl_seconds,
+                "inflight": len(self._inflight),
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "evictions": self._evictions,
+                "expired": self._expired,
+            }
@@ -17,22 +17,26 @@ from ml_lab.data import (
     generate_synthetic_splicing_dataset,
     get_data_card_summary,
     load_manifest,
+    refresh_manifest,
     save_manifest,
     save_split_table,
     validate_no_split_leakage,
 )
 from ml_lab.eval import (
-    bootstrap_metric_ci,
+    bootstrap_metric_summary,
     build_error_analysis_table,
     run_localization_suite,
     run_method_comparison_stats,
     run_robustness_suite,
     write_markdown_report,
 )
-from ml_lab.features import extract_feature_table
+from ml_lab.features import extract_feature_table, save_feature_table
+from ml_lab.features.image_ops import DecodedImageCache, configure_image_cache, image_cache_stats
+from ml_lab.features.table import default_feature_table_name
 from ml_lab.models import MethodTrainingResult, train_method
 from ml_lab.utils.io import ensure_dir, write_json
 from ml_lab.utils.logging_utils import setup_logging
+from ml_lab.utils.parallel import resolve_n_jobs
 from ml_lab.utils.repro import set_global_seed
 
 LOGGER = logging.getLogger(__name__)
@@ -51,7 +55,11 @@ def _ensure_artifact_dirs(config: dict[str, Any]) -> None:
         ensure_dir(config["paths"][key])
 
 
-def _prepare_manifest(config: dict[str, Any], force_rebuild: bool) -> pd.DataFrame:
+def _prepare_manifest(
+    config: dict[str, Any],
+    force_rebuild: bool,
+    refresh: bool = False,
+) -> tuple[pd.DataFrame, dict[str, int] | None]:
     manifest_path = Path(config["paths"]["manifest_csv"])
     dataset_root = Path(config["paths"]["dataset_root"])
     source_dataset = str(config["experiment"]["source_dataset"])
@@ -75,14 +83,36 @@ def _prepare_manifest(config: dict[str, Any], force_rebuild: bool) -> pd.DataFra
             seed=int(config["experiment"]["seed"]),
         )
 
+    manifest_delta: dict[str, int] | None = None
     if force_rebuild or not manifest_path.exists():
         LOGGER.info("Building manifest from dataset root: %s", dataset_root)
-        manifest = build_manifest(dataset_root=dataset_root, source_dataset=source_dataset)
+        manifest = build_manifest(
+            dataset_root=dataset_root,
+            source_dataset=source_dataset,
+            n_workers=config["experiment"].get("manifest_workers"),
+        )
+        save_manifest(manifest, manifest_path)
+    elif refresh:
+        LOGGER.info("Refreshing manifest %s against dataset root: %s", manifest_path, dataset_root)
+        manifest, delta = refresh_manifest(
+            existing=load_manifest(manifest_path),
+            dataset_root=dataset_root,
+            source_dataset=source_dataset,
+            n_workers=config["experiment"].get("manifest_workers"),
+        )
+        manifest_delta = delta.as_dict()
+        LOGGER.info(
+            "Manifest delta: %d added, %d modified, %d removed, %d unchanged",
+            delta.added,
+            delta.modified,
+            delta.removed,
+            delta.unchanged,
+        )
         save_manifest(manifest, manifest_path)
     else:
         LOGGER.info("Loading existing manifest: %s", manifest_path)
         manifest = load_manifest(manifest_path)
-    return manifest
+    return manifest, manifest_delta
 
 
 def _train_methods(feature_table: pd.DataFrame, config: dict[str, Any]) -> dict[str, MethodTrainingResult]:
@@ -119,18 +149,14 @@ def _build_bootstrap_summary(method_results: dict[str, MethodTrainingResult], co
     rows: list[dict[str, Any]] = []
     for method, result in method_results.items():
         pred_df = result.predictions["test"]
-        y_true = pred_df["label"].to_numpy()
-        y_prob = pred_df["probability"].to_numpy()
-        for metric in ["accuracy", "precision", "recall", "f1"]:
-            ci = bootstrap_metric_ci(
-                y_true=y_true,
-                y_prob=y_prob,
-                threshold=float(result.threshold),
-                metric_name=metric,
-                n_bootstrap=int(config["evaluation"]["bootstrap_samples"]),
-                confidence_level=float(config["evaluation"]["confidence_level"]),
-                seed=int(config["experiment"]["seed"]),
-            )
+        for ci in bootstrap_metric_summary(
+            y_true=pred_df["label"].to_numpy(),
+            y_prob=pred_df["probability"].to_numpy(),
+            threshold=float(result.threshold),
+            n_bootstrap=int(config["evaluation"]["bootstrap_samples"]),
+            confidence_level=float(config["evaluation"]["confidence_level"]),
+            seed=int(config["experiment"]["seed"]),
+        ):
             rows.append({"method": method, **ci})
     return pd.DataFrame(rows)
 
@@ -174,10 +200,27 @@ def _export_artifacts(
     return {"bundle": str(full_bundle_path), "primary": str(final_primary_path), "model_version": model_version}
 
 
+def _configure_run_image_cache(config: dict[str, Any], split_manifest: pd.DataFrame) -> DecodedImageCache | None:
+    """Keep test images decoded in memory for extraction, robustness and localization.
+
+    Only when those stages decode in this process: with ``n_jobs`` > 1 the decoding
+    happens in pool workers that never see this cache, so sharing across stages is left
+    to the materialized image store (``paths.image_store_dir``).
+    """
+    if resolve_n_jobs(config["experiment"].get("n_jobs", 1)) > 1:
+        LOGGER.info("Decoded image cache disabled with n_jobs > 1; paths.image_store_dir shares decoded images")
+        return configure_image_cache(0)
+    return configure_image_cache(
+        int(float(config["experiment"].get("image_cache_mb", 512)) * 1024 * 1024),
+        admit=split_manifest.loc[split_manifest["split"] == "test", "image_path"].astype(str).tolist(),
+    )
+
+
 def run_pipeline(
     config_path: str | Path,
     project_root: str | Path,
     force_rebuild_manifest: bool = False,
+    refresh_manifest: bool = False,
 ) -> dict[str, Any]:
     config = resolve_paths(load_config(config_path), base_dir=project_root)
     _ensure_artifact_dirs(config)
@@ -188,7 +231,11 @@ def run_pipeline(
 
     set_global_seed(int(config["experiment"]["seed"]), deterministic=True)
 
-    manifest = _prepare_manifest(config=config, force_rebuild=force_rebuild_manifest)
+    manifest, manifest_delta = _prepare_manifest(
+        config=config,
+        force_rebuild=force_rebuild_manifest,
+        refresh=refresh_manifest,
+    )
     data_card = get_data_card_summary(manifest)
     write_json(Path(config["paths"]["reports_dir"]) / "data_card_summary.json", data_card)
 
@@ -203,9 +250,10 @@ def run_pipeline(
     leakage_report = validate_no_split_leakage(split_manifest)
     write_json(Path(config["paths"]["reports_dir"]) / "split_leakage_report.json", leakage_report)
 
+    _configure_run_image_cache(config, split_manifest)
     feature_table = extract_feature_table(manifest_split=split_manifest, config=config)
-    feature_path = Path(config["paths"]["metrics_dir"]) / "feature_table.csv"
-    feature_table.to_csv(feature_path, index=False)
+    feature_path = Path(config["paths"]["metrics_dir"]) / default_feature_table_name()
+    save_feature_table(feature_table, feature_path)
     LOGGER.info("Feature table saved: %s", feature_path)
 
     method_results = _train_methods(feature_table=feature_table, config=config)
@@ -232,6 +280,10 @@ def run_pipeline(
     localization_df = run_localization_suite(test_manifest=test_manifest, config=config)
     localization_path = Path(config["paths"]["metrics_dir"]) / "localization_metrics.csv"
     localization_df.to_csv(localization_path, index=False)
+    image_cache = image_cache_stats()
+    if image_cache is not None:
+        LOGGER.info("Decoded image cache: %s", image_cache)
+    configure_image_cache(0)
 
     error_df = build_error_analysis_table(method_results[primary_method].predictions["test"], top_k=40)
     error_path = Path(config["paths"]["reports_dir"]) / "error_analysis.csv"
@@ -275,6 +327,8 @@ def run_pipeline(
         "primary_artifact_path": export_paths["primary"],
         "model_version": export_paths["model_version"],
     }
+    if manifest_delta is not None:
+        result["manifest_delta"] = manifest_delta
     write_json(Path(config["paths"]["reports_dir"]) / "pipeline_result.json", result)
 
     if bool(config.get("baseline", {}).get("freeze_enabled", False)):
@@ -1,5 +1,15 @@
 from .io import ensure_dir, read_json, write_json
 from .logging_utils import setup_logging
+from .parallel import chunk_size_for, iter_batches, resolve_n_jobs
 from .repro import set_global_seed
 
-__all__ = ["ensure_dir", "read_json", "write_json", "setup_logging", "set_global_seed"]
+__all__ = [
+    "ensure_dir",
+    "read_json",
+    "write_json",
+    "setup_logging",
+    "chunk_size_for",
+    "iter_batches",
+    "resolve_n_jobs",
+    "set_global_seed",
+]
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import os
+from typing import Iterator, Sequence, TypeVar
+
+T = TypeVar("T")
+
+
+def resolve_n_jobs(n_jobs: int | None, n_tasks: int | None = None) -> int:
+    """Translate a joblib-style ``n_jobs`` value (``-1`` = all cores) into a worker count."""
+    cpu_count = os.cpu_count() or 1
+    value = 1 if n_jobs is None else int(n_jobs)
+    if value == 0:
+        raise ValueError("n_jobs must be a non-zero integer")
+    if value < 0:
+        value = max(1, cpu_count + 1 + value)
+    if n_tasks is not None:
+        value = min(value, max(1, int(n_tasks)))
+    return value
+
+
+def chunk_size_for(n_tasks: int, n_workers: int, chunks_per_worker: int = 4) -> int:
+    if n_workers <= 1:
+        return max(1, n_tasks)
+    return max(1, n_tasks // (n_workers * chunks_per_worker))
+
+
+def iter_batches(items: Sequence[T], batch_size: int) -> Iterator[Sequence[T]]:
+    step = max(1, int(batch_size))
+    for start in range(0, len(items), step):
+        yield items[start : start + step]
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import hashlib
+import sys
+from pathlib import Path
+from typing import Any, Callable
+
+import cv2
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from ml_lab.config import load_config, resolve_paths
+
+
+@pytest.fixture
+def demo_config(tmp_path: Path) -> dict[str, Any]:
+    """The demo config with every path under ``tmp_path`` and small images."""
+    config = resolve_paths(load_config(PROJECT_ROOT / "configs" / "demo.yaml"), base_dir=tmp_path)
+    config["experiment"]["image_size"] = [64, 64]
+    return config
+
+
+def _write_test_images(directory: Path, count: int, with_masks: bool = False) -> pd.DataFrame:
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(count):
+        image = cv2.GaussianBlur(rng.integers(0, 256, (96, 80, 3)).astype(np.uint8), (0, 0), 1.5)
+        path = directory / f"img_{i}.jpg"
+        cv2.imwrite(str(path), image)
+        row = {
+            "image_path": str(path),
+            "label": i % 2,
+            "split": "test",
+            "source_dataset": "synthetic_test",
+            "perturbation_tag": "clean",
+            "file_md5": hashlib.md5(path.read_bytes()).hexdigest(),
+        }
+        if with_masks:
+            mask = np.zeros((96, 80), dtype=np.uint8)
+            mask[20:60, 10:50] = 255
+            mask_path = directory / f"img_{i}_mask.png"
+            cv2.imwrite(str(mask_path), mask)
+            row["mask_path"] = str(mask_path)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def write_test_images() -> Callable[..., pd.DataFrame]:
+    """``write_test_images(directory, count, with_masks=False)`` writes random JPEGs (and
+    masks) and returns a test-split manifest for them."""
+    return _write_test_images
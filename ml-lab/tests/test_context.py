@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+import pywt
+
+from ml_lab.features import (
+    ImageContext,
+    compute_cfa_features,
+    compute_dwt_svd_features,
+    compute_ela_features,
+    compute_mantra_features,
+    compute_prnu_features,
+)
+
+
+@pytest.fixture
+def image_rgb():
+    return np.random.default_rng(5).integers(0, 256, (48, 40, 3)).astype(np.uint8)
+
+
+def _extract_all(image):
+    return {
+        "ela": compute_ela_features(image, jpeg_quality=90, high_threshold=20.0, smooth_blur_kernel=5)[0],
+        "dwt": compute_dwt_svd_features(image, wavelet="haar", level=2, top_k_singular=4),
+        "cfa": compute_cfa_features(image, window_size=7, variance_threshold=0.6, smooth_sigma=1.0)[0],
+        "prnu": compute_prnu_features(image, wavelet="db4", level=2)[0],
+        "mantra": compute_mantra_features(image, config={})[0],
+    }
+
+
+def test_gray_matches_per_extractor_conversion(image_rgb):
+    expected = (
+        0.299 * image_rgb[:, :, 0].astype(np.float32)
+        + 0.587 * image_rgb[:, :, 1].astype(np.float32)
+        + 0.114 * image_rgb[:, :, 2].astype(np.float32)
+    )
+    context = ImageContext(image_rgb)
+    np.testing.assert_array_equal(context.gray, expected)
+    np.testing.assert_array_equal(context.rgb_f32, image_rgb.astype(np.float32))
+
+
+def test_shared_context_gives_same_features_and_stays_unmodified(image_rgb):
+    separate = _extract_all(image_rgb)
+    context = ImageContext(image_rgb)
+    gray = context.gray.copy()
+    shared = _extract_all(context)
+    assert shared == separate
+    np.testing.assert_array_equal(context.gray, gray)
+
+
+@pytest.mark.parametrize("wavelet", ["haar", "db4"])
+def test_wavelet_pyramid_matches_pywt_in_any_request_order(image_rgb, wavelet):
+    context = ImageContext(image_rgb)
+    for level in (1, 2, 0, 2):
+        expected = pywt.wavedec2(context.gray, wavelet=wavelet, level=level)
+        got = context.wavedec2(wavelet, level)
+        assert len(got) == len(expected)
+        np.testing.assert_array_equal(got[0], expected[0])
+        for got_details, expected_details in zip(got[1:], expected[1:]):
+            for g, e in zip(got_details, expected_details):
+                np.testing.assert_array_equal(g, e)
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import pandas as pd
+
+from ml_lab.features import extract_feature_table
+
+
+def test_parallel_extraction_matches_serial(tmp_path, demo_config, write_test_images):
+    manifest = write_test_images(tmp_path / "images", 5)
+    manifest.loc[:2, "split"] = "train"
+    del demo_config["paths"]["feature_cache_dir"]
+
+    demo_config["experiment"]["n_jobs"] = 1
+    serial = extract_feature_table(manifest, demo_config)
+    demo_config["experiment"]["n_jobs"] = 2
+    parallel = extract_feature_table(manifest, demo_config)
+
+    assert list(parallel["image_path"]) == list(manifest["image_path"])
+    pd.testing.assert_frame_equal(parallel, serial)
+
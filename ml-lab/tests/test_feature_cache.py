@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import copy
+
+import pandas as pd
+
+from ml_lab.features import cache as cache_module
+from ml_lab.features import extract_feature_table
+from ml_lab.features.cache import FeatureCache
+
+ELA = {"ela_mean_residual": 1.5, "ela_p95_residual": 7.25}
+MANTRA_HEURISTIC = {"mantra_score": 0.4, "mantra_backend_torchscript": 0.0}
+MANTRA_TORCHSCRIPT = {"mantra_score": 0.9, "mantra_backend_torchscript": 1.0}
+
+
+def test_round_trip(tmp_path, demo_config):
+    cache = FeatureCache(tmp_path / "cache", demo_config)
+    assert cache.missing_families("abc") == list(cache_module.FEATURE_FAMILIES)
+    cache.put("abc", "ela", ELA)
+    cache.flush()
+
+    reloaded = FeatureCache(tmp_path / "cache", demo_config)
+    assert reloaded.get("abc", "ela") == ELA
+    assert "ela" not in reloaded.missing_families("abc")
+    assert reloaded.get("other", "ela") is None
+
+
+def test_family_config_change_invalidates_only_that_family(tmp_path, demo_config):
+    cache = FeatureCache(tmp_path / "cache", demo_config)
+    cache.put("abc", "ela", ELA)
+    cache.put("abc", "dwt", {"dwt_energy": 3.0})
+    cache.flush()
+
+    edited = copy.deepcopy(demo_config)
+    edited["features"]["ela"]["jpeg_quality"] = 75
+    edited["features"]["ela"]["save_heatmaps"] = True
+    reloaded = FeatureCache(tmp_path / "cache", edited)
+    assert reloaded.get("abc", "ela") is None
+    assert reloaded.get("abc", "dwt") == {"dwt_energy": 3.0}
+
+    # Output-only switches do not change the key.
+    output_only = copy.deepcopy(demo_config)
+    output_only["features"]["ela"]["save_heatmaps"] = True
+    assert FeatureCache(tmp_path / "cache", output_only).get("abc", "ela") == ELA
+
+
+def test_extractor_source_change_invalidates(tmp_path, demo_config, monkeypatch):
+    cache = FeatureCache(tmp_path / "cache", demo_config)
+    cache.put("abc", "ela", ELA)
+    cache.flush()
+
+    real_digest = cache_module._source_digest
+    monkeypatch.setattr(cache_module, "_source_digest", lambda family: "edited" + real_digest(family))
+    assert FeatureCache(tmp_path / "cache", demo_config).get("abc", "ela") is None
+
+
+def test_heuristic_mantra_rows_are_not_cached_under_a_checkpoint_key(tmp_path, demo_config):
+    checkpoint = tmp_path / "mantra.pt"
+    checkpoint.write_bytes(b"weights")
+    demo_config["features"]["mantra"] = {"checkpoint_path": str(checkpoint)}
+
+    cache = FeatureCache(tmp_path / "cache", demo_config)
+    cache.put("abc", "mantra", MANTRA_HEURISTIC)
+    cache.put("def", "mantra", MANTRA_TORCHSCRIPT)
+    cache.flush()
+
+    reloaded = FeatureCache(tmp_path / "cache", demo_config)
+    assert reloaded.get("abc", "mantra") is None
+    assert reloaded.get("def", "mantra") == MANTRA_TORCHSCRIPT
+
+
+def test_heuristic_mantra_rows_are_cached_without_a_checkpoint(tmp_path, demo_config):
+    cache = FeatureCache(tmp_path / "cache", demo_config)
+    cache.put("abc", "mantra", MANTRA_HEURISTIC)
+    cache.flush()
+    assert FeatureCache(tmp_path / "cache", demo_config).get("abc", "mantra") == MANTRA_HEURISTIC
+
+
+def test_cached_features_match_fresh_extraction(tmp_path, demo_config, write_test_images):
+    manifest = write_test_images(tmp_path / "images", 3)
+    fresh = extract_feature_table(manifest, demo_config)
+    from_cache = extract_feature_table(manifest, demo_config)
+    pd.testing.assert_frame_equal(from_cache, fresh)
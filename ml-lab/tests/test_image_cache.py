@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from ml_lab.eval import run_localization_suite
+from ml_lab.features import extract_feature_table
+from ml_lab.features.image_ops import configure_image_cache
+from ml_lab.train.pipeline import _configure_run_image_cache
+
+
+def test_decoded_images_are_reused_across_stages(tmp_path, demo_config, write_test_images):
+    manifest = write_test_images(tmp_path / "images", 3, with_masks=True)
+    cache = _configure_run_image_cache(demo_config, manifest)
+    try:
+        extract_feature_table(manifest, demo_config)
+        assert cache.stats()["misses"] == 3 and cache.stats()["hits"] == 0
+        run_localization_suite(manifest, demo_config)
+        assert cache.stats()["hits"] == 3
+    finally:
+        configure_image_cache(0)
+
+
+def test_cache_is_skipped_when_workers_decode(tmp_path, demo_config, write_test_images):
+    manifest = write_test_images(tmp_path / "images", 1)
+    demo_config["experiment"]["n_jobs"] = 2
+    assert _configure_run_image_cache(demo_config, manifest) is None
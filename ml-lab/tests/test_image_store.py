@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import os
+
+import numpy as np
+
+from ml_lab.features.image_ops import configure_image_store, load_rgb_image, read_rgb_image
+from ml_lab.features.image_store import activate_image_store, materialize_image_store
+
+
+def test_store_serves_the_decoded_pixels_until_a_file_changes(tmp_path, demo_config, write_test_images):
+    manifest = write_test_images(tmp_path / "images", 3)
+    image_size = tuple(demo_config["experiment"]["image_size"])
+    summary = materialize_image_store(manifest, demo_config["paths"]["image_store_dir"], image_size, n_workers=2)
+    assert summary["images"] == 3 and summary["decoded"] == 3
+
+    store = activate_image_store(demo_config)
+    try:
+        assert store is not None and len(store) == 3
+        paths = manifest["image_path"].tolist()
+        for path in paths:
+            stored = store.lookup(path)
+            np.testing.assert_array_equal(stored, read_rgb_image(path, image_size))
+            np.testing.assert_array_equal(load_rgb_image(path, image_size), stored)
+
+        stat = os.stat(paths[0])
+        os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        assert store.lookup(paths[0]) is None
+        assert store.lookup(tmp_path / "missing.jpg") is None
+
+        rerun = materialize_image_store(manifest, demo_config["paths"]["image_store_dir"], image_size)
+        assert rerun["reused"] == 3 and rerun["decoded"] == 0
+    finally:
+        configure_image_store(None)
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+from ml_lab.data import ManifestDelta, build_manifest, load_manifest, refresh_manifest, save_manifest
+from ml_lab.data import manifest as manifest_module
+
+
+def _write(path, size=(40, 30), seed=0, fmt=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pixels = np.random.default_rng(seed).integers(0, 256, (size[1], size[0], 3)).astype(np.uint8)
+    Image.fromarray(pixels).save(path, format=fmt)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    root = tmp_path / "raw"
+    _write(root / "authentic" / "a1.jpg", seed=1)
+    _write(root / "authentic" / "a2.png", size=(64, 48), seed=2)
+    _write(root / "tampered" / "t1.jpg", seed=3)
+    _write(root / "tampered" / "t2.tif", seed=4)
+    _write(root / "masks" / "t1_mask.png", seed=5)
+    return root
+
+
+def test_parallel_build_matches_file_contents(dataset):
+    manifest = build_manifest(dataset, "unit", n_workers=4)
+    pd.testing.assert_frame_equal(manifest, build_manifest(dataset, "unit", n_workers=1))
+
+    assert len(manifest) == 4
+    for row in manifest.itertuples(index=False):
+        assert row.file_md5 == hashlib.md5(open(row.image_path, "rb").read()).hexdigest()
+        with Image.open(row.image_path) as img:
+            assert (row.width, row.height, row.image_format) == (*img.size, img.format.lower())
+    masks = dict(zip(manifest["image_path"].map(lambda p: p.rsplit("/", 1)[-1]), manifest["mask_path"]))
+    assert str(masks["t1.jpg"]).endswith("t1_mask.png")
+    assert pd.isna(masks["t2.tif"]) and pd.isna(masks["a1.jpg"])
+
+
+@pytest.mark.filterwarnings("ignore:Corrupt EXIF data")
+def test_header_beyond_first_chunk_falls_back_to_opening_the_file(dataset, monkeypatch):
+    expected = build_manifest(dataset, "unit")
+    monkeypatch.setattr(manifest_module, "READ_CHUNK_BYTES", 16)
+    pd.testing.assert_frame_equal(build_manifest(dataset, "unit"), expected)
+
+
+def test_refresh_rehashes_only_changed_files_and_matches_a_fresh_build(dataset, tmp_path, monkeypatch):
+    csv_path = tmp_path / "manifest.csv"
+    save_manifest(build_manifest(dataset, "unit"), csv_path)
+
+    _write(dataset / "authentic" / "a1.jpg", size=(50, 30), seed=6)
+    (dataset / "tampered" / "t2.tif").unlink()
+    _write(dataset / "authentic" / "a3.png", seed=7)
+
+    hashed = []
+    hash_and_probe = manifest_module._hash_and_probe
+
+    def _counting_hash_and_probe(path):
+        hashed.append(path.name)
+        return hash_and_probe(path)
+
+    monkeypatch.setattr(manifest_module, "_hash_and_probe", _counting_hash_and_probe)
+    refreshed, delta = refresh_manifest(load_manifest(csv_path), dataset, "unit")
+
+    assert delta == ManifestDelta(added=1, modified=1, removed=1, unchanged=2)
+    assert sorted(hashed) == ["a1.jpg", "a3.png"]
+    monkeypatch.undo()
+    save_manifest(refreshed, tmp_path / "refreshed.csv")
+    save_manifest(build_manifest(dataset, "unit"), tmp_path / "fresh.csv")
+    pd.testing.assert_frame_equal(load_manifest(tmp_path / "refreshed.csv"), load_manifest(tmp_path / "fresh.csv"))
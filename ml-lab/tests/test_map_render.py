@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+from ml_lab.features import map_render
+from ml_lab.features.map_render import (
+    MapEncoding,
+    colorize,
+    encode_map,
+    encode_map_base64,
+    normalize_to_uint8,
+    robust_max,
+    scale_to_uint8,
+)
+
+
+def _naive_normalize(x):
+    """``np.percentile`` normalization the colorizers used before ``map_render``."""
+    max_v = float(np.percentile(x, 99.0))
+    if max_v <= 1e-8:
+        return np.zeros_like(x, dtype=np.uint8)
+    return (np.clip(x / max_v, 0.0, 1.0).astype(np.float32) * 255.0).astype(np.uint8)
+
+
+@pytest.mark.parametrize("colormap", [cv2.COLORMAP_JET, cv2.COLORMAP_TURBO, cv2.COLORMAP_INFERNO, cv2.COLORMAP_PLASMA])
+def test_colorize_matches_apply_color_map(colormap):
+    index = np.random.default_rng(colormap).integers(0, 256, (37, 53)).astype(np.uint8)
+    np.testing.assert_array_equal(colorize(index, colormap), cv2.applyColorMap(index, colormap))
+
+
+@pytest.mark.parametrize("size", [1, 2, 101, 4096])
+def test_robust_max_is_within_a_rank_of_np_percentile(size):
+    x = np.random.default_rng(size).normal(size=size).astype(np.float32)
+    ranked = np.sort(np.maximum(x, 0.0))
+    virtual = 0.99 * (size - 1)
+    low, high = float(ranked[int(np.floor(virtual))]), float(ranked[int(np.ceil(virtual))])
+    value = robust_max(x)
+    assert low <= value <= high
+    assert low <= float(np.percentile(np.maximum(x, 0.0), 99.0)) <= high
+
+
+def test_robust_max_sample_does_not_alias_with_the_cfa_lattice(monkeypatch):
+    monkeypatch.setattr(map_render, "MAX_EXACT_PIXELS", 1 << 10)
+    lattice = np.zeros((64, 96), dtype=np.float32)
+    lattice[::2, ::2] = 1.0
+    assert robust_max(lattice, q=80.0) == float(np.percentile(lattice, 80.0)) == 1.0
+    assert robust_max(lattice, q=60.0) == float(np.percentile(lattice, 60.0)) == 0.0
+
+
+def test_scale_to_uint8_matches_clip_and_truncate():
+    x = np.random.default_rng(0).uniform(-5, 80, (64, 64)).astype(np.float32)
+    expected = np.clip(x * np.float32(4.0), 0, 255).astype(np.uint8)
+    np.testing.assert_array_equal(scale_to_uint8(x, 4.0), expected)
+
+
+def test_normalize_to_uint8_stays_close_to_percentile_normalization():
+    rng = np.random.default_rng(1)
+    x = np.abs(rng.normal(size=(128, 96))).astype(np.float32)
+    diff = np.abs(normalize_to_uint8(x).astype(np.int16) - _naive_normalize(x).astype(np.int16))
+    assert diff.max() <= 3
+    assert np.mean(diff > 0) < 0.05
+    np.testing.assert_array_equal(normalize_to_uint8(np.zeros((8, 8), np.float32)), np.zeros((8, 8), np.uint8))
+
+
+def test_png_encoding_round_trips_and_invalid_formats_are_rejected():
+    colored = colorize(np.random.default_rng(2).integers(0, 256, (20, 30)).astype(np.uint8), cv2.COLORMAP_JET)
+    for encoding in (MapEncoding(), MapEncoding(png_compression=9)):
+        decoded = cv2.imdecode(np.frombuffer(encode_map(colored, encoding), np.uint8), cv2.IMREAD_COLOR)
+        np.testing.assert_array_equal(decoded, colored)
+    payload = encode_map_base64(colored, MapEncoding(format="jpeg", quality=70))
+    assert base64.b64decode(payload)[:2] == b"\xff\xd8"
+    assert MapEncoding(format="webp").media_type == "image/webp"
+    with pytest.raises(ValueError):
+        MapEncoding(format="gif")
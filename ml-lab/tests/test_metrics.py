@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+
+from ml_lab.eval.metrics import (
+    THRESHOLD_METRICS,
+    _bootstrap_auc,
+    bootstrap_metric_summary,
+    compute_binary_metrics,
+    select_best_threshold,
+    threshold_sweep,
+)
+
+NAIVE_METRICS = {
+    "accuracy": lambda yt, yp: float(accuracy_score(yt, yp)),
+    "precision": lambda yt, yp: float(precision_score(yt, yp, zero_division=0)),
+    "recall": lambda yt, yp: float(recall_score(yt, yp, zero_division=0)),
+    "f1": lambda yt, yp: float(f1_score(yt, yp, zero_division=0)),
+}
+
+
+def _naive_best_threshold(y_true, y_prob, thresholds, metric_name):
+    """The per-threshold loop the trainer used before ``threshold_sweep``."""
+    best_threshold, best_metric = 0.5, -1.0
+    for candidate in thresholds:
+        value = compute_binary_metrics(y_true, y_prob, float(candidate)).get(metric_name, -1.0)
+        if value > best_metric:
+            best_metric, best_threshold = value, float(candidate)
+    return best_threshold, best_metric
+
+
+@pytest.fixture
+def scored():
+    rng = np.random.default_rng(3)
+    y_true = rng.integers(0, 2, 300)
+    # Rounded so many probabilities sit exactly on grid thresholds.
+    y_prob = np.clip(np.round(0.35 * y_true + rng.uniform(0, 0.65, 300), 2), 0, 1).astype(np.float32)
+    return y_true, y_prob, np.linspace(0.1, 0.9, 41)
+
+
+def test_threshold_sweep_matches_compute_binary_metrics(scored):
+    y_true, y_prob, thresholds = scored
+    sweep = threshold_sweep(y_true, y_prob, thresholds)
+    for i, threshold in enumerate(thresholds):
+        expected = compute_binary_metrics(y_true, y_prob, float(threshold))
+        for key in ("tp", "fp", "fn", "tn"):
+            assert sweep[key][i] == expected[key]
+        for metric in THRESHOLD_METRICS:
+            assert sweep[metric][i] == pytest.approx(expected[metric], abs=1e-12)
+
+
+@pytest.mark.parametrize("metric_name", [*THRESHOLD_METRICS, "roc_auc", "not_a_metric"])
+def test_select_best_threshold_matches_naive_loop(scored, metric_name):
+    y_true, y_prob, thresholds = scored
+    threshold, _ = select_best_threshold(y_true, y_prob, thresholds, metric_name)
+    assert threshold == _naive_best_threshold(y_true, y_prob, thresholds, metric_name)[0]
+
+
+@pytest.mark.filterwarnings("ignore::sklearn.exceptions.UndefinedMetricWarning")
+def test_roc_auc_with_one_class_keeps_default():
+    y_prob = np.linspace(0, 1, 10)
+    threshold, value = select_best_threshold(np.ones(10), y_prob, np.linspace(0.1, 0.9, 5), "roc_auc")
+    assert threshold == 0.5 and np.isnan(value)
+
+
+def _naive_bootstrap_scores(y_true, y_prob, threshold, metric_name, n_bootstrap, seed):
+    """The per-resample ``rng.choice`` loop ``bootstrap_metric_ci`` used to run."""
+    rng = np.random.default_rng(seed)
+    y_pred = (y_prob >= threshold).astype(int)
+    indices = np.arange(len(y_true))
+    scores = []
+    for _ in range(n_bootstrap):
+        sample_idx = rng.choice(indices, size=len(indices), replace=True)
+        scores.append(NAIVE_METRICS[metric_name](y_true[sample_idx], y_pred[sample_idx]))
+    return np.asarray(scores)
+
+
+def test_bootstrap_summary_matches_naive_loop(scored):
+    y_true, y_prob, _ = scored
+    rows = bootstrap_metric_summary(
+        y_true, y_prob, threshold=0.5, n_bootstrap=100, confidence_level=0.9, seed=11, metric_names=list(NAIVE_METRICS)
+    )
+    for row in rows:
+        scores = _naive_bootstrap_scores(y_true, y_prob, 0.5, row["metric"], 100, seed=11)
+        assert row["mean"] == pytest.approx(np.mean(scores), abs=1e-12)
+        assert row["std"] == pytest.approx(np.std(scores), abs=1e-12)
+        assert row["ci_lower"] == pytest.approx(np.quantile(scores, 0.05), abs=1e-12)
+        assert row["ci_upper"] == pytest.approx(np.quantile(scores, 0.95), abs=1e-12)
+
+
+def test_bootstrap_auc_matches_roc_auc_score_per_resample():
+    rng = np.random.default_rng(5)
+    # Few distinct scores so resamples are full of ties; the mostly-negative labels make
+    # some of the small resamples single-class.
+    y_true = (rng.uniform(size=12) < 0.25).astype(int)
+    y_prob = rng.integers(0, 4, 12) / 4
+    sample_idx = rng.integers(0, 12, size=(300, 12))
+    auc = _bootstrap_auc(y_true, y_prob, sample_idx)
+    single_class = 0
+    for i, idx in enumerate(sample_idx):
+        if len(np.unique(y_true[idx])) < 2:
+            single_class += 1
+            assert np.isnan(auc[i])
+        else:
+            assert auc[i] == pytest.approx(roc_auc_score(y_true[idx], y_prob[idx]), abs=1e-12)
+    assert 0 < single_class < len(sample_idx)
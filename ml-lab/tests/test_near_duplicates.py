@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import cv2
+import numpy as np
+import pytest
+
+from ml_lab.serve.near_duplicates import HASH_BITS, NearDuplicateIndex, perceptual_hash
+
+
+def _flip(rng, value, n_bits):
+    for bit in rng.choice(HASH_BITS, size=n_bits, replace=False):
+        value ^= 1 << int(bit)
+    return value
+
+
+def _brute_force_distance(stored, phash, max_distance):
+    distances = [(h ^ phash).bit_count() for h in stored]
+    within = [d for d in distances if d <= max_distance]
+    return min(within) if within else None
+
+
+@pytest.mark.parametrize("max_distance", [0, 2, 5, 8, 11])
+def test_lookup_matches_brute_force_hamming_search(max_distance):
+    rng = np.random.default_rng(max_distance)
+    centers = [int.from_bytes(rng.bytes(8), "big") for _ in range(20)]
+    stored = [_flip(rng, c, int(rng.integers(0, 10))) for c in centers for _ in range(10)]
+    index = NearDuplicateIndex(max_distance=max_distance)
+    for i, phash in enumerate(stored):
+        index.add(phash, {"id": i})
+
+    queries = [_flip(rng, c, int(rng.integers(0, 14))) for c in centers for _ in range(10)]
+    queries += [int.from_bytes(rng.bytes(8), "big") for _ in range(20)]
+    found = 0
+    for query in queries:
+        expected = _brute_force_distance(stored, query, max_distance)
+        result = index.lookup(query)
+        if expected is None:
+            assert result is None
+            continue
+        found += 1
+        phash, distance, verdict = result
+        assert distance == expected == (phash ^ query).bit_count()
+        assert stored[verdict["id"]] == phash
+    assert found > 0
+
+
+def test_capacity_drops_oldest_entries():
+    index = NearDuplicateIndex(max_distance=0, capacity=3)
+    for i in range(5):
+        index.add(1000 + i, {"id": i})
+    assert len(index) == 3
+    assert index.lookup(1000) is None and index.lookup(1001) is None
+    assert [index.lookup(1000 + i)[2]["id"] for i in (2, 3, 4)] == [2, 3, 4]
+    assert index.stats()["hits"] == 3 and index.stats()["misses"] == 2
+
+
+def test_max_distance_is_validated():
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(max_distance=HASH_BITS)
+
+
+def test_perceptual_hash_survives_reencoding_and_resizing():
+    rng = np.random.default_rng(0)
+    gray = cv2.GaussianBlur(rng.integers(0, 256, (120, 160)).astype(np.uint8), (0, 0), 4)
+    ok, encoded = cv2.imencode(".jpg", cv2.resize(gray, (200, 150)), [cv2.IMWRITE_JPEG_QUALITY, 70])
+    assert ok
+    reencoded = cv2.imdecode(encoded, cv2.IMREAD_GRAYSCALE)
+    other = cv2.GaussianBlur(rng.integers(0, 256, (120, 160)).astype(np.uint8), (0, 0), 4)
+
+    phash = perceptual_hash(gray)
+    assert 0 <= phash < 2**HASH_BITS
+    assert (phash ^ perceptual_hash(reencoded)).bit_count() <= 6
+    assert (phash ^ perceptual_hash(other)).bit_count() > 12
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from sklearn.feature_selection import SelectKBest, f_classif
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from ml_lab.models import PreprocessCache
+
+
+def _naive_pipeline(top_k):
+    """The per-candidate pipeline the tuning scripts fitted before ``PreprocessCache``."""
+    steps = [("scaler", StandardScaler())]
+    if top_k is not None:
+        steps.append(("selector", SelectKBest(score_func=f_classif, k=top_k)))
+    steps.append(("clf", LogisticRegression(max_iter=500)))
+    return Pipeline(steps)
+
+
+@pytest.fixture
+def splits():
+    rng = np.random.default_rng(0)
+    x_train = rng.normal(size=(120, 12)) * rng.uniform(0.1, 10, 12)
+    y_train = (x_train[:, 0] + x_train[:, 3] + rng.normal(size=120) > 0).astype(int)
+    return x_train, y_train, rng.normal(size=(40, 12)), rng.normal(size=(30, 12))
+
+
+@pytest.mark.parametrize("top_k", [None, 3, 8, 12])
+def test_shared_transforms_match_fresh_pipeline(splits, top_k):
+    x_train, y_train, x_val, x_test = splits
+    cache = PreprocessCache(x_train, y_train, top_k_values=(None, 3, 8, 12), val=x_val, test=x_test)
+
+    naive = _naive_pipeline(top_k).fit(x_train, y_train)
+    for split, x in (("train", x_train), ("val", x_val), ("test", x_test)):
+        np.testing.assert_array_equal(cache.matrix(split, top_k), naive[:-1].transform(x))
+
+    clf = LogisticRegression(max_iter=500).fit(cache.matrix("train", top_k), y_train)
+    pipeline = cache.pipeline(clf, top_k)
+    np.testing.assert_array_equal(pipeline.predict_proba(x_test), naive.predict_proba(x_test))
+
+
+def test_pipelines_do_not_share_fitted_steps(splits):
+    x_train, y_train, x_val, _ = splits
+    cache = PreprocessCache(x_train, y_train, top_k_values=(3, 8), val=x_val)
+    first = cache.pipeline(LogisticRegression(), 3)
+    second = cache.pipeline(LogisticRegression(), 8)
+    assert first.named_steps["selector"].k == 3 and second.named_steps["selector"].k == 8
+    assert first.named_steps["scaler"] is not second.named_steps["scaler"]
+    with pytest.raises(KeyError):
+        cache.matrix("val", 5)
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from ml_lab.serve.response_cache import ResponseCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _counting_compute(calls, payload, delay=0.0, fail=False):
+    async def compute():
+        calls.append(payload)
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError("inference failed")
+        return dict(payload)
+
+    return compute
+
+
+def test_hit_returns_what_a_fresh_computation_would():
+    cache = ResponseCache(max_bytes=10_000, ttl_seconds=60)
+    key = ResponseCache.key(b"image", "v1", False)
+    calls = []
+
+    async def run():
+        first = await cache.get_or_compute(key, _counting_compute(calls, {"score": 0.7}))
+        first[0]["requestId"] = "a"
+        second = await cache.get_or_compute(key, _counting_compute(calls, {"score": 0.7}))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first[1] == "miss" and second == ({"score": 0.7}, "hit")
+    assert len(calls) == 1
+    assert ResponseCache.key(b"image", "v2", False) != key and ResponseCache.key(b"image", "v1", True) != key
+
+
+def test_concurrent_requests_share_one_computation():
+    cache = ResponseCache(max_bytes=10_000, ttl_seconds=60)
+    key = ResponseCache.key(b"image", "v1", False)
+    calls = []
+
+    async def run():
+        compute = _counting_compute(calls, {"score": 0.2}, delay=0.01)
+        return await asyncio.gather(*(cache.get_or_compute(key, compute) for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert sorted(status for _, status in results) == ["coalesced", "coalesced", "miss"]
+    assert all(payload == {"score": 0.2} for payload, _ in results)
+    assert len({id(payload) for payload, _ in results}) == 3
+
+
+def test_failures_are_shared_but_not_cached():
+    cache = ResponseCache(max_bytes=10_000, ttl_seconds=60)
+    key = ResponseCache.key(b"image", "v1", False)
+    calls = []
+
+    async def run():
+        failing = _counting_compute(calls, {"score": 0.1}, delay=0.01, fail=True)
+        results = await asyncio.gather(*(cache.get_or_compute(key, failing) for _ in range(2)), return_exceptions=True)
+        retried = await cache.get_or_compute(key, _counting_compute(calls, {"score": 0.1}))
+        return results, retried
+
+    results, retried = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retried == ({"score": 0.1}, "miss")
+    assert len(calls) == 2
+
+
+def test_entries_expire_after_ttl():
+    clock = _Clock()
+    cache = ResponseCache(max_bytes=10_000, ttl_seconds=5, clock=clock)
+    key = ResponseCache.key(b"image", "v1", False)
+    calls = []
+
+    async def fetch():
+        return (await cache.get_or_compute(key, _counting_compute(calls, {"score": 0.5})))[1]
+
+    assert asyncio.run(fetch()) == "miss"
+    clock.now = 4.9
+    assert asyncio.run(fetch()) == "hit"
+    clock.now = 5.0
+    assert asyncio.run(fetch()) == "miss"
+    assert cache.stats()["expired"] == 1 and len(calls) == 2
+
+
+def test_byte_budget_evicts_least_recently_used():
+    payload = {"heatmap": "x" * 100}
+    entry_size = len('{"heatmap": "' + "x" * 100 + '"}')
+    cache = ResponseCache(max_bytes=2 * entry_size, ttl_seconds=60)
+    keys = [ResponseCache.key(bytes([i]), "v1", True) for i in range(3)]
+    calls = []
+
+    async def run():
+        statuses = []
+        for i in (0, 1, 0, 2, 0, 1):
+            statuses.append((await cache.get_or_compute(keys[i], _counting_compute(calls, payload)))[1])
+        return statuses
+
+    # Touching key 0 makes key 1 the eviction victim when key 2 arrives.
+    assert asyncio.run(run()) == ["miss", "miss", "hit", "miss", "hit", "miss"]
+    stats = cache.stats()
+    assert stats["bytes"] <= cache.max_bytes and stats["evictions"] == 2
+
+
+@pytest.mark.parametrize("max_bytes", [0, 10])
+def test_payload_larger_than_budget_is_not_stored(max_bytes):
+    cache = ResponseCache(max_bytes=max_bytes, ttl_seconds=60)
+    key = ResponseCache.key(b"image", "v1", False)
+    calls = []
+
+    async def run():
+        for _ in range(2):
+            await cache.get_or_compute(key, _counting_compute(calls, {"score": 0.123456}))
+
+    asyncio.run(run())
+    assert len(calls) == 2 and cache.stats()["entries"] == 0
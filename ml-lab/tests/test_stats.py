@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from ml_lab.features.stats import fraction_at_least, map_stats, percentiles
+
+QS = (0, 0.5, 25, 50, 90, 95, 99, 99.9, 100)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64, np.uint8])
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_percentiles_match_np_percentile_bit_for_bit(dtype, size):
+    rng = np.random.default_rng(size)
+    if dtype is np.uint8:
+        x = rng.integers(0, 256, (size, 1)).astype(dtype)
+    else:
+        x = rng.gamma(2.0, 30.0, size=(size, 1)).astype(dtype)
+    original = x.copy()
+    result = percentiles(x, QS)
+    assert list(result) == [float(q) for q in QS]
+    for q in QS:
+        assert result[q] == float(np.percentile(x, q))
+    np.testing.assert_array_equal(x, original)
+
+
+def test_percentiles_with_ties_and_overwrite_input():
+    x = np.repeat(np.array([3.0, 1.0, 2.0], dtype=np.float32), 5)
+    expected = {float(q): float(np.percentile(x, q)) for q in QS}
+    assert percentiles(x, QS, overwrite_input=True) == expected
+    assert percentiles(x, ()) == {}
+    with pytest.raises(ValueError):
+        percentiles(np.array([], dtype=np.float32), (50,))
+
+
+def test_fraction_at_least_matches_mean_of_comparison():
+    x = np.random.default_rng(0).normal(size=(50, 40)).astype(np.float32)
+    for threshold in (-10.0, -0.5, 0.0, 0.25, 10.0):
+        assert fraction_at_least(x, threshold) == float(np.mean(x >= threshold))
+
+
+def test_map_stats_matches_per_statistic_calls():
+    x = np.random.default_rng(1).uniform(0, 1, (64, 48)).astype(np.float32)
+    stats = map_stats(x, percentiles_at=(50, 95), thresholds=(0.5, 0.9))
+    assert stats.mean == float(np.mean(x)) and stats.std == float(np.std(x))
+    assert stats.percentiles == {50.0: float(np.percentile(x, 50)), 95.0: float(np.percentile(x, 95))}
+    assert stats.ratios == {0.5: float(np.mean(x >= 0.5)), 0.9: float(np.mean(x >= 0.9))}